@@ -0,0 +1,103 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from .models import ScrapeResultCache
+from .utils import solve_captcha_and_search
+from .history import record_history_for_cnr
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+
+def normalize_cnr(cnr_number):
+    return (cnr_number or '').strip().upper()
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'CASE_SCRAPE_CACHE_TTL', 6 * 60 * 60))
+
+
+def _stale_ttl():
+    return timedelta(seconds=getattr(settings, 'CASE_SCRAPE_CACHE_STALE_TTL', 7 * 24 * 60 * 60))
+
+
+def lookup(cnr_number):
+    """Return ``(entry, state)`` where state is FRESH, STALE (servable, needs refresh) or MISS."""
+    entry = ScrapeResultCache.objects.filter(cnr_number=normalize_cnr(cnr_number)).first()
+    if entry is None:
+        return None, MISS
+    age = timezone.now() - entry.fetched_at
+    if age <= _ttl():
+        return entry, FRESH
+    if age <= _ttl() + _stale_ttl():
+        return entry, STALE
+    return entry, MISS
+
+
+def store_result(cnr_number, data):
+    entry, _ = ScrapeResultCache.objects.update_or_create(
+        cnr_number=normalize_cnr(cnr_number),
+        defaults={'data': data, 'fetched_at': timezone.now(), 'refreshing_since': None, 'refresh_error': None},
+    )
+    # Every scrape passes through here, so this is where new hearings/orders are picked up
+    record_history_for_cnr(entry.cnr_number, data)
+    return entry
+
+
+def scrape_and_store(cnr_number, **kwargs):
+    data = solve_captcha_and_search(cnr_number, **kwargs)
+    store_result(cnr_number, data)
+    return data
+
+
+def refresh_in_background(cnr_number):
+    """Start one background refresh per CNR; concurrent stale hits do not pile up scrapes."""
+    cnr_number = normalize_cnr(cnr_number)
+    now = timezone.now()
+    abandoned = now - timedelta(seconds=getattr(settings, 'CASE_SCRAPE_TIMEOUT', 120) * 2)
+    claimed = ScrapeResultCache.objects.filter(cnr_number=cnr_number).filter(
+        Q(refreshing_since__isnull=True) | Q(refreshing_since__lt=abandoned)
+    ).update(refreshing_since=now)
+    if not claimed:
+        return False
+
+    # Imported here because the jobs module imports this one
+    from .jobs import get_executor
+    get_executor().submit(_refresh, cnr_number)
+    return True
+
+
+def _refresh(cnr_number):
+    close_old_connections()
+    try:
+        scrape_and_store(cnr_number)
+    except Exception as e:
+        # Nobody waits on a background refresh, so keep the reason with the entry
+        logger.exception("Background refresh of %s failed", cnr_number)
+        ScrapeResultCache.objects.filter(cnr_number=cnr_number).update(refreshing_since=None, refresh_error=str(e))
+    finally:
+        close_old_connections()
+
+
+def get_case_data(cnr_number, force_refresh=False, **kwargs):
+    """
+    Return ``(data, state)`` for a CNR, scraping only when the cache cannot answer.
+
+    Fresh entries are returned as-is. Stale entries are returned immediately
+    while a background refresh runs. Missing or expired entries, or
+    ``force_refresh``, scrape synchronously; ``kwargs`` go to the scraper.
+    """
+    if not force_refresh:
+        entry, state = lookup(cnr_number)
+        if state == FRESH:
+            return entry.data, FRESH
+        if state == STALE:
+            refresh_in_background(cnr_number)
+            return entry.data, STALE
+    return scrape_and_store(cnr_number, **kwargs), MISS
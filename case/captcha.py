@@ -0,0 +1,235 @@
+import io
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from PIL import Image, ImageFilter
+
+GLYPH_SIZE = (12, 16)
+
+
+class CaptchaSolver:
+    """Turns a captcha image into its lowercase alphanumeric text, or '' when unsure."""
+
+    def solve(self, image_bytes):
+        raise NotImplementedError
+
+
+class OCRSpaceSolver(CaptchaSolver):
+    """Remote OCR through the OCR.Space API."""
+
+    def __init__(self, api_key=None, timeout=None):
+        self.api_key = api_key or getattr(settings, 'OCR_SPACE_API_KEY', 'K83085402488957')
+        self.timeout = timeout or getattr(settings, 'OCR_SPACE_TIMEOUT', 10)
+
+    def solve(self, image_bytes):
+        try:
+            response = requests.post(
+                'https://api.ocr.space/parse/image',
+                files={'filename': ('captcha.png', image_bytes, 'image/png')},
+                data={'apikey': self.api_key, 'OCREngine': '2'},
+                timeout=self.timeout,
+            )
+            raw_text = response.json()['ParsedResults'][0]['ParsedText'].strip()
+        except Exception:
+            return ""
+        return re.sub(r'[^a-z0-9]', '', raw_text.lower())
+
+
+def _otsu_threshold(image):
+    histogram = image.histogram()
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if not background:
+            continue
+        foreground = total - background
+        if not foreground:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def binarize(image_bytes):
+    """Grayscale, denoise and threshold a captcha; ink pixels become 255."""
+    image = Image.open(io.BytesIO(image_bytes)).convert('L')
+    image = image.filter(ImageFilter.MedianFilter(3))
+    threshold = _otsu_threshold(image)
+    # Captchas are dark text on a light background
+    return image.point(lambda value: 255 if value <= threshold else 0)
+
+
+def segment(ink, min_width=2):
+    """Split a binarized captcha into per-character images using column projection."""
+    width, height = ink.size
+    pixels = ink.load()
+    column_has_ink = [any(pixels[x, y] for y in range(height)) for x in range(width)]
+
+    runs, start = [], None
+    for x, has_ink in enumerate(column_has_ink + [False]):
+        if has_ink and start is None:
+            start = x
+        elif not has_ink and start is not None:
+            if x - start >= min_width:
+                runs.append((start, x))
+            start = None
+    if not runs:
+        return []
+
+    # Touching characters show up as one wide run; split it evenly
+    widths = sorted(end - begin for begin, end in runs)
+    typical = widths[len(widths) // 2]
+    glyphs = []
+    for begin, end in runs:
+        pieces = max(1, round((end - begin) / typical)) if typical else 1
+        step = (end - begin) / pieces
+        for index in range(pieces):
+            left, right = int(begin + index * step), int(begin + (index + 1) * step)
+            glyph = ink.crop((left, 0, right, height))
+            box = glyph.getbbox()
+            if box:
+                glyphs.append(glyph.crop(box))
+    return glyphs
+
+
+def glyph_signature(glyph):
+    """Pack a glyph, scaled to GLYPH_SIZE, into an int bitmask."""
+    scaled = glyph.resize(GLYPH_SIZE, Image.NEAREST)
+    signature = 0
+    for value in scaled.getdata():
+        signature = (signature << 1) | (1 if value else 0)
+    return signature
+
+
+class TemplateCaptchaSolver(CaptchaSolver):
+    """
+    In-process solver that matches each segmented glyph against labelled templates.
+
+    Templates are built from a corpus of solved captchas with ``train`` and
+    stored as JSON. A read is rejected ('' returned) when any glyph is further
+    than ``max_distance`` bits from its nearest template.
+    """
+
+    def __init__(self, templates, max_distance=None):
+        self.templates = list(templates)
+        self.max_distance = max_distance if max_distance is not None else getattr(
+            settings, 'CASE_CAPTCHA_MAX_DISTANCE', 40
+        )
+
+    @classmethod
+    def train(cls, samples, per_char=25):
+        """Build templates from ``(image_bytes, label)`` pairs; mis-segmented samples are skipped."""
+        templates, seen = [], {}
+        for image_bytes, label in samples:
+            glyphs = segment(binarize(image_bytes))
+            if len(glyphs) != len(label):
+                continue
+            for char, glyph in zip(label, glyphs):
+                signature = glyph_signature(glyph)
+                if seen.get(char, 0) >= per_char or (char, signature) in templates:
+                    continue
+                templates.append((char, signature))
+                seen[char] = seen.get(char, 0) + 1
+        return cls(templates)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls((char, int(signature, 16)) for char, signature in data['templates'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'glyph_size': list(GLYPH_SIZE),
+                'templates': [[char, format(signature, 'x')] for char, signature in self.templates],
+            }, f)
+
+    def solve(self, image_bytes):
+        if not self.templates:
+            return ""
+        try:
+            glyphs = segment(binarize(image_bytes))
+        except Exception:
+            return ""
+        text = []
+        for glyph in glyphs:
+            signature = glyph_signature(glyph)
+            distance, char = min((
+                (bin(signature ^ template).count('1'), template_char)
+                for template_char, template in self.templates
+            ))
+            if distance > self.max_distance:
+                return ""
+            text.append(char)
+        return ''.join(text)
+
+
+class FallbackSolver(CaptchaSolver):
+    """Asks each solver in turn until one returns text."""
+
+    def __init__(self, solvers):
+        self.solvers = solvers
+
+    def solve(self, image_bytes):
+        for solver in self.solvers:
+            text = solver.solve(image_bytes)
+            if text:
+                return text
+        return ""
+
+
+def default_templates_path():
+    return getattr(
+        settings, 'CASE_CAPTCHA_TEMPLATES',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'captcha_templates.json')
+    )
+
+
+def build_solver(name):
+    if name == 'ocrspace':
+        return OCRSpaceSolver()
+    if name == 'template':
+        path = default_templates_path()
+        return TemplateCaptchaSolver.load(path) if os.path.exists(path) else TemplateCaptchaSolver([])
+    if name == 'local':
+        # Local templates first, remote OCR only for captchas they cannot read
+        return FallbackSolver([build_solver('template'), OCRSpaceSolver()])
+    return import_string(name)()
+
+
+_solver = None
+_solver_lock = threading.Lock()
+
+
+def get_captcha_solver():
+    global _solver
+    if _solver is None:
+        with _solver_lock:
+            if _solver is None:
+                _solver = build_solver(getattr(settings, 'CASE_CAPTCHA_SOLVER', 'local'))
+    return _solver
+
+
+@contextmanager
+def use_captcha_solver(solver):
+    """Temporarily replace the process-wide solver, e.g. in benchmarks."""
+    global _solver
+    previous, _solver = _solver, solver
+    try:
+        yield solver
+    finally:
+        _solver = previous
+
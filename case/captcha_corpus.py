@@ -0,0 +1,21 @@
+import os
+import re
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+
+def load_corpus(directory):
+    """
+    Read labelled captchas from ``directory``.
+
+    The label is the file name up to the first underscore or dot, so
+    ``a7kp2_01.png`` and ``a7kp2.png`` are both samples for ``a7kp2``.
+    """
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        label = re.split(r'[_.]', name, 1)[0].lower()
+        with open(os.path.join(directory, name), 'rb') as f:
+            samples.append((f.read(), label))
+    return samples
@@ -0,0 +1,145 @@
+import json
+import os
+import random
+import re
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .html_tables import extract_tables
+
+DEFAULT_BASE_URL = "https://services.ecourts.gov.in/ecourtindia_v6/"
+
+# One urllib3 connection pool per process, shared by every lookup. Each lookup
+# still gets its own cookie jar because the captcha is bound to the session.
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=1)
+
+_APP_TOKEN_PATTERN = re.compile(
+    r'app_token(?:[^>]*?value=|["\']?\s*[:=]\s*)["\']([0-9a-fA-F]+)["\']'
+)
+_NOT_FOUND_PATTERN = re.compile(r'not\s+found|does\s+not\s+exists?|invalid\s+cnr|no\s+record', re.IGNORECASE)
+
+
+class EcourtsHTTPError(Exception):
+    """The eCourts site answered in a way the HTTP engine does not understand."""
+
+
+class CaptchaRejected(Exception):
+    """The captcha text was refused by eCourts."""
+
+
+class CaseNotFound(Exception):
+    """eCourts has no case under the CNR number; retrying or another engine will not help."""
+
+
+class EcourtsHTTPClient:
+    """Browserless client for the eCourts CNR search form."""
+
+    def __init__(self, base_url=None, timeout=None):
+        self.base_url = base_url or getattr(settings, 'ECOURTS_BASE_URL', DEFAULT_BASE_URL)
+        self.timeout = timeout or getattr(settings, 'ECOURTS_HTTP_TIMEOUT', 15)
+        self.session = requests.Session()
+        self.session.mount('https://', _adapter)
+        self.session.mount('http://', _adapter)
+        self.session.headers['User-Agent'] = (
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+        )
+        self.app_token = ''
+
+    def open(self):
+        response = self.session.get(self.base_url, timeout=self.timeout)
+        response.raise_for_status()
+        self._update_token(response.text)
+
+    def fetch_captcha(self):
+        response = self.session.get(
+            f"{self.base_url}vendor/securimage/securimage_show.php",
+            params={'r': random.random()},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        if not response.headers.get('Content-Type', '').startswith('image/'):
+            raise EcourtsHTTPError("Captcha endpoint did not return an image")
+        return response.content
+
+    def search_cnr(self, cnr_number, captcha_text):
+        response = self.session.post(
+            self.base_url,
+            params={'p': 'cnr_status/searchByCNR/'},
+            data={
+                'cino': cnr_number,
+                'fcaptcha_code': captcha_text,
+                'ajax_req': 'true',
+                'app_token': self.app_token,
+            },
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        try:
+            payload = response.json()
+        except (ValueError, json.JSONDecodeError):
+            raise EcourtsHTTPError("CNR search did not return JSON")
+
+        if payload.get('app_token'):
+            self.app_token = payload['app_token']
+
+        html = payload.get('casetype_list')
+        if not html:
+            message = str(payload.get('errormsg') or payload.get('error') or '')
+            if 'captcha' in message.lower():
+                raise CaptchaRejected(message)
+            if _NOT_FOUND_PATTERN.search(message):
+                raise CaseNotFound(message)
+            raise EcourtsHTTPError(message or "CNR search returned no case data")
+        return html
+
+    def _update_token(self, html):
+        match = _APP_TOKEN_PATTERN.search(html)
+        if match:
+            self.app_token = match.group(1)
+
+
+def record_lookup(directory, cnr_number, html, captcha_text, image_bytes):
+    """
+    Save a successful lookup in the replay fixture layout (see case.replay).
+
+    Accepted captchas double as a labelled corpus for train_captcha_solver.
+    """
+    os.makedirs(os.path.join(directory, 'cases'), exist_ok=True)
+    os.makedirs(os.path.join(directory, 'captchas'), exist_ok=True)
+    with open(os.path.join(directory, 'cases', f"{cnr_number.upper()}.html"), 'w', encoding='utf-8') as f:
+        f.write(html)
+    with open(os.path.join(directory, 'captchas', f"{captcha_text}_{random.randrange(10 ** 6):06d}.png"), 'wb') as f:
+        f.write(image_bytes)
+
+
+def search_cnr_over_http(cnr_number, read_captcha_bytes, max_attempts=None, checkpoint=None, client=None):
+    """
+    Run the CNR lookup without a browser; raises EcourtsHTTPError when it cannot,
+    or CaseNotFound when eCourts answers that the CNR does not exist.
+
+    ``checkpoint`` is called before every captcha attempt and may raise to stop
+    the lookup. ``client`` defaults to a new EcourtsHTTPClient.
+    """
+    max_attempts = max_attempts or getattr(settings, 'ECOURTS_HTTP_MAX_ATTEMPTS', 8)
+    client = client or EcourtsHTTPClient()
+    try:
+        client.open()
+        for _ in range(max_attempts):
+            if checkpoint:
+                checkpoint()
+            image_bytes = client.fetch_captcha()
+            captcha_text = read_captcha_bytes(image_bytes)
+            if not captcha_text or len(captcha_text.strip()) < 4:
+                continue
+            try:
+                html = client.search_cnr(cnr_number, captcha_text)
+            except CaptchaRejected:
+                continue
+            record_dir = getattr(settings, 'ECOURTS_RECORD_DIR', None)
+            if record_dir:
+                record_lookup(record_dir, cnr_number, html, captcha_text, image_bytes)
+            return extract_tables(html)
+    except requests.RequestException as e:
+        raise EcourtsHTTPError(str(e))
+    raise EcourtsHTTPError(f"Captcha not solved after {max_attempts} attempts")
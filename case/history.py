@@ -0,0 +1,71 @@
+import hashlib
+import json
+from collections import Counter
+from django.db import transaction
+from .models import Case, CaseHistoryEntry
+from .signals import case_changed
+from .sync import parse_scraped_date
+
+# Scraped table -> (entry kind, column holding the entry's date)
+HISTORY_TABLES = {
+    'case_history': ('hearing', 2),
+    'order': ('order', 1),
+}
+
+
+def _row_hashes(rows):
+    """Hash each row; identical rows are told apart by how often they occurred before."""
+    seen = Counter()
+    for cells in rows:
+        key = json.dumps(cells, ensure_ascii=False)
+        seen[key] += 1
+        yield hashlib.sha256(f"{key}#{seen[key]}".encode('utf-8')).hexdigest()
+
+
+def record_history(case, scraped):
+    """Store hearings and orders of ``scraped`` not yet known for ``case``; returns the new rows by kind."""
+    new_entries = {}
+    with transaction.atomic():
+        # One writer per case at a time, so the rows found missing below are
+        # exactly the rows this call inserts
+        list(Case.objects.select_for_update().filter(pk=case.pk).values_list('pk', flat=True))
+        for table, (kind, date_column) in HISTORY_TABLES.items():
+            rows = [cells for cells in scraped.get(table) or [] if any(cells)]
+            known = set(
+                CaseHistoryEntry.objects.filter(case=case, kind=kind).values_list('row_hash', flat=True)
+            )
+            fresh = [
+                CaseHistoryEntry(
+                    case=case,
+                    kind=kind,
+                    cells=cells,
+                    entry_date=parse_scraped_date(cells[date_column]) if len(cells) > date_column and cells[date_column] else None,
+                    position=position,
+                    row_hash=row_hash,
+                )
+                for position, (cells, row_hash) in enumerate(zip(rows, _row_hashes(rows)))
+                if row_hash not in known
+            ]
+            if fresh:
+                CaseHistoryEntry.objects.bulk_create(fresh)
+                # bulk_create does not set pks on every backend; receivers get the stored rows
+                fresh = list(
+                    CaseHistoryEntry.objects.filter(
+                        case=case, kind=kind, row_hash__in=[entry.row_hash for entry in fresh]
+                    ).order_by('position')
+                )
+            new_entries[kind] = fresh
+
+    if any(new_entries.values()):
+        transaction.on_commit(lambda: case_changed.send(
+            sender=Case,
+            case=case,
+            hearings=new_entries['hearing'],
+            orders=new_entries['order'],
+        ))
+    return new_entries
+
+
+def record_history_for_cnr(cnr_number, scraped):
+    for case in Case.objects.filter(cnr_number__iexact=cnr_number):
+        record_history(case, scraped)
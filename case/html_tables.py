@@ -0,0 +1,107 @@
+from html.parser import HTMLParser
+
+# Output key -> CSS class selector of the table it is read from. These are the
+# selectors the Selenium extractors used, so both engines return the same shape.
+CASE_TABLE_SPEC = (
+    ('case_details', '.table.case_details_table.table-bordered'),
+    ('case_status', '.table.case_status_table.table-bordered'),
+    ('petitioner_advocate', '.table.table-bordered.Petitioner_Advocate_table'),
+    ('respondent_advocate', '.table.table-bordered.Respondent_Advocate_table'),
+    ('acts', '.table.acts_table.table-bordered'),
+    ('case_history', '.history_table'),
+    ('order', '.table.order_table.table'),
+)
+
+
+def _selector_classes(selector):
+    return frozenset(part for part in selector.split('.') if part)
+
+
+class _CaseTablesParser(HTMLParser):
+    """
+    Reads every table in ``spec`` in a single pass over the document.
+
+    The first table matching a selector wins, as ``find_element`` did. Tables
+    nested inside a matched table are read as part of it.
+    """
+
+    def __init__(self, spec):
+        super().__init__(convert_charrefs=True)
+        self.pending = [(key, _selector_classes(selector)) for key, selector in spec]
+        self.tables = {key: [] for key, _ in spec}
+        self._rows = None
+        self._depth = 0
+        self._open_rows = []
+        self._open_cells = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            if self._depth:
+                self._depth += 1
+                return
+            classes = set((dict(attrs).get('class') or '').split())
+            for index, (key, wanted) in enumerate(self.pending):
+                if wanted <= classes:
+                    del self.pending[index]
+                    self._rows = self.tables[key]
+                    self._depth = 1
+                    break
+            return
+        if not self._depth:
+            return
+        if tag == 'tr':
+            # Unclosed <tr>/<td> of the same table end where the next row starts
+            if self._open_rows and self._open_rows[-1][1] == self._depth:
+                self._close_row()
+            row = []
+            self._rows.append(row)
+            self._open_rows.append((row, self._depth))
+        elif tag == 'td' and self._open_rows:
+            row = self._open_rows[-1][0]
+            if self._open_cells and self._open_cells[-1][0] is row:
+                self._close_cell()
+            self._open_cells.append((row, []))
+        elif tag == 'br':
+            self.handle_data('\n', line_break=True)
+
+    def handle_endtag(self, tag):
+        if not self._depth:
+            return
+        if tag == 'table':
+            self._depth -= 1
+            while self._open_rows and self._open_rows[-1][1] > self._depth:
+                self._close_row()
+            if not self._depth:
+                self._rows = None
+                self._open_rows = []
+                self._open_cells = []
+        elif tag == 'td' and self._open_cells:
+            self._close_cell()
+        elif tag == 'tr' and self._open_rows:
+            self._close_row()
+
+    def _close_cell(self):
+        row, parts = self._open_cells.pop()
+        lines = (' '.join(line.split()) for line in ''.join(parts).split('\n'))
+        row.append('\n'.join(line for line in lines if line))
+
+    def _close_row(self):
+        row, _ = self._open_rows.pop()
+        while self._open_cells and self._open_cells[-1][0] is row:
+            self._close_cell()
+
+    def handle_data(self, data, line_break=False):
+        if not line_break:
+            # Source newlines are just whitespace; only <br> breaks a line
+            data = data.replace('\n', ' ')
+        # Text inside a nested cell also belongs to the enclosing cell, like WebElement.text
+        for _, parts in self._open_cells:
+            parts.append(data)
+
+
+def extract_tables(html, spec=CASE_TABLE_SPEC):
+    """Return ``{key: [[cell, ...], ...]}`` for every table in ``spec``; missing tables are empty."""
+    parser = _CaseTablesParser(spec)
+    parser.feed(html or '')
+    parser.close()
+    return parser.tables
@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import ScrapeJob
+from .ecourts_client import CaseNotFound
+from .utils import ScrapeCancelled, ScrapeTimeout
+from . import cache
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CASE_SCRAPE_JOB_WORKERS', 2),
+                    thread_name_prefix='scrape-job',
+                )
+    return _executor
+
+
+def create_job(cnr_number, user=None, force_refresh=False):
+    cnr_number = cache.normalize_cnr(cnr_number)
+    user = user if user is not None and user.is_authenticated else None
+
+    if not force_refresh:
+        entry, state = cache.lookup(cnr_number)
+        if state != cache.MISS:
+            if state == cache.STALE:
+                cache.refresh_in_background(cnr_number)
+            now = timezone.now()
+            return ScrapeJob.objects.create(
+                cnr_number=cnr_number, status='succeeded', result=entry.data,
+                started_at=now, finished_at=now, created_by=user,
+            )
+
+    job = ScrapeJob.objects.create(
+        cnr_number=cnr_number,
+        max_attempts=getattr(settings, 'CASE_SCRAPE_JOB_MAX_ATTEMPTS', 3),
+        timeout=getattr(settings, 'CASE_SCRAPE_JOB_TIMEOUT', 180),
+        created_by=user,
+    )
+    transaction.on_commit(lambda: dispatch(job.pk))
+    return job
+
+
+def dispatch(job_id):
+    get_executor().submit(run_job, job_id)
+
+
+def cancel_job(job):
+    updated = ScrapeJob.objects.filter(pk=job.pk, status__in=['queued', 'running']).update(
+        status='cancelled', finished_at=timezone.now()
+    )
+    return bool(updated)
+
+
+def _is_cancelled(job_id):
+    return ScrapeJob.objects.filter(pk=job_id, status='cancelled').exists()
+
+
+def run_job(job_id):
+    """Run a queued job to completion; safe to call from several processes at once."""
+    close_old_connections()
+    try:
+        # Claiming is a conditional update, so only one worker ever runs a job
+        claimed = ScrapeJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=timezone.now()
+        )
+        if not claimed:
+            return
+        job = ScrapeJob.objects.get(pk=job_id)
+
+        error = None
+        while job.attempts < job.max_attempts:
+            job.attempts += 1
+            ScrapeJob.objects.filter(pk=job.pk).update(attempts=job.attempts)
+            deadline = time.monotonic() + job.timeout
+            try:
+                result = cache.scrape_and_store(
+                    job.cnr_number,
+                    deadline=deadline,
+                    should_cancel=lambda: _is_cancelled(job.pk),
+                )
+            except ScrapeCancelled:
+                return
+            except CaseNotFound as e:
+                # Another attempt gets the same answer
+                error = str(e)
+                break
+            except ScrapeTimeout as e:
+                error = str(e)
+            except Exception as e:
+                error = f"Failed to scrape data: {e}"
+            else:
+                ScrapeJob.objects.filter(pk=job.pk, status='running').update(
+                    status='succeeded', result=result, error=None, finished_at=timezone.now()
+                )
+                return
+            if _is_cancelled(job.pk):
+                return
+
+        if error is None:
+            # Requeued by requeue_stale_jobs() with every attempt already spent
+            error = f"Gave up after {job.attempts} attempt(s): the worker running the job stopped before it finished"
+        ScrapeJob.objects.filter(pk=job.pk, status='running').update(
+            status='failed', error=error, finished_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def requeue_stale_jobs():
+    """Put jobs back in the queue whose worker died mid-run (e.g. a recycled gunicorn worker)."""
+    requeued = 0
+    for job in ScrapeJob.objects.filter(status='running').only('pk', 'started_at', 'timeout', 'max_attempts'):
+        cutoff = timezone.now() - timedelta(seconds=job.timeout * job.max_attempts)
+        if job.started_at is None or job.started_at < cutoff:
+            requeued += ScrapeJob.objects.filter(pk=job.pk, status='running').update(status='queued')
+    return requeued
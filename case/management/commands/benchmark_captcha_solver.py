@@ -0,0 +1,71 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from case.captcha import FallbackSolver, OCRSpaceSolver, TemplateCaptchaSolver, build_solver
+from case.captcha_corpus import load_corpus
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = "Report accuracy and latency of a captcha solver on a labelled captcha corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help="Directory of images named <label>[_n].png")
+        parser.add_argument(
+            '--solver', default='template',
+            help="template, ocrspace, local or a dotted path to a CaptchaSolver class"
+        )
+        parser.add_argument(
+            '--holdout', type=float, default=0.0,
+            help="Train templates on a random (1 - holdout) of the corpus and score the rest "
+                 "(template and local solvers only)"
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Seed for the --holdout split")
+
+    def handle(self, *args, **options):
+        samples = load_corpus(options['corpus'])
+        if not samples:
+            raise CommandError("No captcha images found in the corpus directory")
+
+        if options['holdout']:
+            if options['solver'] not in ('template', 'local'):
+                raise CommandError("--holdout trains templates, so it only applies to --solver template or local")
+            if not 0 < options['holdout'] < 1:
+                raise CommandError("--holdout must be between 0 and 1")
+            samples = list(samples)
+            random.Random(options['seed']).shuffle(samples)
+            split = int(len(samples) * (1 - options['holdout']))
+            if not 0 < split < len(samples):
+                raise CommandError("The corpus is too small for this --holdout")
+            solver = TemplateCaptchaSolver.train(samples[:split])
+            if options['solver'] == 'local':
+                solver = FallbackSolver([solver, OCRSpaceSolver()])
+            samples = samples[split:]
+        else:
+            solver = build_solver(options['solver'])
+
+        latencies, exact, chars_right, chars_total, unanswered = [], 0, 0, 0, 0
+        for image_bytes, label in samples:
+            started = time.perf_counter()
+            text = solver.solve(image_bytes)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+            if not text:
+                unanswered += 1
+            exact += text == label
+            chars_right += sum(a == b for a, b in zip(text, label)) if len(text) == len(label) else 0
+            chars_total += len(label)
+
+        total = len(samples)
+        self.stdout.write(f"Samples:          {total}")
+        self.stdout.write(f"Exact matches:    {exact} ({exact / total:.1%})")
+        self.stdout.write(f"Character acc.:   {chars_right / max(chars_total, 1):.1%}")
+        self.stdout.write(f"Unanswered:       {unanswered} ({unanswered / total:.1%})")
+        self.stdout.write(
+            f"Latency ms:       mean {sum(latencies) / total:.2f}  "
+            f"p50 {_percentile(latencies, 0.5):.2f}  p95 {_percentile(latencies, 0.95):.2f}"
+        )
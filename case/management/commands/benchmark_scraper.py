@@ -0,0 +1,190 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from case.captcha import CaptchaSolver, get_captcha_solver, use_captcha_solver
+from case.ecourts_client import EcourtsHTTPClient, search_cnr_over_http
+from case.replay import SESSION_COOKIE, ReplayServer
+from case.utils import read_captcha_image, solve_captcha_and_search_selenium
+from case.webdriver_manager import get_driver_pool, quit_driver
+
+
+# The replay session of the lookup running on this thread, as a callable
+# returning its cookie value; set as each lookup starts or checks out a browser
+_lookup = threading.local()
+
+
+class OracleSolver(CaptchaSolver):
+    """
+    Asks the replay server which captcha it served to the current lookup's
+    session and answers it correctly with probability ``accuracy``.
+
+    The image is ignored: a browser screenshot never has the fixture's bytes.
+    """
+
+    def __init__(self, server, accuracy):
+        self.server = server
+        self.accuracy = accuracy
+
+    def solve(self, image_bytes):
+        session_id = _lookup.session_id()
+        answer = (self.server.expected_answer(session_id) if session_id else None) or ''
+        return answer if random.random() < self.accuracy else answer[::-1] + 'x'
+
+
+def _track_checkouts(pool):
+    """Point _lookup at the session of whichever browser this thread checks out."""
+    checkout = pool.checkout
+
+    def tracked_checkout(timeout=None):
+        driver = checkout(timeout=timeout)
+
+        def session_id():
+            cookie = driver.get_cookie(SESSION_COOKIE)
+            return cookie['value'] if cookie else None
+
+        _lookup.session_id = session_id
+        return driver
+
+    pool.checkout = tracked_checkout
+
+
+class CountingSolver(CaptchaSolver):
+    def __init__(self, solver):
+        self.solver = solver
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def solve(self, image_bytes):
+        with self._lock:
+            self.calls += 1
+        return self.solver.solve(image_bytes)
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _process_tree_rss_kb(pid):
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _rss_kb(current)
+        task_dir = f"/proc/{current}/task"
+        if not os.path.isdir(task_dir):
+            continue
+        for task in os.listdir(task_dir):
+            try:
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+            except OSError:
+                pass
+    return total
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the eCourts scrape path offline against recorded pages (see case.replay)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', help="Replay fixture directory")
+        parser.add_argument('--engine', choices=['http', 'selenium'], default='http')
+        parser.add_argument('--lookups', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=2)
+        parser.add_argument(
+            '--solver', choices=['oracle', 'configured'], default='oracle',
+            help="oracle asks the replay server for the answer; configured uses CASE_CAPTCHA_SOLVER"
+        )
+        parser.add_argument('--oracle-accuracy', type=float, default=0.7)
+        parser.add_argument('--timeout', type=float, default=120, help="Seconds allowed per lookup")
+
+    def handle(self, *args, **options):
+        with ReplayServer(options['fixtures']) as server:
+            if options['solver'] == 'oracle':
+                solver = CountingSolver(OracleSolver(server, options['oracle_accuracy']))
+            else:
+                solver = CountingSolver(get_captcha_solver())
+
+            cnrs = sorted(server.cases)
+            engine = options['engine']
+            latencies, failures = [], []
+            rss_before = _rss_kb(os.getpid())
+
+            def lookup(index):
+                cnr = cnrs[index % len(cnrs)]
+                started = time.perf_counter()
+                try:
+                    if engine == 'http':
+                        client = EcourtsHTTPClient()
+                        _lookup.session_id = lambda: client.session.cookies.get(SESSION_COOKIE)
+                        search_cnr_over_http(cnr, read_captcha_image, client=client)
+                    else:
+                        solve_captcha_and_search_selenium(cnr)
+                except Exception as e:
+                    failures.append(f"{cnr}: {e}")
+                    return
+                latencies.append(time.perf_counter() - started)
+
+            with override_settings(
+                ECOURTS_BASE_URL=server.home_url,
+                ECOURTS_HOME_URL=server.home_url,
+                ECOURTS_RECORD_DIR=None,
+                CASE_SCRAPE_POOL_SIZE=options['concurrency'],
+                CASE_SCRAPE_POOL_MAX_WAITING=options['lookups'],
+                CASE_SCRAPE_POOL_WAIT_TIMEOUT=options['timeout'],
+            ), use_captcha_solver(solver):
+                quit_driver()
+                if engine == 'selenium':
+                    _track_checkouts(get_driver_pool())
+                wall_started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    list(executor.map(lookup, range(options['lookups'])))
+                wall = time.perf_counter() - wall_started
+
+                browser_rss = []
+                if engine == 'selenium':
+                    for driver in get_driver_pool().idle_sessions():
+                        browser_rss.append(_process_tree_rss_kb(driver.service.process.pid))
+                    quit_driver()
+
+            self._report(engine, options, latencies, failures, solver.calls, server.counters, wall,
+                         rss_before, browser_rss)
+
+    def _report(self, engine, options, latencies, failures, captcha_calls, counters, wall, rss_before, browser_rss):
+        successes = len(latencies)
+        self.stdout.write(f"Engine:                 {engine} x{options['concurrency']}")
+        self.stdout.write(f"Lookups:                {successes} ok, {len(failures)} failed in {wall:.2f}s")
+        if latencies:
+            self.stdout.write(
+                f"Latency s:              p50 {_percentile(latencies, 0.5):.3f}  "
+                f"p95 {_percentile(latencies, 0.95):.3f}  max {max(latencies):.3f}"
+            )
+            self.stdout.write(f"Captcha attempts/ok:    {captcha_calls / successes:.2f}")
+        self.stdout.write(
+            f"Server:                 {counters['captchas_served']} captchas, {counters['searches']} searches, "
+            f"{counters['captcha_rejections']} rejected"
+        )
+        if browser_rss:
+            self.stdout.write(
+                f"Memory per browser:     {sum(browser_rss) / len(browser_rss) / 1024:.1f} MB "
+                f"over {len(browser_rss)} session(s)"
+            )
+        else:
+            growth = _rss_kb(os.getpid()) - rss_before
+            self.stdout.write(f"Process RSS growth:     {growth / 1024:.1f} MB")
+        for failure in failures[:10]:
+            self.stderr.write(failure)
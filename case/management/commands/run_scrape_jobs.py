@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from case.jobs import requeue_stale_jobs, run_job
+from case.models import ScrapeJob
+
+
+class Command(BaseCommand):
+    help = "Run queued eCourts scrape jobs, including jobs left behind by restarted web workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Scrapes to run in parallel")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between queue polls")
+        parser.add_argument('--once', action='store_true', help="Drain the current queue and exit")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scrape-job') as executor:
+            while True:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+                in_flight = {job_id: future for job_id, future in in_flight.items() if not future.done()}
+                free = workers - len(in_flight)
+                if free > 0:
+                    queued = (
+                        ScrapeJob.objects.filter(status='queued')
+                        .exclude(pk__in=list(in_flight))
+                        .order_by('created_at')
+                        .values_list('pk', flat=True)[:free]
+                    )
+                    for job_id in queued:
+                        in_flight[job_id] = executor.submit(run_job, job_id)
+
+                if options['once'] and not in_flight:
+                    break
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,122 @@
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from case import cache
+from case.models import Case
+from case.sync import RateLimiter, apply_hearing_fields, parse_hearing_fields
+
+SYNCED_FIELDS = ['next_hearing', 'stage_of_case', 'judge_name', 'last_update', 'last_synced_at']
+
+
+class Command(BaseCommand):
+    help = (
+        "Scrape every case with a CNR number and write back next hearing, stage and judge. "
+        "Cases synced within --stale-after hours are skipped, so an interrupted run resumes "
+        "where it stopped; --shard/--shards split the work across processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Concurrent scrapes")
+        parser.add_argument('--rate', type=float, default=0.5, help="Maximum scrapes started per second (0 = unlimited)")
+        parser.add_argument('--stale-after', type=float, default=20, help="Re-sync cases last synced more than this many hours ago")
+        parser.add_argument('--shard', type=int, default=0, help="Shard handled by this process (0-based)")
+        parser.add_argument('--shards', type=int, default=1, help="Total number of shards")
+        parser.add_argument('--timeout', type=float, default=180, help="Seconds allowed per CNR")
+        parser.add_argument('--force', action='store_true', help="Scrape even when the result cache is fresh")
+        parser.add_argument('--limit', type=int, default=None, help="Process at most this many CNRs")
+
+    def handle(self, *args, **options):
+        if options['shards'] < 1 or not 0 <= options['shard'] < options['shards']:
+            raise CommandError("--shard must be between 0 and --shards - 1")
+
+        cases_by_cnr = self._pending_cases(options)
+        cnrs = list(cases_by_cnr)[:options['limit']]
+        self.stdout.write(f"Syncing {len(cnrs)} CNR(s) on shard {options['shard']}/{options['shards']}")
+
+        limiter = RateLimiter(options['rate'])
+        started = time.monotonic()
+        durations, failed, changed_count, scraped, cache_hits = [], [], 0, 0, 0
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {
+                executor.submit(self._scrape, cnr, limiter, options): cnr
+                for cnr in cnrs
+            }
+            try:
+                for future in as_completed(futures):
+                    cnr = futures[future]
+                    try:
+                        data, duration = future.result()
+                    except Exception as e:
+                        failed.append(cnr)
+                        self.stderr.write(f"{cnr}: {e}")
+                        continue
+
+                    if duration is None:
+                        cache_hits += 1
+                    else:
+                        scraped += 1
+                        durations.append(duration)
+                    fields = parse_hearing_fields(data)
+                    now = timezone.now()
+                    for case in cases_by_cnr[cnr]:
+                        if apply_hearing_fields(case, fields):
+                            case.last_update = now.date()
+                            changed_count += 1
+                        case.last_synced_at = now
+                    # Written per CNR so an interrupted run keeps everything it finished;
+                    # one small update is nothing next to a scrape
+                    Case.objects.bulk_update(cases_by_cnr[cnr], SYNCED_FIELDS)
+            except KeyboardInterrupt:
+                # Don't scrape the rest of the queue on the way out; its results would be dropped
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scraped {scraped}, served {cache_hits} from cache, changed {changed_count} case(s), "
+            f"failed {len(failed)} in {elapsed:.1f}s"
+        ))
+        if durations:
+            durations.sort()
+            self.stdout.write(
+                f"Time per scraped CNR: mean {sum(durations) / len(durations):.2f}s, "
+                f"p50 {durations[len(durations) // 2]:.2f}s, max {durations[-1]:.2f}s"
+            )
+        if failed:
+            self.stdout.write(f"Failed CNRs (retried on the next run): {', '.join(failed)}")
+
+    def _pending_cases(self, options):
+        cutoff = timezone.now() - timedelta(hours=options['stale_after'])
+        queryset = (
+            Case.objects.exclude(cnr_number__isnull=True).exclude(cnr_number='')
+            .filter(Q(last_synced_at__isnull=True) | Q(last_synced_at__lt=cutoff))
+        )
+        if options['shards'] > 1:
+            queryset = queryset.alias(shard=F('id') % options['shards']).filter(shard=options['shard'])
+
+        # Several cases can point at the same CNR; scrape it once
+        cases_by_cnr = defaultdict(list)
+        for case in queryset.order_by('id'):
+            cases_by_cnr[cache.normalize_cnr(case.cnr_number)].append(case)
+        return cases_by_cnr
+
+    def _scrape(self, cnr, limiter, options):
+        close_old_connections()
+        try:
+            if not options['force']:
+                entry, state = cache.lookup(cnr)
+                if state == cache.FRESH:
+                    # No duration: cache hits are reported apart from scrapes
+                    return entry.data, None
+            limiter.wait()
+            started = time.monotonic()
+            data = cache.scrape_and_store(cnr, deadline=started + options['timeout'])
+            return data, time.monotonic() - started
+        finally:
+            close_old_connections()
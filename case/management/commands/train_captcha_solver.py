@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from case.captcha import TemplateCaptchaSolver, default_templates_path
+from case.captcha_corpus import load_corpus
+
+
+class Command(BaseCommand):
+    help = "Build the local captcha templates from a directory of labelled captcha images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help="Directory of images named <label>[_n].png")
+        parser.add_argument('--output', default=None, help="Template file (defaults to CASE_CAPTCHA_TEMPLATES)")
+        parser.add_argument('--per-char', type=int, default=25, help="Maximum templates kept per character")
+
+    def handle(self, *args, **options):
+        samples = load_corpus(options['corpus'])
+        if not samples:
+            raise CommandError("No captcha images found in the corpus directory")
+
+        solver = TemplateCaptchaSolver.train(samples, per_char=options['per_char'])
+        output = options['output'] or default_templates_path()
+        solver.save(output)
+
+        chars = sorted({char for char, _ in solver.templates})
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(solver.templates)} templates for {len(chars)} characters "
+            f"from {len(samples)} samples to {output}"
+        ))
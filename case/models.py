@@ -75,6 +75,7 @@ class Case(models.Model):
         help_text="Select case priority"
     )
     last_update = models.DateField(auto_now=True, help_text="Last updated date")
+    last_synced_at = models.DateTimeField(blank=True, null=True, help_text="When hearing details were last synced from eCourts")
     description = models.TextField(blank=True, null=True, help_text="Enter case description")
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
@@ -134,4 +135,90 @@ class CaseSnippetViewSet(SnippetViewSet):
     list_filter = ('type', 'status', 'priority', 'created_at', 'created_by')
     search_fields = ('title', 'client__name', 'advocate__name', 'case_number', 'cnr_number', 'file_no', 'reference_no', 'fir_no', 'court', 'first_party', 'under_section', 'opposite_party', 'stage_of_case', 'judge_name', 'created_by__username')
 
-register_snippet(CaseSnippetViewSet)
\ No newline at end of file
+register_snippet(CaseSnippetViewSet)
+
+
+class ScrapeJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    cnr_number = models.CharField(max_length=50, help_text="CNR number to look up on eCourts")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    timeout = models.PositiveIntegerField(default=180, help_text="Seconds each attempt may run")
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="scrape_jobs"
+    )
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def __str__(self):
+        return f"Scrape {self.cnr_number} ({self.status})"
+
+    class Meta:
+        verbose_name = "Scrape Job"
+        verbose_name_plural = "Scrape Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class ScrapeResultCache(models.Model):
+    cnr_number = models.CharField(max_length=50, unique=True)
+    data = models.JSONField()
+    fetched_at = models.DateTimeField()
+    refreshing_since = models.DateTimeField(blank=True, null=True, help_text="Set while a background refresh is running")
+    refresh_error = models.TextField(blank=True, null=True, help_text="Why the last background refresh failed; cleared by a successful scrape")
+
+    def __str__(self):
+        return f"{self.cnr_number} @ {self.fetched_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        verbose_name = "Scrape Result Cache"
+        verbose_name_plural = "Scrape Result Cache"
+
+
+class CaseHistoryEntry(models.Model):
+    KIND_CHOICES = [
+        ('hearing', 'Hearing'),
+        ('order', 'Order'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name="history_entries")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    cells = models.JSONField(help_text="Cell text of the scraped table row")
+    entry_date = models.DateField(blank=True, null=True, help_text="Hearing date or order date")
+    position = models.PositiveIntegerField(help_text="Row position in the scraped table")
+    row_hash = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.entry_date or ''} for {self.case}"
+
+    class Meta:
+        verbose_name = "Case History Entry"
+        verbose_name_plural = "Case History Entries"
+        ordering = ['case', 'kind', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['case', 'kind', 'row_hash'], name='unique_case_history_row'),
+        ]
+
@@ -0,0 +1,178 @@
+"""
+Local stand-in for the eCourts CNR search, replaying recorded pages.
+
+Fixture layout (``ECOURTS_RECORD_DIR`` writes the same layout)::
+
+    <fixtures>/
+        index.html              optional search page; a minimal one is used otherwise
+        captchas/<answer>[_n].png
+        cases/<CNR>.html        the case tables HTML returned for that CNR
+
+The server hands out captchas from ``captchas/`` and remembers per session
+which answer it expects. Searches with the wrong answer get the "Invalid
+Captcha" error, which the stand-in page shows through ``#validateError``
+exactly as the live site does.
+"""
+import json
+import os
+import random
+import threading
+import uuid
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .captcha_corpus import load_corpus
+
+SESSION_COOKIE = 'REPLAYSESSID'
+
+DEFAULT_INDEX = """<!DOCTYPE html>
+<html>
+<head><meta charset="UTF-8"><title>eCourts replay</title></head>
+<body>
+<input type="hidden" id="app_token" value="{app_token}">
+<input type="text" id="cino">
+<img id="captcha_image" src="vendor/securimage/securimage_show.php">
+<input type="text" id="fcaptcha_code">
+<button type="button" id="searchbtn" onclick="search()">Search</button>
+<div id="validateError" style="display: block">Enter the captcha</div>
+<div id="history_cnr"></div>
+<script>
+function search() {
+    var body = new URLSearchParams({
+        cino: document.getElementById('cino').value,
+        fcaptcha_code: document.getElementById('fcaptcha_code').value,
+        ajax_req: 'true',
+        app_token: document.getElementById('app_token').value
+    });
+    fetch('?p=cnr_status/searchByCNR/', {method: 'POST', body: body})
+        .then(function (r) { return r.json(); })
+        .then(function (data) {
+            var error = document.getElementById('validateError');
+            if (data.casetype_list) {
+                document.getElementById('history_cnr').innerHTML = data.casetype_list;
+                error.style.display = 'none';
+            } else {
+                error.textContent = data.errormsg;
+                error.style.display = 'block';
+                document.getElementById('captcha_image').src =
+                    'vendor/securimage/securimage_show.php?r=' + Math.random();
+            }
+        });
+}
+</script>
+</body>
+</html>
+"""
+
+
+class ReplayServer:
+    def __init__(self, fixtures_dir, host='127.0.0.1', port=0):
+        self.fixtures_dir = fixtures_dir
+        self.captchas = load_corpus(os.path.join(fixtures_dir, 'captchas'))
+        if not self.captchas:
+            raise ValueError(f"No captcha images in {fixtures_dir}/captchas")
+        self.cases = {}
+        cases_dir = os.path.join(fixtures_dir, 'cases')
+        for name in os.listdir(cases_dir):
+            if name.endswith('.html'):
+                with open(os.path.join(cases_dir, name), encoding='utf-8') as f:
+                    self.cases[name[:-5].upper()] = f.read()
+
+        index_path = os.path.join(fixtures_dir, 'index.html')
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                self.index_html = f.read()
+        else:
+            self.index_html = DEFAULT_INDEX
+
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.counters = {'captchas_served': 0, 'searches': 0, 'captcha_rejections': 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def home_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/ecourtindia_v6/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def expected_answer(self, session_id):
+        """The answer to the captcha last served to ``session_id``, if it has not been used yet."""
+        with self.lock:
+            return self.sessions.get(session_id)
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _session_id(self):
+                cookie = SimpleCookie(self.headers.get('Cookie', ''))
+                if SESSION_COOKIE in cookie:
+                    return cookie[SESSION_COOKIE].value, False
+                return uuid.uuid4().hex, True
+
+            def _send(self, status, content_type, body, session_id=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if session_id:
+                    self.send_header('Set-Cookie', f"{SESSION_COOKIE}={session_id}; Path=/")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                session_id, is_new = self._session_id()
+                if urlparse(self.path).path.endswith('securimage_show.php'):
+                    image_bytes, answer = random.choice(server.captchas)
+                    with server.lock:
+                        server.sessions[session_id] = answer
+                    server._count('captchas_served')
+                    self._send(200, 'image/png', image_bytes, session_id if is_new else None)
+                    return
+                html = server.index_html.replace('{app_token}', uuid.uuid4().hex[:16])
+                self._send(200, 'text/html; charset=utf-8', html.encode('utf-8'), session_id if is_new else None)
+
+            def do_POST(self):
+                session_id, _ = self._session_id()
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+                server._count('searches')
+
+                with server.lock:
+                    expected = server.sessions.pop(session_id, None)
+                if expected is None or form.get('fcaptcha_code', '').lower() != expected:
+                    server._count('captcha_rejections')
+                    payload = {'status': 0, 'errormsg': 'Invalid Captcha'}
+                else:
+                    html = server.cases.get(form.get('cino', '').upper())
+                    if html is None:
+                        payload = {'status': 0, 'errormsg': 'This Case Code does not exists'}
+                    else:
+                        payload = {'status': 1, 'casetype_list': html, 'app_token': uuid.uuid4().hex[:16]}
+                self._send(200, 'application/json', json.dumps(payload).encode('utf-8'))
+
+        return Handler
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent with sender=Case after a re-scrape found hearings or orders not seen
+# before. Receivers get ``case`` plus ``hearings`` and ``orders``, the lists of
+# newly stored CaseHistoryEntry rows.
+case_changed = Signal()
@@ -0,0 +1,69 @@
+import re
+import threading
+import time
+from dateutil import parser as date_parser
+
+# Labels in the eCourts case status table and the Case field each one feeds
+HEARING_FIELDS = {
+    'next hearing date': 'next_hearing',
+    'case stage': 'stage_of_case',
+    'stage of case': 'stage_of_case',
+    'court number and judge': 'judge_name',
+}
+
+
+class RateLimiter:
+    """Spaces out calls across threads so at most ``rate`` start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def parse_scraped_date(value):
+    try:
+        return date_parser.parse(value, dayfirst=True, fuzzy=True).date()
+    except (ValueError, OverflowError):
+        return None
+
+
+def parse_hearing_fields(scraped):
+    """Pull next hearing, stage and judge out of a scrape result's case_status table."""
+    fields = {}
+    for row in scraped.get('case_status') or []:
+        if len(row) < 2:
+            continue
+        label = re.sub(r'\s+', ' ', row[0]).strip(' :').lower()
+        field = HEARING_FIELDS.get(label)
+        value = row[1].strip()
+        if not field or not value:
+            continue
+        if field == 'next_hearing':
+            value = parse_scraped_date(value)
+            if value is None:
+                continue
+        fields[field] = value
+    return fields
+
+
+def apply_hearing_fields(case, fields):
+    """Copy changed values onto ``case``; returns the names of the fields that changed."""
+    changed = []
+    for name, value in fields.items():
+        if name == 'judge_name' or name == 'stage_of_case':
+            value = value[:case._meta.get_field(name).max_length]
+        if getattr(case, name) != value:
+            setattr(case, name, value)
+            changed.append(name)
+    return changed
@@ -1,3 +1,684 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from PIL import Image
+from . import cache, jobs
+from .captcha import TemplateCaptchaSolver, binarize, segment
+from .captcha_corpus import load_corpus
+from .ecourts_client import CaptchaRejected, CaseNotFound, EcourtsHTTPClient, EcourtsHTTPError, search_cnr_over_http
+from .history import record_history
+from .html_tables import CASE_TABLE_SPEC, extract_tables
+from .models import Case, CaseHistoryEntry, ScrapeJob, ScrapeResultCache
+from .signals import case_changed
+from .utils import ScrapeCancelled, ScrapeTimeout, solve_captcha_and_search
+from .webdriver_manager import DriverPool, DriverPoolTimeout
 
-# Create your tests here.
+try:
+    import lxml  # noqa: F401
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+TEST_PAGES = os.path.join(os.path.dirname(__file__), 'test_pages')
+CAPTCHAS = os.path.join(TEST_PAGES, 'captchas')
+PAGES = ('case_full', 'case_empty_tables', 'case_missing_tables', 'case_malformed')
+
+
+def load_page(name):
+    with open(os.path.join(TEST_PAGES, f'{name}.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+def load_expected(name):
+    with open(os.path.join(TEST_PAGES, f'{name}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def reference_tables(html):
+    """
+    The tables as BeautifulSoup/lxml sees them, read the way the old Selenium
+    extractors did: every <tr> of the first matching table, every <td> of the
+    row, with <br> as the only line break. The .json files were written by this.
+    """
+    line_break = '\x00'
+    soup = BeautifulSoup(html, 'lxml')
+    for br in soup.find_all('br'):
+        br.replace_with(line_break)
+
+    def cell_text(td):
+        lines = td.get_text().replace('\n', ' ').replace(line_break, '\n').split('\n')
+        return '\n'.join(line for line in (' '.join(line.split()) for line in lines) if line)
+
+    tables = {}
+    for key, selector in CASE_TABLE_SPEC:
+        table = soup.select_one(selector)
+        tables[key] = [[cell_text(td) for td in tr.find_all('td')] for tr in table.find_all('tr')] if table else []
+    return tables
+
+
+class ExtractTablesTests(SimpleTestCase):
+
+    def test_saved_pages_match_recorded_output(self):
+        for name in PAGES:
+            with self.subTest(page=name):
+                self.assertEqual(extract_tables(load_page(name)), load_expected(name))
+
+    def test_full_page(self):
+        tables = extract_tables(load_page('case_full'))
+        self.assertEqual(tables['case_status'][1], ['Next Hearing Date', '24th November 2026'])
+        self.assertEqual(tables['petitioner_advocate'], [['1) K. Ramasamy\nAdvocate- S. Lakshmi\n2) R. Meena']])
+        # Header rows made of <th> come back as empty rows, as they did from Selenium
+        self.assertEqual(tables['case_history'][0], [])
+        self.assertEqual(len(tables['case_history']), 4)
+
+    def test_empty_and_missing_tables(self):
+        empty = extract_tables(load_page('case_empty_tables'))
+        self.assertEqual(empty['petitioner_advocate'], [])
+        self.assertEqual(empty['case_status'][0], ['First Hearing Date', ''])
+        missing = extract_tables(load_page('case_missing_tables'))
+        for key in ('respondent_advocate', 'acts', 'case_history', 'order'):
+            self.assertEqual(missing[key], [], key)
+        self.assertEqual(extract_tables(''), {key: [] for key, _ in CASE_TABLE_SPEC})
+        self.assertEqual(extract_tables(None), {key: [] for key, _ in CASE_TABLE_SPEC})
+
+    def test_malformed_rows(self):
+        tables = extract_tables(load_page('case_malformed'))
+        # Unclosed cells and rows end where the next one starts
+        self.assertEqual(tables['case_details'][0], ['Case Type', 'W.P. - Writ Petition'])
+        self.assertEqual(tables['case_history'][1], ["Hon'ble Judge", '17-02-2022', '01-12-2026', 'Hearing'])
+
+    def test_matches_beautifulsoup(self):
+        if BeautifulSoup is None:
+            self.skipTest("beautifulsoup4 and lxml are not installed")
+        for name in PAGES:
+            html = load_page(name)
+            with self.subTest(page=name):
+                self.assertEqual(extract_tables(html), reference_tables(html))
+
+
+SCRAPED = {'case_details': [['CNR Number', 'TNCH010012342021']], 'case_history': []}
+
+
+# run_job closes stale connections, which TestCase's wrapping transaction does not survive
+class ScrapeJobTests(TransactionTestCase):
+
+    def setUp(self):
+        patcher = mock.patch('case.cache.solve_captcha_and_search')
+        self.scrape = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Jobs are run inline below instead of on the worker pool
+        patcher = mock.patch('case.jobs.dispatch')
+        self.dispatch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _job(self, **kwargs):
+        with self.settings(CASE_SCRAPE_JOB_MAX_ATTEMPTS=3):
+            job = jobs.create_job(' tnch010012342021 ', **kwargs)
+        self.assertEqual((job.status, job.cnr_number), ('queued', 'TNCH010012342021'))
+        self.dispatch.assert_called_once_with(job.pk)
+        return job
+
+    def test_queued_job_runs_to_success(self):
+        self.scrape.return_value = SCRAPED
+        job = self._job()
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), ('succeeded', 1, SCRAPED))
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.finished_at)
+        # The result is cached for the next lookup of the same CNR
+        self.assertEqual(ScrapeResultCache.objects.get(cnr_number=job.cnr_number).data, SCRAPED)
+
+    def test_retries_then_fails_with_the_last_error(self):
+        self.scrape.side_effect = [RuntimeError('site down'), ScrapeTimeout('captcha budget spent'), ScrapeTimeout('too slow')]
+        job = self._job()
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ('failed', 3, 'too slow'))
+        self.assertEqual(self.scrape.call_count, 3)
+
+    def test_retry_can_succeed(self):
+        self.scrape.side_effect = [RuntimeError('site down'), SCRAPED]
+        job = self._job()
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ('succeeded', 2, None))
+
+    def test_only_queued_jobs_are_claimed(self):
+        job = self._job()
+        self.assertTrue(jobs.cancel_job(job))
+        jobs.run_job(job.pk)
+        self.scrape.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'cancelled')
+        # Finished jobs cannot be cancelled again
+        self.assertFalse(jobs.cancel_job(job))
+
+    def test_cancel_while_running(self):
+        job = self._job()
+
+        def scrape(cnr_number, deadline=None, should_cancel=None):
+            jobs.cancel_job(job)
+            self.assertTrue(should_cancel())
+            raise ScrapeCancelled()
+
+        self.scrape.side_effect = scrape
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('cancelled', 1))
+
+    def test_cached_result_finishes_the_job_at_once(self):
+        ScrapeResultCache.objects.create(cnr_number='TNCH010012342021', data=SCRAPED, fetched_at=timezone.now())
+        job = jobs.create_job('TNCH010012342021')
+        self.assertEqual((job.status, job.result), ('succeeded', SCRAPED))
+        self.dispatch.assert_not_called()
+        # force_refresh skips the cache
+        self.assertEqual(jobs.create_job('TNCH010012342021', force_refresh=True).status, 'queued')
+
+    def test_requeue_stale_jobs(self):
+        job = self._job()
+        long_ago = timezone.now() - timedelta(seconds=job.timeout * job.max_attempts + 60)
+        ScrapeJob.objects.filter(pk=job.pk).update(status='running', started_at=long_ago)
+        recent = ScrapeJob.objects.create(cnr_number='X', status='running', started_at=timezone.now())
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((job.status, recent.status), ('queued', 'running'))
+
+    def test_requeued_job_without_attempts_left_fails_with_a_reason(self):
+        job = self._job()
+        long_ago = timezone.now() - timedelta(seconds=job.timeout * job.max_attempts + 60)
+        ScrapeJob.objects.filter(pk=job.pk).update(status='running', started_at=long_ago, attempts=job.max_attempts)
+        jobs.requeue_stale_jobs()
+        jobs.run_job(job.pk)
+        self.scrape.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, "Gave up after 3 attempt(s): the worker running the job stopped before it finished")
+
+    def test_unknown_cnr_fails_without_retrying(self):
+        self.scrape.side_effect = CaseNotFound('This Case Code does not exists')
+        job = self._job()
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ('failed', 1, 'This Case Code does not exists'))
+
+
+@mock.patch('case.cache.solve_captcha_and_search', return_value=SCRAPED)
+class ScrapeCacheTests(TransactionTestCase):
+    """CASE_SCRAPE_CACHE_TTL is one hour and CASE_SCRAPE_CACHE_STALE_TTL a day in these tests."""
+
+    def setUp(self):
+        overrides = self.settings(CASE_SCRAPE_CACHE_TTL=60 * 60, CASE_SCRAPE_CACHE_STALE_TTL=24 * 60 * 60)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch('case.jobs.get_executor')
+        self.executor = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def _cached(self, age):
+        return ScrapeResultCache.objects.create(
+            cnr_number='TNCH010012342021', data={'cached': True}, fetched_at=timezone.now() - age
+        )
+
+    def test_lookup_states(self, scrape):
+        self.assertEqual(cache.lookup('TNCH010012342021'), (None, cache.MISS))
+        entry = self._cached(timedelta(minutes=59))
+        self.assertEqual(cache.lookup(' tnch010012342021'), (entry, cache.FRESH))
+        ScrapeResultCache.objects.filter(pk=entry.pk).update(fetched_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(cache.lookup('TNCH010012342021')[1], cache.STALE)
+        ScrapeResultCache.objects.filter(pk=entry.pk).update(fetched_at=timezone.now() - timedelta(hours=26))
+        self.assertEqual(cache.lookup('TNCH010012342021')[1], cache.MISS)
+
+    def test_fresh_entry_is_served_without_scraping(self, scrape):
+        self._cached(timedelta(minutes=5))
+        self.assertEqual(cache.get_case_data('TNCH010012342021'), ({'cached': True}, cache.FRESH))
+        scrape.assert_not_called()
+        self.executor.submit.assert_not_called()
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self, scrape):
+        self._cached(timedelta(hours=3))
+        self.assertEqual(cache.get_case_data('TNCH010012342021'), ({'cached': True}, cache.STALE))
+        self.assertEqual(cache.get_case_data('TNCH010012342021'), ({'cached': True}, cache.STALE))
+        scrape.assert_not_called()
+        # The second stale hit finds the refresh already claimed
+        self.executor.submit.assert_called_once_with(cache._refresh, 'TNCH010012342021')
+
+        cache._refresh('TNCH010012342021')
+        entry, state = cache.lookup('TNCH010012342021')
+        self.assertEqual((entry.data, entry.refreshing_since, state), (SCRAPED, None, cache.FRESH))
+
+    def test_failed_refresh_is_recorded_and_releases_the_claim(self, scrape):
+        entry = self._cached(timedelta(hours=3))
+        scrape.side_effect = RuntimeError('site down')
+        self.assertTrue(cache.refresh_in_background('TNCH010012342021'))
+        with self.assertLogs('case.cache', 'ERROR') as logs:
+            cache._refresh('TNCH010012342021')
+        self.assertIn('Background refresh of TNCH010012342021 failed', logs.output[0])
+        entry.refresh_from_db()
+        self.assertEqual((entry.refreshing_since, entry.refresh_error), (None, 'site down'))
+        self.assertTrue(cache.refresh_in_background('TNCH010012342021'))
+
+        # The next successful scrape clears the recorded failure
+        scrape.side_effect = None
+        cache._refresh('TNCH010012342021')
+        entry.refresh_from_db()
+        self.assertIsNone(entry.refresh_error)
+
+    def test_miss_expired_and_forced_lookups_scrape(self, scrape):
+        self.assertEqual(cache.get_case_data('TNCH010012342021'), (SCRAPED, cache.MISS))
+        self.assertEqual(cache.get_case_data('TNCH010012342021'), (SCRAPED, cache.FRESH))
+        self.assertEqual(scrape.call_count, 1)
+
+        self.assertEqual(cache.get_case_data('TNCH010012342021', force_refresh=True), (SCRAPED, cache.MISS))
+        self.assertEqual(scrape.call_count, 2)
+
+        ScrapeResultCache.objects.update(fetched_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(cache.get_case_data('TNCH010012342021'), (SCRAPED, cache.MISS))
+        self.assertEqual(scrape.call_count, 3)
+
+
+class InlineExecutor:
+    """ThreadPoolExecutor stand-in running each task at submit; SQLite cannot take concurrent writers."""
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@mock.patch('case.management.commands.sync_case_hearings.ThreadPoolExecutor', InlineExecutor)
+class SyncCaseHearingsTests(TransactionTestCase):
+
+    def test_cache_hits_are_reported_apart_and_progress_is_kept_per_case(self):
+        status = {'case_status': [['Next Hearing Date', '24th November 2026'], ['Case Stage', 'Evidence']]}
+        cnrs = ['TNCH010000012021', 'TNCH010000022021', 'TNCH010000032021']
+        for i, cnr in enumerate(cnrs):
+            Case.objects.create(title=f'Case {i}', type='Civil', case_number=f'OS {i}/2021', cnr_number=cnr)
+        ScrapeResultCache.objects.create(cnr_number=cnrs[0], data=status, fetched_at=timezone.now())
+
+        def scrape(cnr_number, **kwargs):
+            if cnr_number == cnrs[2]:
+                raise RuntimeError('site down')
+            return status
+
+        out = StringIO()
+        with mock.patch('case.cache.solve_captcha_and_search', side_effect=scrape):
+            call_command('sync_case_hearings', rate=0, workers=1, stdout=out, stderr=StringIO())
+        self.assertIn("Scraped 1, served 1 from cache, changed 2 case(s), failed 1", out.getvalue())
+
+        synced = dict(Case.objects.values_list('cnr_number', 'last_synced_at'))
+        self.assertIsNotNone(synced[cnrs[0]])
+        self.assertIsNotNone(synced[cnrs[1]])
+        self.assertIsNone(synced[cnrs[2]])
+        self.assertEqual(Case.objects.get(cnr_number=cnrs[1]).stage_of_case, 'Evidence')
+
+
+class CaseHistoryListTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('advocate', 'advocate@example.com', 'secret')
+        user.groups.add(Group.objects.create(name='advocates'))
+        self.case = Case.objects.create(title='Case', type='Civil', case_number='OS 1/2021', created_by=user)
+        CaseHistoryEntry.objects.create(case=self.case, kind='hearing', cells=['a'], position=0, row_hash='a')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_since_accepts_dates_and_datetimes(self):
+        url = reverse('case-history', args=[self.case.pk])
+        for since, count in (('2000-01-01', 1), ('2000-01-01T10:00:00Z', 1), ('2999-01-01', 0)):
+            with self.subTest(since=since):
+                response = self.client.get(url, {'since': since})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), count)
+
+    def test_malformed_since_is_a_bad_request(self):
+        url = reverse('case-history', args=[self.case.pk])
+        for since in ('yesterday', '2026-13-45', '2026-02-30T10:00'):
+            with self.subTest(since=since):
+                response = self.client.get(url, {'since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('since', response.data)
+
+
+class RecordHistoryTests(TestCase):
+
+    SCRAPED = {
+        'case_history': [
+            ['Judge A', '01-02-2024', '15-03-2024', 'Evidence'],
+            ['', '', '', ''],
+            # Identical rows are distinct hearings, told apart by occurrence
+            ['Judge A', '15-03-2024', '15-03-2024', 'Adjourned'],
+            ['Judge A', '15-03-2024', '15-03-2024', 'Adjourned'],
+        ],
+        'order': [['1', '10-01-2024', 'Interim order']],
+    }
+
+    def setUp(self):
+        self.case = Case.objects.create(title='Case', type='Civil', case_number='OS 1/2021')
+        self.events = []
+        case_changed.connect(self.receive)
+        self.addCleanup(case_changed.disconnect, self.receive)
+
+    def receive(self, sender, case, hearings, orders, **kwargs):
+        self.events.append((case, hearings, orders))
+
+    def record(self, scraped):
+        with self.captureOnCommitCallbacks(execute=True):
+            return record_history(self.case, scraped)
+
+    def test_new_rows_are_stored_and_announced_once(self):
+        new = self.record(self.SCRAPED)
+        self.assertEqual([len(new['hearing']), len(new['order'])], [3, 1])
+        self.assertEqual(len(self.events), 1)
+        case, hearings, orders = self.events[0]
+        self.assertEqual(case, self.case)
+        # Receivers get stored rows, with pks
+        self.assertEqual([entry.pk for entry in hearings], list(
+            CaseHistoryEntry.objects.filter(kind='hearing').order_by('position').values_list('pk', flat=True)
+        ))
+        self.assertEqual([entry.position for entry in hearings], [0, 1, 2])
+        self.assertEqual(len({entry.row_hash for entry in hearings}), 3)
+        self.assertEqual(str(hearings[0].entry_date), '2024-03-15')
+        self.assertEqual(str(orders[0].entry_date), '2024-01-10')
+
+        # A re-scrape with nothing new is silent
+        self.assertEqual(self.record(self.SCRAPED), {'hearing': [], 'order': []})
+        self.assertEqual(len(self.events), 1)
+
+    def test_only_rows_not_seen_before_are_announced(self):
+        self.record(self.SCRAPED)
+        scraped = dict(self.SCRAPED, case_history=self.SCRAPED['case_history'] + [
+            ['Judge B', '15-03-2024', '02-05-2024', 'Arguments'],
+        ])
+        self.record(scraped)
+        self.assertEqual(len(self.events), 2)
+        _, hearings, orders = self.events[1]
+        self.assertEqual([entry.cells[3] for entry in hearings], ['Arguments'])
+        self.assertIsNotNone(hearings[0].pk)
+        self.assertEqual(orders, [])
+        self.assertEqual(CaseHistoryEntry.objects.filter(case=self.case).count(), 5)
+
+
+class FakeDriver:
+    def __init__(self, number):
+        self.number = number
+        self.current_url = 'about:blank'
+        self.window_handles = ['main']
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class DriverPoolTests(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        self.created = []
+
+        def factory():
+            driver = FakeDriver(len(self.created))
+            self.created.append(driver)
+            return driver
+
+        return DriverPool(factory=factory, **kwargs)
+
+    def test_checkout_reuses_an_idle_session(self):
+        pool = self.make_pool(size=1)
+        with pool.session() as first:
+            pass
+        with pool.session() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+
+    def test_checkout_times_out_when_every_session_is_busy(self):
+        pool = self.make_pool(size=1)
+        driver = pool.checkout()
+        with self.assertRaisesMessage(DriverPoolTimeout, 'within 0.05 seconds'):
+            pool.checkout(timeout=0.05)
+        pool.checkin(driver)
+        self.assertIs(pool.checkout(timeout=0.05), driver)
+
+    def test_callers_beyond_max_waiting_are_rejected_straight_away(self):
+        pool = self.make_pool(size=1, max_waiting=1)
+        driver = pool.checkout()
+        waiter = {}
+
+        def wait_for_session():
+            waiter['driver'] = pool.checkout(timeout=5)
+
+        thread = threading.Thread(target=wait_for_session)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while pool.stats()['waiting'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        started = time.monotonic()
+        with self.assertRaisesMessage(DriverPoolTimeout, 'Too many scrape requests'):
+            pool.checkout(timeout=5)
+        self.assertLess(time.monotonic() - started, 1)
+
+        pool.checkin(driver)
+        thread.join(5)
+        self.assertIs(waiter['driver'], driver)
+
+    def test_failed_lookup_discards_the_session(self):
+        pool = self.make_pool(size=1)
+        with self.assertRaises(RuntimeError):
+            with pool.session() as driver:
+                raise RuntimeError('page in an unknown state')
+        self.assertTrue(driver.quit_called)
+        self.assertEqual(pool.idle_sessions(), [])
+        with pool.session() as replacement:
+            self.assertIsNot(replacement, driver)
+
+    def test_unhealthy_idle_session_is_replaced_on_checkout(self):
+        pool = self.make_pool(size=1)
+        with pool.session() as driver:
+            pass
+        driver.window_handles = []
+        with pool.session() as replacement:
+            self.assertIsNot(replacement, driver)
+        self.assertTrue(driver.quit_called)
+
+    def test_session_is_recycled_after_max_uses(self):
+        pool = self.make_pool(size=1, max_uses=2)
+        for _ in range(2):
+            with pool.session():
+                pass
+        first = self.created[0]
+        self.assertTrue(first.quit_called)
+        self.assertEqual(pool.idle_sessions(), [])
+        with pool.session() as driver:
+            self.assertIsNot(driver, first)
+        self.assertEqual(len(self.created), 2)
+
+
+class FakeResponse:
+    def __init__(self, text='', content=b'', content_type='text/html', payload=None):
+        self.text = text
+        self.content = content
+        self.headers = {'Content-Type': content_type}
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        if self.payload is None:
+            raise ValueError('No JSON object could be decoded')
+        return self.payload
+
+
+class StubSession:
+    """Stands in for requests.Session: GETs answer the home page or a captcha, POSTs pop ``replies``."""
+
+    def __init__(self, replies, home='<input type="hidden" name="app_token" value="aa11">'):
+        self.replies = list(replies)
+        self.home = home
+        self.posts = []
+
+    def get(self, url, params=None, timeout=None):
+        if url.endswith('securimage_show.php'):
+            return FakeResponse(content=b'captcha-png', content_type='image/png')
+        return FakeResponse(text=self.home)
+
+    def post(self, url, params=None, data=None, headers=None, timeout=None):
+        self.posts.append(data)
+        return self.replies.pop(0)
+
+
+class HTTPEngineTests(SimpleTestCase):
+    def make_client(self, *replies, **kwargs):
+        client = EcourtsHTTPClient(base_url='https://ecourts.test/', timeout=1)
+        client.session = StubSession(replies, **kwargs)
+        return client
+
+    def search(self, client, **kwargs):
+        return search_cnr_over_http('TNCH010012342021', lambda image: 'ab12', client=client, **kwargs)
+
+    def test_token_from_the_home_page_then_from_each_reply(self):
+        html = load_page('case_full')
+        client = self.make_client(
+            FakeResponse(payload={'errormsg': 'Invalid Captcha', 'app_token': 'bb22'}),
+            FakeResponse(payload={'casetype_list': html}),
+        )
+        self.assertEqual(self.search(client), extract_tables(html))
+        self.assertEqual([post['app_token'] for post in client.session.posts], ['aa11', 'bb22'])
+        self.assertEqual(client.session.posts[0]['cino'], 'TNCH010012342021')
+
+    def test_token_in_a_script_assignment(self):
+        client = self.make_client(home="<script>var app_token = 'cc33';</script>")
+        client.open()
+        self.assertEqual(client.app_token, 'cc33')
+
+    def test_rejected_captcha_is_retried_until_the_attempt_budget_runs_out(self):
+        client = self.make_client(*[FakeResponse(payload={'errormsg': 'Invalid Captcha'}) for _ in range(3)])
+        with self.assertRaises(CaptchaRejected):
+            client.search_cnr('TNCH010012342021', 'ab12')
+        with self.assertRaisesMessage(EcourtsHTTPError, 'Captcha not solved after 2 attempts'):
+            self.search(client, max_attempts=2)
+        self.assertEqual(len(client.session.posts), 3)
+
+    def test_reply_that_is_not_json(self):
+        client = self.make_client(FakeResponse(text='<html>Service unavailable</html>'))
+        with self.assertRaisesMessage(EcourtsHTTPError, 'CNR search did not return JSON'):
+            self.search(client)
+
+    def test_error_payload(self):
+        client = self.make_client(FakeResponse(payload={'error': 'Session expired'}))
+        with self.assertRaisesMessage(EcourtsHTTPError, 'Session expired'):
+            self.search(client)
+        client = self.make_client(FakeResponse(payload={}))
+        with self.assertRaisesMessage(EcourtsHTTPError, 'CNR search returned no case data'):
+            self.search(client)
+
+    def test_unknown_cnr(self):
+        client = self.make_client(FakeResponse(payload={'errormsg': 'This Case Code does not exists'}))
+        with self.assertRaisesMessage(CaseNotFound, 'This Case Code does not exists'):
+            self.search(client)
+        self.assertEqual(len(client.session.posts), 1)
+
+
+@mock.patch('case.utils.read_captcha_image', return_value='ab12')
+@mock.patch('case.utils.solve_captcha_and_search_selenium', return_value=SCRAPED)
+class EngineFallbackTests(SimpleTestCase):
+    def lookup(self, *replies):
+        client = EcourtsHTTPClient(base_url='https://ecourts.test/', timeout=1)
+        client.session = StubSession(replies)
+        with mock.patch('case.ecourts_client.EcourtsHTTPClient', return_value=client):
+            return solve_captcha_and_search('TNCH010012342021')
+
+    def test_http_failure_is_logged_and_falls_back_to_selenium(self, selenium, read_captcha):
+        with self.assertLogs('case.utils', 'WARNING') as logs:
+            self.assertEqual(self.lookup(FakeResponse(text='maintenance')), SCRAPED)
+        selenium.assert_called_once()
+        self.assertIn('HTTP scrape failed for TNCH010012342021, falling back to Selenium', logs.output[0])
+
+    def test_unknown_cnr_does_not_fall_back(self, selenium, read_captcha):
+        with self.assertRaises(CaseNotFound):
+            self.lookup(FakeResponse(payload={'errormsg': 'Invalid CNR Number'}))
+        selenium.assert_not_called()
+
+
+class TemplateCaptchaSolverTests(SimpleTestCase):
+    """test_pages/captchas/train is the labelled corpus; read/ holds captchas the solver never saw."""
+
+    def setUp(self):
+        self.corpus = load_corpus(os.path.join(CAPTCHAS, 'train'))
+        self.unseen = dict((label, image) for image, label in load_corpus(os.path.join(CAPTCHAS, 'read')))
+
+    def test_corpus_labels_come_from_the_file_names(self):
+        self.assertEqual(sorted(label for _, label in self.corpus), ['12ab', '3pk7', 'a1b2', 'ab12', 'b2a1', 'k7p3'])
+
+    def test_segmentation_finds_one_glyph_per_character(self):
+        for image, label in self.corpus + [(image, label) for label, image in self.unseen.items()]:
+            with self.subTest(label=label):
+                self.assertEqual(len(segment(binarize(image))), len(label))
+
+    def test_touching_characters_are_split_evenly(self):
+        ink = Image.new('L', (40, 10), 0)
+        ink.paste(255, (2, 2, 8, 8))
+        ink.paste(255, (11, 2, 17, 8))
+        # Two glyphs with no blank column between them
+        ink.paste(255, (20, 2, 32, 8))
+        self.assertEqual([glyph.size for glyph in segment(ink)], [(6, 6)] * 4)
+
+    def test_trained_templates_read_unseen_captchas(self):
+        solver = TemplateCaptchaSolver.train(self.corpus)
+        self.assertEqual({char for char, _ in solver.templates}, set('12ab37kp'))
+        self.assertEqual(solver.solve(self.unseen['ba21']), 'ba21')
+        self.assertEqual(solver.solve(self.unseen['7k3p']), '7k3p')
+
+    def test_unknown_glyph_rejects_the_whole_read(self):
+        solver = TemplateCaptchaSolver.train(self.corpus)
+        self.assertEqual(solver.solve(self.unseen['abxz']), '')
+        self.assertEqual(TemplateCaptchaSolver([]).solve(self.unseen['ba21']), '')
+        self.assertEqual(solver.solve(b'not an image'), '')
+
+    def test_samples_that_segment_badly_are_skipped(self):
+        image, _ = self.corpus[0]
+        self.assertEqual(TemplateCaptchaSolver.train([(image, 'abc')]).templates, [])
+        self.assertEqual(len(TemplateCaptchaSolver.train(self.corpus, per_char=1).templates), 8)
+
+    def test_train_command_writes_templates_the_solver_loads(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'templates.json')
+            stdout = StringIO()
+            call_command('train_captcha_solver', os.path.join(CAPTCHAS, 'train'), '--output', output, stdout=stdout)
+            self.assertIn('for 8 characters from 6 samples', stdout.getvalue())
+            solver = TemplateCaptchaSolver.load(output)
+        self.assertEqual(solver.templates, TemplateCaptchaSolver.train(self.corpus).templates)
+        self.assertEqual(solver.solve(self.unseen['ba21']), 'ba21')
+
+    def test_train_command_needs_images(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesMessage(CommandError, 'No captcha images found'):
+                call_command('train_captcha_solver', directory)
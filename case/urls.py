@@ -5,7 +5,11 @@ urlpatterns = [
     # Advocate-only endpoints
     path('api/case/', views.CaseListCreateView.as_view(), name='case-list-create'),
     path('api/case/<int:pk>/', views.CaseRetrieveUpdateDestroyView.as_view(), name='case-detail'),
+    path('api/case/<int:pk>/history/', views.CaseHistoryListView.as_view(), name='case-history'),
     path('api/case/scrape/<str:cnr_number>/', views.CaseScrapeView.as_view(), name='case-scrape'),
+    path('api/case/scrape-jobs/', views.ScrapeJobCreateView.as_view(), name='case-scrape-job-create'),
+    path('api/case/scrape-jobs/<int:pk>/', views.ScrapeJobDetailView.as_view(), name='case-scrape-job-detail'),
+    path('api/case/scrape-jobs/<int:pk>/cancel/', views.ScrapeJobCancelView.as_view(), name='case-scrape-job-cancel'),
     # Client-only endpoints
     path('api/client/case/', views.ClientCaseListView.as_view(), name='client-case-list'),
     path('api/client/case/<int:pk>/', views.ClientCaseDetailView.as_view(), name='client-case-detail'),
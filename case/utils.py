@@ -1,9 +1,30 @@
+import logging
 import time
-import re
-import requests
 from selenium.webdriver.common.by import By
-from .webdriver_manager import get_driver
+from django.conf import settings
+from .webdriver_manager import get_driver_pool
+from .ecourts_client import EcourtsHTTPError, search_cnr_over_http
+from .html_tables import extract_tables
+from .captcha import get_captcha_solver
 
+logger = logging.getLogger(__name__)
+
+
+class ScrapeTimeout(Exception):
+    """The lookup ran past its deadline or captcha attempt budget."""
+
+
+class ScrapeCancelled(Exception):
+    """The lookup was cancelled by its caller."""
+
+
+def _make_checkpoint(deadline, should_cancel):
+    def checkpoint():
+        if should_cancel and should_cancel():
+            raise ScrapeCancelled("Scrape was cancelled")
+        if deadline and time.monotonic() > deadline:
+            raise ScrapeTimeout("Scrape did not finish in time")
+    return checkpoint
 
 
 def read_captcha(driver):
@@ -13,156 +34,56 @@ def read_captcha(driver):
     
     # Get the CAPTCHA image as PNG bytes
     image_bytes = captcha_element.screenshot_as_png
-    
-    # Send the image bytes directly to OCR.Space API
-    response = requests.post(
-        'https://api.ocr.space/parse/image',
-        files={'filename': ('captcha.png', image_bytes, 'image/png')},
-        data={'apikey': 'K83085402488957', 'OCREngine': '2'}
-    )
-
-    result = response.json()
-    try:
-        raw_text = result['ParsedResults'][0]['ParsedText'].strip()
-        filtered_text = re.sub(r'[^a-z0-9]', '', raw_text.lower())
-        return filtered_text
-    except:
-        return ""
-
-def solve_captcha_and_search(cnr_number):
-    driver = get_driver()
-
-    driver.get("https://services.ecourts.gov.in/")
-    while True:
-        cnr_input = driver.find_element(By.ID, "cino")
-        cnr_input.clear()
-        cnr_input.send_keys(cnr_number)
-
-        captcha_text = read_captcha(driver)
-        if not captcha_text or len(captcha_text.strip()) < 4:
-            driver.refresh()
-            continue
-
-        captcha_input = driver.find_element(By.ID, "fcaptcha_code")
-        captcha_input.clear()
-        captcha_input.send_keys(captcha_text)
-        driver.find_element(By.ID, "searchbtn").click()
-        time.sleep(2)
-
-        error_style = driver.find_element(By.ID, "validateError").get_attribute("style")
-        if "display: none" in error_style:
-            break
-        else:
+    return read_captcha_image(image_bytes)
+
+def read_captcha_image(image_bytes):
+    return get_captcha_solver().solve(image_bytes)
+
+def solve_captcha_and_search(cnr_number, deadline=None, should_cancel=None):
+    """
+    Look up a CNR on eCourts and return its case tables.
+
+    ``deadline`` is a ``time.monotonic()`` value after which the lookup gives
+    up with ScrapeTimeout; ``should_cancel`` is polled between captcha attempts
+    and ends the lookup with ScrapeCancelled when it returns True. A CNR that
+    eCourts does not know raises CaseNotFound without trying Selenium.
+    """
+    checkpoint = _make_checkpoint(deadline, should_cancel)
+
+    # Browserless lookup first; the Selenium flow only runs when it fails
+    if getattr(settings, 'CASE_SCRAPE_ENGINE', 'http') == 'http':
+        try:
+            return search_cnr_over_http(cnr_number, read_captcha_image, checkpoint=checkpoint)
+        except EcourtsHTTPError as e:
+            logger.warning("HTTP scrape failed for %s, falling back to Selenium: %s", cnr_number, e)
+    return solve_captcha_and_search_selenium(cnr_number, checkpoint=checkpoint)
+
+def solve_captcha_and_search_selenium(cnr_number, checkpoint=None):
+    max_attempts = getattr(settings, 'CASE_SCRAPE_MAX_CAPTCHA_ATTEMPTS', 15)
+    with get_driver_pool().session() as driver:
+        driver.get(getattr(settings, 'ECOURTS_HOME_URL', "https://services.ecourts.gov.in/"))
+        for _ in range(max_attempts):
+            if checkpoint:
+                checkpoint()
+            cnr_input = driver.find_element(By.ID, "cino")
+            cnr_input.clear()
+            cnr_input.send_keys(cnr_number)
+
+            captcha_text = read_captcha(driver)
+            if not captcha_text or len(captcha_text.strip()) < 4:
+                driver.refresh()
+                continue
+
+            captcha_input = driver.find_element(By.ID, "fcaptcha_code")
+            captcha_input.clear()
+            captcha_input.send_keys(captcha_text)
+            driver.find_element(By.ID, "searchbtn").click()
+            time.sleep(2)
+
+            error_style = driver.find_element(By.ID, "validateError").get_attribute("style")
+            if "display: none" in error_style:
+                # One page_source read instead of a WebDriver round-trip per row and cell
+                return extract_tables(driver.page_source)
             time.sleep(1)
-            continue
-
-    return {
-        'case_details': extract_case_details_table(driver),
-        'case_status': extract_case_status_table(driver),
-        'petitioner_advocate': extract_petitioner_advocate_table(driver),
-        'respondent_advocate': extract_respondent_advocate_table(driver),
-        'acts': extract_acts_table(driver),
-        'case_history': extract_history_table(driver),
-        'order': extract_order_table(driver),
-    }
-
-# 🧩 TABLE PARSERS
-from selenium.webdriver.common.by import By
 
-def extract_case_details_table(driver):
-    try:
-        table = driver.find_element(By.CSS_SELECTOR, ".table.case_details_table.table-bordered")
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        extracted_data = []
-
-        for row in rows:
-            columns = row.find_elements(By.TAG_NAME, "td")
-            extracted_data.append([col.text.strip() for col in columns])
-
-        return extracted_data
-    except:
-        return []
-
-def extract_case_status_table(driver):
-    try:
-        table = driver.find_element(By.CSS_SELECTOR, ".table.case_status_table.table-bordered")
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        extracted_data = []
-
-        for row in rows:
-            columns = row.find_elements(By.TAG_NAME, "td")
-            extracted_data.append([col.text.strip() for col in columns])
-
-        return extracted_data
-    except:
-        return []
-
-def extract_petitioner_advocate_table(driver):
-    try:
-        table = driver.find_element(By.CSS_SELECTOR, ".table.table-bordered.Petitioner_Advocate_table")
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        extracted_data = []
-
-        for row in rows:
-            columns = row.find_elements(By.TAG_NAME, "td")
-            extracted_data.append([col.text.strip() for col in columns])
-
-        return extracted_data
-    except:
-        return []
-
-def extract_respondent_advocate_table(driver):
-    try:
-        table = driver.find_element(By.CSS_SELECTOR, ".table.table-bordered.Respondent_Advocate_table")
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        extracted_data = []
-
-        for row in rows:
-            columns = row.find_elements(By.TAG_NAME, "td")
-            extracted_data.append([col.text.strip() for col in columns])
-
-        return extracted_data
-    except:
-        return []
-
-def extract_acts_table(driver):
-    try:
-        table = driver.find_element(By.CSS_SELECTOR, ".table.acts_table.table-bordered")
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        extracted_data = []
-
-        for row in rows:
-            columns = row.find_elements(By.TAG_NAME, "td")
-            extracted_data.append([col.text.strip() for col in columns])
-
-        return extracted_data
-    except:
-        return []
-
-def extract_history_table(driver):
-    try:
-        table = driver.find_element(By.CLASS_NAME, "history_table")
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        extracted_data = []
-
-        for row in rows:
-            columns = row.find_elements(By.TAG_NAME, "td")
-            extracted_data.append([col.text.strip() for col in columns])
-
-        return extracted_data
-    except:
-        return []
-
-def extract_order_table(driver):
-    try:
-        table = driver.find_element(By.CSS_SELECTOR, ".table.order_table.table")
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        extracted_data = []
-
-        for row in rows:
-            columns = row.find_elements(By.TAG_NAME, "td")
-            extracted_data.append([col.text.strip() for col in columns])
-
-        return extracted_data
-    except:
-        return []
\ No newline at end of file
+    raise ScrapeTimeout(f"Captcha not solved after {max_attempts} attempts")
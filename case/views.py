@@ -3,11 +3,20 @@ from rest_framework import generics, views
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Case
+import time
+from datetime import datetime
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Case, ScrapeJob, CaseHistoryEntry
 from client.models import Client
 from advocate.models import Advocate
 from django.contrib.auth.models import User
-from .utils import solve_captcha_and_search
+from .ecourts_client import CaseNotFound
+from .utils import ScrapeTimeout
+from .jobs import create_job, cancel_job
+from .cache import get_case_data
+from .webdriver_manager import DriverPoolTimeout
 
 # Custom permission for advocates group
 class IsAdvocate(BasePermission):
@@ -24,6 +33,9 @@ class IsJunior(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.groups.filter(name='junior').exists()
 
+def _is_truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
 class CaseSerializer(serializers.ModelSerializer):
     client = serializers.PrimaryKeyRelatedField(
         queryset=Client.objects.all(),
@@ -90,6 +102,21 @@ class JuniorCaseSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields  # All fields are read-only for junior advocates
 
+class ScrapeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScrapeJob
+        fields = [
+            'id', 'cnr_number', 'status', 'attempts', 'max_attempts', 'result',
+            'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+class CaseHistoryEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CaseHistoryEntry
+        fields = ['id', 'kind', 'entry_date', 'cells', 'position', 'created_at']
+        read_only_fields = fields
+
 class CaseListCreateView(generics.ListCreateAPIView):
     queryset = Case.objects.all()
     serializer_class = CaseSerializer
@@ -117,14 +144,111 @@ class CaseScrapeView(views.APIView):
             )
 
         try:
-            scraped_data = solve_captcha_and_search(cnr_number)
-            return Response(scraped_data, status=status.HTTP_200_OK)
+            deadline = time.monotonic() + getattr(settings, 'CASE_SCRAPE_TIMEOUT', 120)
+            scraped_data, cache_state = get_case_data(
+                cnr_number,
+                force_refresh=_is_truthy(request.query_params.get('refresh')),
+                deadline=deadline,
+            )
+            response = Response(scraped_data, status=status.HTTP_200_OK)
+            response['X-Cache'] = cache_state.upper()
+            return response
+        except CaseNotFound as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except ScrapeTimeout as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+        except DriverPoolTimeout as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             return Response(
                 {"error": f"Failed to scrape data: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def _parse_since(value):
+    """?since= as an aware datetime; a bare date means midnight of that day."""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is not None:
+                parsed = datetime.combine(day, datetime.min.time())
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise serializers.ValidationError({'since': "Enter a valid ISO 8601 date or datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+class CaseHistoryListView(generics.ListAPIView):
+    serializer_class = CaseHistoryEntrySerializer
+    permission_classes = [IsAuthenticated, IsAdvocate]
+
+    def get_queryset(self):
+        queryset = CaseHistoryEntry.objects.filter(
+            case_id=self.kwargs['pk'],
+            case__created_by=self.request.user
+        )
+        kind = self.request.query_params.get('kind')
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        since = self.request.query_params.get('since')
+        if since:
+            queryset = queryset.filter(created_at__gte=_parse_since(since))
+        return queryset.order_by('kind', 'position')
+
+class ScrapeJobCreateView(views.APIView):
+    permission_classes = [IsAuthenticated, IsAdvocate]
+
+    def post(self, request):
+        cnr_number = (request.data.get('cnr_number') or '').strip()
+        if not cnr_number:
+            return Response(
+                {"error": "CNR number is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        job = create_job(
+            cnr_number,
+            user=request.user,
+            force_refresh=_is_truthy(request.data.get('refresh')),
+        )
+        return Response(ScrapeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class ScrapeJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ScrapeJobSerializer
+    permission_classes = [IsAuthenticated, IsAdvocate]
+
+    def get_queryset(self):
+        return ScrapeJob.objects.filter(created_by=self.request.user)
+
+class ScrapeJobCancelView(generics.GenericAPIView):
+    serializer_class = ScrapeJobSerializer
+    permission_classes = [IsAuthenticated, IsAdvocate]
+
+    def get_queryset(self):
+        return ScrapeJob.objects.filter(created_by=self.request.user)
+
+    def post(self, request, pk):
+        job = self.get_object()
+        if not cancel_job(job):
+            return Response(
+                {"error": f"Job is already {job.status}"},
+                status=status.HTTP_409_CONFLICT
+            )
+        job.refresh_from_db()
+        return Response(ScrapeJobSerializer(job).data, status=status.HTTP_200_OK)
+
 class ClientCaseListView(generics.ListAPIView):
     serializer_class = ClientCaseSerializer
     permission_classes = [IsAuthenticated, IsClient]
@@ -1,36 +1,178 @@
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from django.conf import settings
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 
-_driver = None
-
-def get_driver():
-    global _driver
-    if _driver is None:
-        options = Options()
-        options.add_argument('--headless=new')
-        options.add_argument('--disable-gpu')
-        options.add_argument('window-size=1920,1080')
-        options.add_argument('--no-sandbox')  # important for headless Chrome on servers
-        options.add_argument('--disable-dev-shm-usage')  # avoid limited /dev/shm on container systems
-        options.add_argument('--log-level=3')
-        options.add_experimental_option("excludeSwitches", ["enable-logging"])
-
-        # Set webdriver-manager cache path to /tmp
-        os.environ['WDM_LOCAL'] = '1'
-        os.environ['WDM_CACHE_DIR'] = '/tmp'
-
-        chrome_service = Service(ChromeDriverManager().install())
-        _driver = webdriver.Chrome(service=chrome_service, options=options)
-        _driver.set_page_load_timeout(20)
-        _driver.get("https://services.ecourts.gov.in/")
-    
-    return _driver
+
+class DriverPoolTimeout(Exception):
+    """Raised when no browser session could be checked out in time."""
+
+
+def create_driver():
+    options = Options()
+    options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('window-size=1920,1080')
+    options.add_argument('--no-sandbox')  # important for headless Chrome on servers
+    options.add_argument('--disable-dev-shm-usage')  # avoid limited /dev/shm on container systems
+    options.add_argument('--log-level=3')
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
+
+    # Set webdriver-manager cache path to /tmp
+    os.environ['WDM_LOCAL'] = '1'
+    os.environ['WDM_CACHE_DIR'] = '/tmp'
+
+    chrome_service = Service(ChromeDriverManager().install())
+    driver = webdriver.Chrome(service=chrome_service, options=options)
+    driver.set_page_load_timeout(20)
+    return driver
+
+
+class DriverPool:
+    """
+    Bounded pool of headless Chrome sessions.
+
+    At most ``size`` sessions exist at once. Callers wait up to ``wait_timeout``
+    seconds for a free session, and at most ``max_waiting`` callers may wait at
+    the same time; anyone beyond that is rejected straight away so a burst of
+    lookups cannot pile up behind the browsers. Sessions are health-checked on
+    checkout and recycled after ``max_uses`` lookups.
+    """
+
+    def __init__(self, size=2, max_uses=50, wait_timeout=30, max_waiting=10, factory=create_driver):
+        self.size = size
+        self.max_uses = max_uses
+        self.wait_timeout = wait_timeout
+        self.max_waiting = max_waiting
+        self._factory = factory
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def checkout(self, timeout=None):
+        timeout = self.wait_timeout if timeout is None else timeout
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                raise DriverPoolTimeout("Too many scrape requests are waiting for a browser session")
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise DriverPoolTimeout(f"No browser session became free within {timeout} seconds")
+
+        try:
+            return self._take_healthy_driver()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def checkin(self, driver, discard=False):
+        try:
+            with self._lock:
+                uses = self._uses.get(id(driver), 0) + 1
+                self._uses[id(driver)] = uses
+            if discard or uses >= self.max_uses:
+                self._destroy(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self, timeout=None):
+        driver = self.checkout(timeout=timeout)
+        discard = False
+        try:
+            yield driver
+        except Exception:
+            # A failed lookup may leave the page in an unknown state
+            discard = True
+            raise
+        finally:
+            self.checkin(driver, discard=discard)
+
+    def close_all(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(driver)
+
+    def idle_sessions(self):
+        return list(self._idle.queue)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': self._idle.qsize(),
+                'waiting': self._waiting,
+            }
+
+    def _take_healthy_driver(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_healthy(driver):
+                return driver
+            self._destroy(driver)
+
+        driver = self._factory()
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            driver.current_url
+            return bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def _destroy(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DriverPool(
+                    size=getattr(settings, 'CASE_SCRAPE_POOL_SIZE', 2),
+                    max_uses=getattr(settings, 'CASE_SCRAPE_POOL_MAX_USES', 50),
+                    wait_timeout=getattr(settings, 'CASE_SCRAPE_POOL_WAIT_TIMEOUT', 30),
+                    max_waiting=getattr(settings, 'CASE_SCRAPE_POOL_MAX_WAITING', 10),
+                )
+    return _pool
+
 
 def quit_driver():
-    global _driver
-    if _driver is not None:
-        _driver.quit()
-        _driver = None
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
@@ -164,6 +164,24 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+# Background work (scrape refreshes, reminders, image variants) logs its
+# failures; the project apps' warnings and errors go to the console
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        app: {"handlers": ["console"], "level": "WARNING"}
+        for app in ["case", "forum", "reminder"]
+    },
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -234,3 +252,82 @@ WAGTAILDOCS_EXTENSIONS = [
     "xlsx",
     "zip",
 ]
+
+
+# Case scraping (eCourts)
+
+# Maximum number of headless Chrome sessions per process
+CASE_SCRAPE_POOL_SIZE = 2
+# Sessions are recycled after this many lookups
+CASE_SCRAPE_POOL_MAX_USES = 50
+# Seconds a lookup waits for a free session before giving up
+CASE_SCRAPE_POOL_WAIT_TIMEOUT = 30
+# Lookups allowed to queue for a session; further requests are rejected
+CASE_SCRAPE_POOL_MAX_WAITING = 10
+
+# "http" tries the browserless client first and falls back to Selenium;
+# "selenium" always drives Chrome
+CASE_SCRAPE_ENGINE = "http"
+ECOURTS_BASE_URL = "https://services.ecourts.gov.in/ecourtindia_v6/"
+# Page the Selenium flow opens
+ECOURTS_HOME_URL = "https://services.ecourts.gov.in/"
+# When set, successful HTTP lookups are saved here as replay fixtures
+ECOURTS_RECORD_DIR = None
+ECOURTS_HTTP_TIMEOUT = 15
+# Captcha attempts made over HTTP before falling back to Selenium
+ECOURTS_HTTP_MAX_ATTEMPTS = 8
+# Captcha attempts made by the Selenium flow before giving up
+CASE_SCRAPE_MAX_CAPTCHA_ATTEMPTS = 15
+# Seconds the blocking scrape endpoint may spend on one lookup
+CASE_SCRAPE_TIMEOUT = 120
+
+# Background scrape jobs: in-process workers, attempts per job and seconds per attempt
+CASE_SCRAPE_JOB_WORKERS = 2
+CASE_SCRAPE_JOB_MAX_ATTEMPTS = 3
+CASE_SCRAPE_JOB_TIMEOUT = 180
+
+# Scrape results are served from the cache for CASE_SCRAPE_CACHE_TTL seconds,
+# then returned stale (while refreshing in the background) for a further
+# CASE_SCRAPE_CACHE_STALE_TTL seconds before a lookup has to wait for a scrape
+CASE_SCRAPE_CACHE_TTL = 6 * 60 * 60
+CASE_SCRAPE_CACHE_STALE_TTL = 7 * 24 * 60 * 60
+
+# Captcha solver: "local" (templates, falling back to OCR.Space), "template",
+# "ocrspace" or a dotted path to a case.captcha.CaptchaSolver subclass.
+# Build the templates with `manage.py train_captcha_solver <corpus>`.
+CASE_CAPTCHA_SOLVER = "local"
+CASE_CAPTCHA_TEMPLATES = os.path.join(BASE_DIR, "case", "captcha_templates.json")
+# Glyphs further than this many bits from every template make the read fail
+CASE_CAPTCHA_MAX_DISTANCE = 40
+OCR_SPACE_TIMEOUT = 10
+
+# Court dropdowns are served from the local directory (filled by
+# `manage.py sync_court_directory`); listings are cached in-process this long
+COURT_DIRECTORY_CACHE_TTL = 300
+
+# Reminder scheduler (`manage.py run_reminder_scheduler`): dotted path to a
+# reminder.scheduler.WhatsAppTransport subclass used for WhatsApp numbers
+REMINDER_WHATSAPP_TRANSPORT = "reminder.scheduler.ConsoleWhatsAppTransport"
+# Zone the reminder date and time fields are entered in (TIME_ZONE stays UTC)
+REMINDER_TIME_ZONE = "Asia/Kolkata"
+
+# Invoice numbers: PREFIX-00001, or PREFIX-<year>-00001 with a counter per year
+INVOICE_NUMBER_PREFIX = "INV"
+INVOICE_NUMBER_PER_YEAR = False
+
+# Bulk invoice export: processes rendering PDFs for /api/invoice/export/
+INVOICE_EXPORT_WORKERS = 2
+
+# Forum feeds use cursor pagination; ?include_total=1 adds a post count that
+# is cached (and so approximate) for this many seconds
+FORUM_FEED_TOTAL_CACHE_TTL = 60
+
+# Comments embedded per post in feeds; older ones are paged from
+# /api/posts/<id>/comments/
+FORUM_FEED_COMMENTS = 3
+
+# Forum image uploads get WebP and JPEG copies at these widths, encoded at
+# this quality by background threads
+FORUM_IMAGE_WIDTHS = [320, 640, 1280]
+FORUM_IMAGE_QUALITY = 80
+FORUM_THUMBNAIL_WORKERS = 2
@@ -1,3 +1,5 @@
+import os
+
 #EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "smtp.gmail.com"
@@ -22,3 +24,26 @@ EMAIL_CUSTOM_HEADER = {
 #When mail is disabled (set to false), emails won't be sent except for password reset.
 ENABLE_EMAIL = True
 
+
+# Bulk sending (mail.mailer.send_mass_email) and use_thread sends: worker
+# threads (one SMTP connection each), retries per message and base backoff seconds
+MAIL_SEND_WORKERS = 4
+MAIL_SEND_MAX_RETRIES = 3
+MAIL_SEND_RETRY_BACKOFF = 1.0
+
+# Outbox: send_email only queues; `manage.py run_mail_outbox` sends. A message
+# is retried after MAIL_OUTBOX_RETRY_BACKOFF * 2^n seconds and dead-lettered
+# after MAIL_OUTBOX_MAX_ATTEMPTS; "sending" rows older than
+# MAIL_OUTBOX_STUCK_AFTER seconds are assumed orphaned and queued again.
+# Off unless MAIL_USE_OUTBOX=true: a deploy that sets it must also run the
+# worker (the EC2 deploy starts run_mail_outbox under PM2), or mail is never sent
+MAIL_USE_OUTBOX = os.getenv("MAIL_USE_OUTBOX", "false").lower() == "true"
+MAIL_OUTBOX_MAX_ATTEMPTS = 5
+MAIL_OUTBOX_RETRY_BACKOFF = 30
+MAIL_OUTBOX_STUCK_AFTER = 600
+
+# Rich-text emails: compiled HTML is cached per distinct content (entries,
+# seconds) and attachment file contents in an LRU of at most this many bytes
+MAIL_COMPILED_CACHE_SIZE = 256
+MAIL_COMPILED_CACHE_TTL = 300
+MAIL_ATTACHMENT_CACHE_BYTES = 32 * 1024 * 1024
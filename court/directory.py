@@ -0,0 +1,196 @@
+import hashlib
+import json
+import threading
+import time
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import DirectoryState, DirectoryDistrict, DirectoryComplex, DirectoryCourt
+
+BASE_URL = "https://phoenix.akshit.me/district-court"
+
+# Reused keep-alive connections to Phoenix for syncs and cache misses
+_session = requests.Session()
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class DirectoryUnavailable(Exception):
+    """Nothing is stored locally for the request and Phoenix could not be reached."""
+
+
+def _phoenix(endpoint, payload, key):
+    try:
+        response = _session.post(f"{BASE_URL}/{endpoint}", json=payload, timeout=10)
+        response.raise_for_status()
+        return response.json().get(key, [])
+    except (requests.RequestException, ValueError) as e:
+        raise DirectoryUnavailable(str(e))
+
+
+def _store_children(district, complexes, courts):
+    DirectoryComplex.objects.filter(district=district).delete()
+    DirectoryCourt.objects.filter(district=district).delete()
+    DirectoryComplex.objects.bulk_create([
+        DirectoryComplex(district=district, external_id=str(item['id']), name=item['name'])
+        for item in complexes
+    ])
+    DirectoryCourt.objects.bulk_create([
+        DirectoryCourt(district=district, external_id=str(item['id']), name=item['name'])
+        for item in courts
+    ])
+    district.synced_at = timezone.now()
+    district.save(update_fields=['synced_at'])
+
+
+def _sync_district(district):
+    complexes = _phoenix('complexes', {"districtId": district.external_id}, 'complexes')
+    courts = _phoenix('courts', {"districtId": district.external_id}, 'courts')
+    with transaction.atomic():
+        _store_children(district, complexes, courts)
+
+
+def _sync_state(state, deep=True):
+    districts = _phoenix('districts', {"stateId": state.external_id}, 'districts')
+    with transaction.atomic():
+        keep = []
+        for item in districts:
+            district, _ = DirectoryDistrict.objects.update_or_create(
+                state=state, external_id=str(item['id']), defaults={'name': item['name']}
+            )
+            keep.append(district.pk)
+        DirectoryDistrict.objects.filter(state=state).exclude(pk__in=keep).delete()
+        state.synced_at = timezone.now()
+        state.save(update_fields=['synced_at'])
+    if deep:
+        for district in DirectoryDistrict.objects.filter(state=state):
+            _sync_district(district)
+
+
+def sync_directory(force=False, state_ids=None, log=print):
+    """
+    Bring the local directory up to date with Phoenix.
+
+    Only states whose ``version`` changed (or that were never synced) are
+    re-fetched, unless ``force`` is set. Districts whose complexes and courts
+    were never fetched are filled in as well; a dropdown request stores a
+    state's districts without them. Returns the number of states synced.
+    """
+    states = _phoenix('states', {}, 'states')
+    synced = 0
+    for item in states:
+        external_id = str(item['id'])
+        if state_ids and external_id not in state_ids:
+            continue
+        version = str(item.get('version') or '')
+        state, created = DirectoryState.objects.get_or_create(
+            external_id=external_id, defaults={'name': item['name'], 'version': version}
+        )
+        if not (force or created or state.synced_at is None or state.version != version):
+            pending = list(state.districts.filter(synced_at__isnull=True))
+            if pending:
+                log(f"Syncing courts of {len(pending)} district(s) in {state.name}")
+                for district in pending:
+                    _sync_district(district)
+                synced += 1
+            continue
+        previous = '' if created else state.version
+        log(f"Syncing {item['name']} (version {previous or '-'} -> {version or '-'})")
+        _sync_state(state)
+        state.name, state.version = item['name'], version
+        state.save(update_fields=['name', 'version'])
+        synced += 1
+    clear_cache()
+    return synced
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _cached(key, loader):
+    """Return ``(payload, etag)`` from the in-process cache, loading it on a miss or expiry."""
+    ttl = getattr(settings, 'COURT_DIRECTORY_CACHE_TTL', 300)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+    if hit and now - hit[2] < ttl:
+        return hit[0], hit[1]
+
+    payload = loader()
+    etag = '"%s"' % hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+    with _cache_lock:
+        _cache[key] = (payload, etag, now)
+    return payload, etag
+
+
+def _states():
+    if not DirectoryState.objects.exists():
+        # Never synced: fill the state list from Phoenix once
+        for item in _phoenix('states', {}, 'states'):
+            DirectoryState.objects.get_or_create(
+                external_id=str(item['id']),
+                defaults={'name': item['name'], 'version': str(item.get('version') or '')},
+            )
+    return [
+        {'id': state.external_id, 'name': state.name, 'version': state.version}
+        for state in DirectoryState.objects.all()
+    ]
+
+
+def _state(state_id):
+    state = DirectoryState.objects.filter(external_id=state_id).first()
+    if state is None:
+        _states()
+        state = DirectoryState.objects.filter(external_id=state_id).first()
+    return state
+
+
+def _district(district_id):
+    district = DirectoryDistrict.objects.filter(external_id=district_id).select_related('state').first()
+    if district is not None and district.synced_at is None:
+        _sync_district(district)
+    return district
+
+
+def get_states():
+    return _cached(('states',), _states)
+
+
+def get_districts(state_id):
+    def load():
+        state = _state(state_id)
+        if state is None:
+            return []
+        if state.synced_at is None:
+            _sync_state(state, deep=False)
+        return [{'id': d.external_id, 'name': d.name} for d in state.districts.all()]
+    return _cached(('districts', str(state_id)), load)
+
+
+def get_complexes(district_id):
+    def load():
+        district = _district(district_id)
+        if district is None:
+            # District of a state that has not been synced yet; answer live
+            return [
+                {'id': str(item['id']), 'name': item['name']}
+                for item in _phoenix('complexes', {"districtId": district_id}, 'complexes')
+            ]
+        return [{'id': c.external_id, 'name': c.name} for c in district.complexes.all()]
+    return _cached(('complexes', str(district_id)), load)
+
+
+def get_courts(district_id):
+    def load():
+        district = _district(district_id)
+        if district is None:
+            return [
+                {'id': str(item['id']), 'name': item['name']}
+                for item in _phoenix('courts', {"districtId": district_id}, 'courts')
+            ]
+        return [{'id': c.external_id, 'name': c.name} for c in district.courts.all()]
+    return _cached(('courts', str(district_id)), load)
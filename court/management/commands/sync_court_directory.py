@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from court.directory import DirectoryUnavailable, sync_directory
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy states, districts, court complexes and courts from Phoenix into the local "
+        "court directory. States whose version has not changed since the last run are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-fetch every state, even unchanged ones")
+        parser.add_argument('--state', action='append', dest='states', default=None,
+                            help="Only sync this state id (can be repeated)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            synced = sync_directory(force=options['force'], state_ids=options['states'], log=self.stdout.write)
+        except DirectoryUnavailable as e:
+            raise CommandError(f"Phoenix is unavailable: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {synced} state(s) in {time.monotonic() - started:.1f}s"
+        ))
@@ -47,6 +47,63 @@ class Court(models.Model):
         verbose_name = "Court Entry"
         verbose_name_plural = "Court Entries"
 
+class DirectoryState(models.Model):
+    external_id = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=200)
+    version = models.CharField(max_length=50, blank=True, default='')
+    synced_at = models.DateTimeField(blank=True, null=True, help_text="When districts and courts were last fetched")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "Directory State"
+        verbose_name_plural = "Directory States"
+        ordering = ['name']
+
+class DirectoryDistrict(models.Model):
+    state = models.ForeignKey(DirectoryState, on_delete=models.CASCADE, related_name='districts')
+    external_id = models.CharField(max_length=50)
+    name = models.CharField(max_length=200)
+    synced_at = models.DateTimeField(blank=True, null=True, help_text="When complexes and courts were last fetched")
+
+    def __str__(self):
+        return f"{self.state.name} - {self.name}"
+
+    class Meta:
+        verbose_name = "Directory District"
+        verbose_name_plural = "Directory Districts"
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['state', 'external_id'], name='unique_directory_district'),
+        ]
+
+class DirectoryComplex(models.Model):
+    district = models.ForeignKey(DirectoryDistrict, on_delete=models.CASCADE, related_name='complexes')
+    external_id = models.CharField(max_length=50)
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "Directory Court Complex"
+        verbose_name_plural = "Directory Court Complexes"
+        ordering = ['name']
+
+class DirectoryCourt(models.Model):
+    district = models.ForeignKey(DirectoryDistrict, on_delete=models.CASCADE, related_name='courts')
+    external_id = models.CharField(max_length=50)
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "Directory Court"
+        verbose_name_plural = "Directory Courts"
+        ordering = ['name']
+
 class CourtSnippetViewSet(SnippetViewSet):
     model = Court
     icon = 'doc-full-inverse'
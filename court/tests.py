@@ -1,3 +1,46 @@
+from unittest import mock
 from django.test import TestCase
+from . import directory
+from .models import DirectoryDistrict, DirectoryState
 
-# Create your tests here.
+PHOENIX = {
+    'states': {'states': [{'id': 1, 'name': 'Tamil Nadu', 'version': 'v1'}]},
+    'districts': {'districts': [{'id': 10, 'name': 'Chennai'}, {'id': 11, 'name': 'Madurai'}]},
+    'complexes': {'complexes': [{'id': 100, 'name': 'City Civil Court'}]},
+    'courts': {'courts': [{'id': 200, 'name': 'II Additional District Court'}]},
+}
+
+
+def fake_phoenix(endpoint, payload, key):
+    return PHOENIX[endpoint][key]
+
+
+@mock.patch('court.directory._phoenix', side_effect=fake_phoenix)
+class SyncDirectoryTests(TestCase):
+
+    def setUp(self):
+        directory.clear_cache()
+
+    def test_districts_listed_before_a_sync_get_their_courts(self, phoenix):
+        # A dropdown request stores the state's districts, but not their complexes and courts
+        payload, _ = directory.get_districts('1')
+        self.assertEqual(len(payload), 2)
+        self.assertTrue(DirectoryDistrict.objects.filter(synced_at__isnull=True).exists())
+
+        # The state's version did not change, yet the sync still pre-warms its districts
+        self.assertEqual(directory.sync_directory(log=lambda message: None), 1)
+        self.assertFalse(DirectoryDistrict.objects.filter(synced_at__isnull=True).exists())
+
+        # With Phoenix down, complexes and courts are served from the local copy
+        phoenix.side_effect = directory.DirectoryUnavailable('down')
+        directory.clear_cache()
+        self.assertEqual(directory.get_complexes('10')[0], [{'id': '100', 'name': 'City Civil Court'}])
+        self.assertEqual(directory.get_courts('11')[0], [{'id': '200', 'name': 'II Additional District Court'}])
+
+    def test_unchanged_synced_states_are_skipped(self, phoenix):
+        self.assertEqual(directory.sync_directory(log=lambda message: None), 1)
+        calls = phoenix.call_count
+        self.assertEqual(directory.sync_directory(log=lambda message: None), 0)
+        # Only the state list was fetched
+        self.assertEqual(phoenix.call_count, calls + 1)
+        self.assertEqual(DirectoryState.objects.get().version, 'v1')
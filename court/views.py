@@ -15,7 +15,7 @@ class ComplexSerializer(serializers.Serializer):
     id = serializers.CharField()
     name = serializers.CharField()
 
-class CourtSerializer(serializers.Serializer):
+class CourtNameSerializer(serializers.Serializer):
     id = serializers.CharField()
     name = serializers.CharField()
 
@@ -43,97 +43,80 @@ class CourtSerializer(serializers.ModelSerializer):
 
 
 
-import requests
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
 from rest_framework.permissions import IsAuthenticated
 from .models import Court
-
-BASE_URL = "https://phoenix.akshit.me/district-court"
-
-# Fetch states from Phoenix API
+from django.conf import settings
+from .directory import get_states, get_districts, get_complexes, get_courts, DirectoryUnavailable
+
+def _directory_response(request, serializer_class, loader, *args):
+    """Serve a directory listing from the local cache, honouring If-None-Match."""
+    try:
+        payload, etag = loader(*args)
+    except DirectoryUnavailable as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(serializer_class(payload, many=True).data, status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=%d' % getattr(settings, 'COURT_DIRECTORY_CACHE_TTL', 300)
+    return response
+
+def _param(request, name):
+    return request.data.get(name) if request.method == 'POST' else request.query_params.get(name)
+
+# States from the local court directory
 class StateFetchAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    
-    def post(self, request):
-        try:
-            response = requests.post(f"{BASE_URL}/states", json={}, timeout=10)
-            response.raise_for_status()
-            data = response.json()
 
-            states_list = data.get('states', [])
-            serializer = StateSerializer(states_list, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+    def get(self, request):
+        return _directory_response(request, StateSerializer, get_states)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def post(self, request):
+        return self.get(request)
 
-# Fetch districts based on state_id
+# Districts of a state
 class DistrictFetchAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    
-    def post(self, request):
-        try:
-            state_external_id = request.data.get('stateId')
-            if not state_external_id:
-                return Response({"error": "stateId is required"}, status=status.HTTP_400_BAD_REQUEST)
-
-            payload = {"stateId": state_external_id}
-            response = requests.post(f"{BASE_URL}/districts", json=payload, timeout=10)
-            response.raise_for_status()
-            data = response.json()
 
-            districts_list = data.get('districts', [])
-            serializer = DistrictSerializer(districts_list, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+    def get(self, request):
+        state_external_id = _param(request, 'stateId')
+        if not state_external_id:
+            return Response({"error": "stateId is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return _directory_response(request, DistrictSerializer, get_districts, str(state_external_id))
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def post(self, request):
+        return self.get(request)
 
-# Fetch courts based on district_id
+# Courts of a district
 class CourtFetchAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    
-    def post(self, request):
-        try:
-            district_external_id = request.data.get('districtId')
-            if not district_external_id:
-                return Response({"error": "districtId is required"}, status=status.HTTP_400_BAD_REQUEST)
-
-            payload = {"districtId": district_external_id}
-            response = requests.post(f"{BASE_URL}/courts", json=payload, timeout=10)
-            response.raise_for_status()
-            data = response.json()
 
-            courts_list = data.get('courts', [])
-            serializer = CourtSerializer(courts_list, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+    def get(self, request):
+        district_external_id = _param(request, 'districtId')
+        if not district_external_id:
+            return Response({"error": "districtId is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return _directory_response(request, CourtNameSerializer, get_courts, str(district_external_id))
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def post(self, request):
+        return self.get(request)
 
-# Fetch complexes based on district_id
+# Court complexes of a district
 class ComplexFetchAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    
+
+    def get(self, request):
+        district_external_id = _param(request, 'district_id')
+        if not district_external_id:
+            return Response({"error": "district_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return _directory_response(request, ComplexSerializer, get_complexes, str(district_external_id))
+
     def post(self, request):
-        try:
-            district_external_id = request.data.get('district_id')
-            if not district_external_id:
-                return Response({"error": "district_id is required"}, status=status.HTTP_400_BAD_REQUEST)
-
-            payload = {"districtId": district_external_id}
-            response = requests.post(f"{BASE_URL}/complexes", json=payload, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            complexes_list = data.get('complexes', [])
-            serializer = ComplexSerializer(complexes_list, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return self.get(request)
 
 # Create and List Court Entries
 class CourtListCreateView(generics.ListCreateAPIView):
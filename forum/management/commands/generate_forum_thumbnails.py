@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from forum.models import ForumComment, ForumPost
+from forum.thumbnails import generate_variants, needs_variants
+
+
+class Command(BaseCommand):
+    help = "Generate the sized WebP/JPEG variants for forum post and comment images that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Also retry images whose background generation failed")
+
+    def handle(self, *args, **options):
+        for model in (ForumPost, ForumComment):
+            generated = failed = 0
+            rows = model.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image', 'image_variants')
+            for instance in rows.iterator(chunk_size=200):
+                if not needs_variants(instance, retry_failed=options['retry_failed']):
+                    continue
+                try:
+                    generate_variants(model, instance.pk)
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{model.__name__} {instance.pk}: {e}")
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.verbose_name_plural}: generated variants for {generated}, {failed} failed"
+            ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from forum.models import ForumComment, ForumLike, ForumPost
+
+
+def _count_of(model):
+    rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ForumPost.likes_count and comment_count from the like and comment rows, "
+        "fixing only the posts whose stored counters drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Posts checked per query (default 500)")
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        checked = fixed = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                ForumPost.objects.filter(pk__gt=last_pk).order_by('pk')
+                .annotate(actual_likes=_count_of(ForumLike), actual_comments=_count_of(ForumComment))
+                .values('pk', 'likes_count', 'comment_count', 'actual_likes', 'actual_comments')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]['pk']
+            checked += len(batch)
+            for row in batch:
+                if row['likes_count'] != row['actual_likes'] or row['comment_count'] != row['actual_comments']:
+                    # Recount in the update itself so likes made since the read are not lost
+                    ForumPost.objects.filter(pk=row['pk']).update(
+                        likes_count=_count_of(ForumLike), comment_count=_count_of(ForumComment)
+                    )
+                    fixed += 1
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} post(s), fixed counters on {fixed}"))
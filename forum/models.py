@@ -29,8 +29,14 @@ class ForumPost(models.Model):
     content = models.TextField()
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='general')
     image = models.ImageField(upload_to='forum/images/', blank=True, null=True)
+    # Sized WebP/JPEG copies of the image, filled in the background by forum.thumbnails
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Kept in step by the like toggle and comment creation with F() updates;
+    # `manage.py reconcile_forum_counters` repairs any drift
+    likes_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
 
     panels = [
         FieldPanel("user"),
@@ -46,12 +52,18 @@ class ForumPost(models.Model):
     class Meta:
         verbose_name = "Forum Post"
         verbose_name_plural = "Forum Posts"
+        # Feeds page by keyset on (created_at, id); see ForumCursorPagination
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
 
 class ForumComment(models.Model):
     post = models.ForeignKey(ForumPost, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     image = models.ImageField(upload_to='forum/comments/images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
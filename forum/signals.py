@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import ForumComment, ForumPost
+from .thumbnails import discard_stale_variants, needs_variants, purge_variants, schedule_variants
+
+
+@receiver(post_save, sender=ForumPost)
+@receiver(post_save, sender=ForumComment)
+def generate_image_variants(sender, instance, **kwargs):
+    discard_stale_variants(instance)
+    if needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_delete, sender=ForumPost)
+@receiver(post_delete, sender=ForumComment)
+def delete_image_variants(sender, instance, **kwargs):
+    if instance.image or instance.image_variants:
+        # The instance loses its pk once deleted, so keep a stand-in for the callback
+        model, pk = type(instance), instance.pk
+        transaction.on_commit(lambda: purge_variants(model(pk=pk)))
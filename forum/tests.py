@@ -1,3 +1,249 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from wagtail.images.models import Image
+from wagtail.images.tests.utils import get_test_image_file
+from user_profile.models import Profile
+from .models import ForumComment, ForumLike, ForumPost
+from .thumbnails import _generate_logged, generate_variants, needs_variants
 
-# Create your tests here.
+
+class TemporaryMediaMixin:
+    """Point MEDIA_ROOT at a temporary directory for the class, so uploads and renditions stay out of the tree."""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+        super().setUpClass()
+
+
+class FeedQueryCountTests(TemporaryMediaMixin, TestCase):
+    """Serializing a feed page must not cost extra queries per post, comment or like."""
+
+    @classmethod
+    def setUpTestData(cls):
+        photo = Image.objects.create(title='photo', file=get_test_image_file())
+        cls.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'secret')
+        Profile.objects.create(user=cls.viewer, photo=photo)
+        cls.authors = [cls.viewer]
+        for i in range(3):
+            author = User.objects.create_user(f'author{i}', f'author{i}@example.com', 'secret')
+            # One author has no profile at all, which the serializer has to tolerate
+            if i:
+                Profile.objects.create(user=author, photo=photo if i % 2 else None)
+            cls.authors.append(author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _add_posts(self, count, author=None):
+        for i in range(count):
+            post = ForumPost.objects.create(user=author or self.authors[i % len(self.authors)], title=f'Post {i}', content='...')
+            for user in self.authors[i % 2:]:
+                ForumComment.objects.create(post=post, user=user, content='Agreed')
+                ForumLike.objects.create(post=post, user=user)
+
+    def assertFeedQueries(self, url, expected):
+        # The first request creates the photo rendition; only later pages are pinned
+        self.client.get(url)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_pages_use_constant_queries(self):
+        # page, author photos and renditions, comments, commenter photos and renditions
+        feeds = [
+            (reverse('forum-all-feed'), None, 6),
+            (reverse('forum-post-list-create'), None, 6),
+            (reverse('forum-my-feed'), self.viewer, 6),
+            # plus the lookup of the user whose likes are listed
+            (reverse('forum-liked-posts', args=[self.authors[1].pk]), None, 7),
+        ]
+        for url, author, expected in feeds:
+            with self.subTest(url=url):
+                self._add_posts(1, author)
+                self.assertFeedQueries(url, expected)
+                self._add_posts(8, author)
+                self.assertFeedQueries(url, expected)
+                ForumPost.objects.all().delete()
+
+    def test_like_and_comment_keep_counters(self):
+        post = ForumPost.objects.create(user=self.authors[1], title='Post', content='...')
+        toggle = reverse('forum-like-toggle', args=[post.pk])
+        self.assertEqual(self.client.post(toggle).status_code, 201)
+        self.client.post(reverse('forum-comment-create'), {'post_id': post.pk, 'content': 'Agreed'})
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comment_count), (1, 1))
+        self.assertEqual(self.client.post(toggle).status_code, 200)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 0)
+
+    def test_racing_unlike_does_not_drift_the_counter(self):
+        post = ForumPost.objects.create(user=self.authors[1], title='Post', content='...')
+        ForumLike.objects.create(post=post, user=self.authors[1])
+        like = ForumLike.objects.create(post=post, user=self.viewer)
+        # Another request removed (and uncounted) the viewer's like after this one looked it up
+        ForumLike.objects.filter(pk=like.pk).delete()
+        ForumPost.objects.filter(pk=post.pk).update(likes_count=1)
+        with mock.patch.object(type(ForumLike.objects), 'get_or_create', return_value=(like, False)):
+            response = self.client.post(reverse('forum-like-toggle', args=[post.pk]))
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+
+    def test_reconciled_counts_match_stored_rows(self):
+        # The fixtures write likes and comments directly, leaving the counters behind
+        self._add_posts(5)
+        call_command('reconcile_forum_counters', batch_size=2, stdout=StringIO())
+        response = self.client.get(reverse('forum-all-feed'))
+        for item in response.data['results']:
+            post = ForumPost.objects.get(pk=item['id'])
+            self.assertEqual(item['likes_count'], post.likes.count())
+            self.assertEqual(item['comment_count'], post.comments.count())
+            self.assertEqual(item['liked_by_user'], post.likes.filter(user=self.viewer).exists())
+            self.assertEqual(len(item['comments']), min(post.comments.count(), 3))
+
+    def test_feed_embeds_latest_comments_and_pages_the_rest(self):
+        post = ForumPost.objects.create(user=self.viewer, title='Viral', content='...')
+        comments = [ForumComment.objects.create(post=post, user=self.viewer, content=f'#{i}') for i in range(12)]
+        item = self.client.get(reverse('forum-all-feed')).data['results'][0]
+        self.assertEqual([c['id'] for c in item['comments']], [c.pk for c in comments[-3:]])
+
+        seen = []
+        url = reverse('forum-post-comments', args=[post.pk])
+        while url:
+            response = self.client.get(url)
+            seen.extend(c['id'] for c in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [c.pk for c in reversed(comments)])
+        self.assertEqual(self.client.get(reverse('forum-post-comments', args=[0])).status_code, 404)
+
+
+class FeedCursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'secret')
+        cls.posts = [ForumPost.objects.create(user=cls.viewer, title=f'Post {i}', content='...') for i in range(7)]
+        # Ties on created_at are broken by id
+        ForumPost.objects.filter(pk__in=[post.pk for post in cls.posts[2:5]]).update(created_at=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_walks_every_post_once_while_new_posts_arrive(self):
+        seen = []
+        url = reverse('forum-all-feed') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in response.data['results'])
+            ForumPost.objects.create(user=self.viewer, title='Newer', content='...')
+            url = response.data['next']
+        expected = ForumPost.objects.filter(pk__in=[post.pk for post in self.posts]).order_by('-created_at', '-id')
+        self.assertEqual(seen, [post.pk for post in expected])
+
+    def test_total_is_optional(self):
+        url = reverse('forum-all-feed')
+        self.assertNotIn('count', self.client.get(url).data)
+        self.assertEqual(self.client.get(url + '?include_total=1').data['count'], 7)
+
+    def test_total_of_an_empty_feed(self):
+        # An unknown user's likes come from a .none() queryset
+        response = self.client.get(reverse('forum-liked-posts', args=[0]) + '?include_total=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['results']), (0, []))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('forum-all-feed') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class ImageVariantTests(TemporaryMediaMixin, TestCase):
+
+    def setUp(self):
+        self.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _post(self):
+        # Keep the background job from running; tests call it inline
+        with self.captureOnCommitCallbacks():
+            return ForumPost.objects.create(user=self.viewer, title='Photo', content='...', image=get_test_image_file())
+
+    def _stored_variants(self, post):
+        try:
+            return sorted(default_storage.listdir(f'forum/variants/forumpost/{post.pk}')[1])
+        except FileNotFoundError:
+            return []
+
+    def test_variants_are_generated_after_commit_and_served_as_srcset(self):
+        post = self._post()
+        item = self.client.get(reverse('forum-all-feed')).data['results'][0]
+        self.assertIsNone(item['image_variants'])
+
+        generate_variants(ForumPost, post.pk)
+        item = self.client.get(reverse('forum-all-feed')).data['results'][0]
+        variants = item['image_variants']
+        self.assertEqual((variants['width'], variants['height']), (640, 480))
+        # The test image is 640px wide, so the 1280 variant collapses into 640
+        self.assertEqual(
+            sorted((v['format'], v['width'], v['height']) for v in variants['variants']),
+            [('jpg', 320, 240), ('jpg', 640, 480), ('webp', 320, 240), ('webp', 640, 480)],
+        )
+        self.assertRegex(variants['srcset']['webp'], r'^http://testserver/\S+/320\.webp 320w, \S+/640\.webp 640w$')
+
+    def test_failed_generation_is_logged_and_recorded(self):
+        post = self._post()
+        with mock.patch('forum.thumbnails.PILImage.open', side_effect=OSError('truncated file')):
+            with self.assertLogs('forum.thumbnails', 'ERROR'):
+                _generate_logged(ForumPost, post.pk)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, {'source': post.image.name, 'error': 'truncated file'})
+        self.assertIsNone(self.client.get(reverse('forum-all-feed')).data['results'][0]['image_variants'])
+        # Saving again does not retry; the command does when asked to
+        self.assertFalse(needs_variants(post))
+        out = StringIO()
+        call_command('generate_forum_thumbnails', stdout=out)
+        self.assertIn('generated variants for 0', out.getvalue())
+        call_command('generate_forum_thumbnails', retry_failed=True, stdout=out)
+        post.refresh_from_db()
+        self.assertNotIn('error', post.image_variants)
+        self.assertEqual(len(self._stored_variants(post)), 4)
+
+    @mock.patch('forum.signals.schedule_variants')
+    def test_clearing_or_replacing_the_image_purges_its_variants(self, schedule):
+        post = self._post()
+        generate_variants(ForumPost, post.pk)
+        post.refresh_from_db()
+        self.assertEqual(self._stored_variants(post), ['320.jpg', '320.webp', '640.jpg', '640.webp'])
+
+        post.image = get_test_image_file(filename='other.png', size=(200, 100))
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self._stored_variants(post), [])
+        # Once for the upload, once for the replacement
+        self.assertEqual(schedule.call_count, 2)
+        generate_variants(ForumPost, post.pk)
+        post.refresh_from_db()
+        self.assertEqual(self._stored_variants(post), ['200.jpg', '200.webp'])
+
+        post.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        post.refresh_from_db()
+        self.assertEqual((self._stored_variants(post), post.image_variants), ([], {}))
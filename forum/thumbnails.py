@@ -0,0 +1,157 @@
+"""
+Sized WebP/JPEG variants of forum post and comment images.
+
+Saving a post or comment with a new image schedules generate_variants() on a
+small thread pool once the transaction commits, so uploads return without
+waiting for Pillow. Variants are stored under
+``forum/variants/<model>/<pk>/<width>.<ext>`` and described in the row's
+``image_variants``, which is empty until they exist; serializers fall back to
+the original image meanwhile. A failed run is logged and recorded there as
+``{'source', 'error'}`` until ``generate_forum_thumbnails --retry-failed``.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image as PILImage, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'forum/variants'
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'FORUM_THUMBNAIL_WORKERS', 2),
+                    thread_name_prefix='forum-thumbnails',
+                )
+    return _executor
+
+
+def needs_variants(instance, retry_failed=False):
+    if not instance.image:
+        return False
+    info = instance.image_variants
+    return info.get('source') != instance.image.name or (retry_failed and 'error' in info)
+
+
+def schedule_variants(instance):
+    """Generate variants in the background after the current transaction commits."""
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: get_executor().submit(_generate_logged, model, pk))
+
+
+def _generate_logged(model, pk):
+    try:
+        generate_variants(model, pk)
+    except Exception as e:
+        logger.exception("Failed to generate variants for %s %s", model.__name__, pk)
+        source = model.objects.filter(pk=pk).values_list('image', flat=True).first()
+        if source:
+            # Recorded so the row is not retried on every save and the failure stays visible
+            model.objects.filter(pk=pk, image=source).update(image_variants={'source': source, 'error': str(e)})
+
+
+def discard_stale_variants(instance):
+    """Once the transaction commits, purge variants of an image that was cleared or replaced."""
+    source = instance.image_variants.get('source')
+    if not source or (instance.image and instance.image.name == source):
+        return
+    model, pk = type(instance), instance.pk
+
+    def discard():
+        purge_variants(model(pk=pk))
+        # A replaced image gets a fresh description from its own generate_variants() run
+        model.objects.filter(pk=pk, image_variants__source=source).update(image_variants={})
+
+    transaction.on_commit(discard)
+
+
+def _variant_dir(instance):
+    return f"{VARIANT_DIR}/{instance._meta.model_name}/{instance.pk}"
+
+
+def purge_variants(instance):
+    directory = _variant_dir(instance)
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        default_storage.delete(f"{directory}/{name}")
+
+
+def _encode(image, pil_format):
+    buffer = io.BytesIO()
+    quality = getattr(settings, 'FORUM_IMAGE_QUALITY', 80)
+    if pil_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, pil_format, quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def generate_variants(model, pk):
+    """Render and store the variants of one row's image, then record them on the row."""
+    instance = model.objects.filter(pk=pk).first()
+    # An explicit run also retries an image whose last run failed
+    if instance is None or not needs_variants(instance, retry_failed=True):
+        return
+    source = instance.image.name
+
+    with instance.image.open('rb') as f:
+        original = PILImage.open(f)
+        # Phone photos are often stored sideways with an EXIF rotation
+        original = ImageOps.exif_transpose(original)
+        original = original.convert('RGB')
+
+    # Never upscale: widths above the original collapse to the original size
+    widths = sorted({min(width, original.width) for width in getattr(settings, 'FORUM_IMAGE_WIDTHS', [320, 640, 1280])})
+    purge_variants(instance)
+    variants = []
+    for width in widths:
+        height = max(round(original.height * width / original.width), 1)
+        resized = original if width == original.width else original.resize((width, height), PILImage.LANCZOS)
+        for extension, pil_format in FORMATS:
+            name = default_storage.save(f"{_variant_dir(instance)}/{width}.{extension}", ContentFile(_encode(resized, pil_format)))
+            variants.append({'name': name, 'format': extension, 'width': width, 'height': height})
+
+    info = {'source': source, 'width': original.width, 'height': original.height, 'variants': variants}
+    # Skip the write if the image was replaced while we were rendering; that save scheduled its own run
+    model.objects.filter(pk=pk, image=source).update(image_variants=info)
+
+
+def variant_data(instance, request=None):
+    """
+    ``{'width', 'height', 'srcset': {'webp': ..., 'jpg': ...}, 'variants': [...]}``
+    for the serializers, or None while the variants are still being generated.
+    """
+    info = instance.image_variants
+    if not instance.image or info.get('source') != instance.image.name or 'error' in info:
+        return None
+
+    def absolute(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    variants = [
+        {'url': absolute(v['name']), 'format': v['format'], 'width': v['width'], 'height': v['height']}
+        for v in info['variants']
+    ]
+    srcset = {
+        extension: ', '.join(f"{v['url']} {v['width']}w" for v in variants if v['format'] == extension)
+        for extension, _ in FORMATS
+    }
+    return {'width': info['width'], 'height': info['height'], 'srcset': srcset, 'variants': variants}
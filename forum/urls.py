@@ -4,6 +4,7 @@ from .views import *
 urlpatterns = [
     path("api/posts/", ForumPostListCreateView.as_view(), name="forum-post-list-create"),
     path("api/comments/", ForumCommentCreateView.as_view(), name="forum-comment-create"),
+    path("api/posts/<int:post_id>/comments/", ForumPostCommentListView.as_view(), name="forum-post-comments"),
     path("api/posts/<int:post_id>/like-toggle/", ForumLikeToggleView.as_view(), name="forum-like-toggle"),
     path("api/my-feed/", MyFeedView.as_view(), name="forum-my-feed"),
     path("api/all-feed/", AllFeedView.as_view(), name="forum-all-feed"),
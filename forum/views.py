@@ -1,9 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import ForumPost, ForumComment, ForumLike, Profile
+from .thumbnails import variant_data
 from wagtail.images.models import Image
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.http import JsonResponse
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
 
 class ProfileSerializer(serializers.ModelSerializer):
     photo = serializers.SerializerMethodField()
@@ -34,7 +38,7 @@ class UserSerializer(serializers.ModelSerializer):
         try:
             profile = obj.profile
             return ProfileSerializer(profile, context=self.context).data
-        except Profile.DoesNotExist:
+        except ObjectDoesNotExist:
             return {
                 'first_name': obj.first_name or '',
                 'last_name': obj.last_name or '',
@@ -45,72 +49,201 @@ class ForumCommentSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     post_id = serializers.IntegerField(write_only=True)
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = ForumComment
-        fields = ['id', 'post_id', 'user', 'content', 'image_url', 'created_at']
-        read_only_fields = ['id', 'user', 'image_url', 'created_at']
+        fields = ['id', 'post_id', 'user', 'content', 'image_url', 'image_variants', 'created_at']
+        read_only_fields = ['id', 'user', 'image_url', 'image_variants', 'created_at']
 
     def get_image_url(self, obj):
         if obj.image:
             return self.context['request'].build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_variants(self, obj):
+        return variant_data(obj, self.context.get('request'))
+
     def create(self, validated_data):
         post_id = validated_data.pop('post_id')
         post = ForumPost.objects.get(id=post_id)
-        return ForumComment.objects.create(post=post, user=self.context['request'].user, **validated_data)
+        with transaction.atomic():
+            comment = ForumComment.objects.create(post=post, user=self.context['request'].user, **validated_data)
+            ForumPost.objects.filter(pk=post.pk).update(comment_count=F('comment_count') + 1)
+        return comment
 
 class ForumPostSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    comments = ForumCommentSerializer(many=True, read_only=True)
-    likes_count = serializers.SerializerMethodField()
+    # The latest FORUM_FEED_COMMENTS comments, oldest first; the rest come from
+    # the post's comments endpoint
+    comments = serializers.SerializerMethodField()
     liked_by_user = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     image = serializers.ImageField(write_only=True, required=False, allow_null=True)
 
     class Meta:
         model = ForumPost
         fields = [
-            'id', 'user', 'title', 'content', 'category', 'image', 'image_url',
+            'id', 'user', 'title', 'content', 'category', 'image', 'image_url', 'image_variants',
             'created_at', 'updated_at', 'likes_count', 'liked_by_user', 'comment_count', 'comments'
         ]
         read_only_fields = [
             'id', 'user', 'created_at', 'updated_at', 'likes_count',
-            'liked_by_user', 'comment_count', 'comments', 'image_url'
+            'liked_by_user', 'comment_count', 'comments', 'image_url', 'image_variants'
         ]
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    def get_comments(self, obj):
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            comments = obj.comments.order_by('-created_at', '-id')[:feed_comment_limit()]
+        return ForumCommentSerializer(reversed(list(comments)), many=True, context=self.context).data
 
     def get_liked_by_user(self, obj):
+        # Annotated by with_feed_data(); the fallback covers single posts, e.g. after a create
+        if hasattr(obj, 'user_liked'):
+            return obj.user_liked
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
 
-    def get_comment_count(self, obj):
-        return obj.comments.count()
-
     def get_image_url(self, obj):
         if obj.image:
             return self.context['request'].build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_variants(self, obj):
+        return variant_data(obj, self.context.get('request'))
+
+import base64
+import hashlib
+from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import generics, permissions, status, pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-
-class ForumPagination(pagination.PageNumberPagination):
+from rest_framework.utils.urls import replace_query_param
+
+PROFILE_PHOTO_FILTER = 'max-200x200'
+
+def _with_author(queryset, prefix=''):
+    """Load the author, their profile and the photo's rendition alongside ``queryset``."""
+    return queryset.select_related(f'{prefix}user__profile').prefetch_related(
+        Prefetch(f'{prefix}user__profile__photo', queryset=Image.objects.prefetch_renditions(PROFILE_PHOTO_FILTER))
+    )
+
+def feed_comment_limit():
+    return getattr(settings, 'FORUM_FEED_COMMENTS', 3)
+
+def with_feed_data(queryset, user):
+    """
+    Annotate the viewer's like and prefetch authors and each post's latest
+    comments, so serializing a page of posts costs a fixed number of queries
+    however long its threads are. Like and comment counts are stored on the post.
+    """
+    if user.is_authenticated:
+        user_liked = Exists(ForumLike.objects.filter(post=OuterRef('pk'), user=user))
+    else:
+        user_liked = Value(False)
+    comments = _with_author(ForumComment.objects.order_by('-created_at', '-id'))[:feed_comment_limit()]
+    return _with_author(queryset).annotate(user_liked=user_liked).prefetch_related(
+        Prefetch('comments', queryset=comments, to_attr='latest_comments')
+    )
+
+class ForumCursorPagination(pagination.BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    The cursor is an opaque token naming the last post of the previous page, so
+    a page is an index range scan however deep the client has scrolled, and
+    posts published meanwhile do not shift what comes next. ``?include_total=1``
+    adds an approximate ``count``, cached for FORUM_FEED_TOTAL_CACHE_TTL seconds.
+    """
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.total = self._approximate_total(queryset) if self._wants_total(request) else None
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        # One extra row tells whether there is a next page without counting
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token.encode('ascii') + b'=' * (-len(token) % 4)).decode('utf-8')
+            created_at, pk = raw.rsplit('|', 1)
+            created_at = datetime.fromisoformat(created_at)
+            if timezone.is_naive(created_at):
+                raise ValueError(created_at)
+            return created_at, int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, post):
+        raw = f"{post.created_at.isoformat()}|{post.pk}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def _wants_total(self, request):
+        return request.query_params.get('include_total', '').lower() in ('1', 'true', 'yes')
+
+    def _approximate_total(self, queryset):
+        # A .none() queryset has no SQL to key the cache on
+        if queryset.query.is_empty():
+            return 0
+        queryset = queryset.order_by()
+        key = 'forum-feed-total:' + hashlib.sha256(str(queryset.query).encode('utf-8')).hexdigest()
+        total = cache.get(key)
+        if total is None:
+            total = queryset.count()
+            cache.set(key, total, getattr(settings, 'FORUM_FEED_TOTAL_CACHE_TTL', 60))
+        return total
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'next_cursor': self.next_cursor}
+        if self.total is not None:
+            payload['count'] = self.total
+        payload['results'] = data
+        return Response(payload)
 
 class ForumPostListCreateView(generics.ListCreateAPIView):
     queryset = ForumPost.objects.all().order_by('-created_at')
     serializer_class = ForumPostSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = ForumPagination
+    pagination_class = ForumCursorPagination
 
     def get_serializer_context(self):
         return super().get_serializer_context()
@@ -120,7 +253,7 @@ class ForumPostListCreateView(generics.ListCreateAPIView):
         category = self.request.query_params.get('category')
         if category and category != 'all':
             queryset = queryset.filter(category=category)
-        return queryset
+        return with_feed_data(queryset, self.request.user)
 
     def perform_create(self, serializer):
         print("Request files:", self.request.FILES)  # Debug: Check if image is received
@@ -134,6 +267,21 @@ class ForumCommentCreateView(generics.CreateAPIView):
     def get_serializer_context(self):
         return super().get_serializer_context()
 
+class ForumCommentPagination(ForumCursorPagination):
+    page_size = 10
+
+class ForumPostCommentListView(generics.ListAPIView):
+    """A post's comments, newest first, for loading threads beyond what the feed embeds."""
+    serializer_class = ForumCommentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ForumCommentPagination
+
+    def get_queryset(self):
+        post_id = self.kwargs.get('post_id')
+        if not ForumPost.objects.filter(pk=post_id).exists():
+            raise NotFound('Post not found')
+        return _with_author(ForumComment.objects.filter(post_id=post_id))
+
 class ForumLikeToggleView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -143,28 +291,34 @@ class ForumLikeToggleView(generics.GenericAPIView):
         except ForumPost.DoesNotExist:
             return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        like, created = ForumLike.objects.get_or_create(post=post, user=request.user)
+        with transaction.atomic():
+            like, created = ForumLike.objects.get_or_create(post=post, user=request.user)
+            posts = ForumPost.objects.filter(pk=post.pk)
+            if created:
+                posts.update(likes_count=F('likes_count') + 1)
+            # A concurrent unlike may have removed the row already; count only our delete
+            elif ForumLike.objects.filter(pk=like.pk).delete()[0]:
+                posts.filter(likes_count__gt=0).update(likes_count=F('likes_count') - 1)
         if not created:
-            like.delete()
             return Response({'message': 'Unliked'}, status=status.HTTP_200_OK)
         return Response({'message': 'Liked'}, status=status.HTTP_201_CREATED)
 
 class MyFeedView(generics.ListAPIView):
     serializer_class = ForumPostSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = ForumPagination
+    pagination_class = ForumCursorPagination
 
     def get_serializer_context(self):
         return super().get_serializer_context()
 
     def get_queryset(self):
-        return ForumPost.objects.filter(user=self.request.user).order_by('-created_at')
+        return with_feed_data(ForumPost.objects.filter(user=self.request.user).order_by('-created_at'), self.request.user)
 
 class AllFeedView(generics.ListAPIView):
     queryset = ForumPost.objects.all().order_by('-created_at')
     serializer_class = ForumPostSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = ForumPagination
+    pagination_class = ForumCursorPagination
 
     def get_serializer_context(self):
         return super().get_serializer_context()
@@ -174,12 +328,12 @@ class AllFeedView(generics.ListAPIView):
         category = self.request.query_params.get('category')
         if category and category != 'all':
             queryset = queryset.filter(category=category)
-        return queryset
+        return with_feed_data(queryset, self.request.user)
 
 class UserLikedPostsView(generics.ListAPIView):
     serializer_class = ForumPostSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = ForumPagination
+    pagination_class = ForumCursorPagination
 
     def get_serializer_context(self):
         return super().get_serializer_context()
@@ -192,7 +346,7 @@ class UserLikedPostsView(generics.ListAPIView):
             return ForumPost.objects.none()
 
         liked_post_ids = ForumLike.objects.filter(user=user).values_list('post_id', flat=True)
-        return ForumPost.objects.filter(id__in=liked_post_ids).order_by('-created_at')
+        return with_feed_data(ForumPost.objects.filter(id__in=liked_post_ids).order_by('-created_at'), self.request.user)
 
 @ensure_csrf_cookie
 def get_csrf_token(request):
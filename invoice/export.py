@@ -0,0 +1,170 @@
+"""
+Bulk invoice PDF export, streamed as a ZIP.
+
+Invoices are loaded in the web process with their client, payments and
+payment authors, then pickled to a process pool that only renders, so the
+workers never touch the database. Finished PDFs are written into the ZIP in
+order and handed to the response as soon as they are compressed; at most a
+few PDFs per worker are held in memory at a time. Progress is kept in the
+Django cache under the export id and the requesting user.
+"""
+import io
+import multiprocessing
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.cache import cache
+from .pdf_utils import invoice_pdf_filename, render_invoice_pdf
+
+PROGRESS_TTL = 60 * 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _render(invoice):
+    buffer = io.BytesIO()
+    render_invoice_pdf(invoice, buffer)
+    return invoice_pdf_filename(invoice), buffer.getvalue()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Never fork the web worker itself: a forked child would inherit gunicorn's
+                # threads, locks and open database connections. forkserver forks workers
+                # from a clean server process that preloads Django and ReportLab once.
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                if context.get_start_method() == 'forkserver':
+                    context.set_forkserver_preload(['django', 'reportlab.platypus'])
+                _executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'INVOICE_EXPORT_WORKERS', 2),
+                    mp_context=context,
+                    initializer=_init_worker,
+                )
+    return _executor
+
+
+def _discard_executor(executor):
+    """Drop a broken pool so the next get_executor() starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(invoice):
+    executor = get_executor()
+    try:
+        return executor, executor.submit(_render, invoice)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        executor = get_executor()
+        return executor, executor.submit(_render, invoice)
+
+
+def progress_key(export_id, owner_id):
+    # Export ids come from the client; keying by owner keeps users out of each other's progress
+    return f"invoice-export:{owner_id}:{export_id}"
+
+
+def get_progress(export_id, owner_id):
+    return cache.get(progress_key(export_id, owner_id))
+
+
+def _set_progress(export_id, owner_id, **progress):
+    cache.set(progress_key(export_id, owner_id), progress, PROGRESS_TTL)
+
+
+class _ChunkSink:
+    """Write-only file object for ZipFile; written bytes are collected until drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_invoice_zip(queryset, export_id, owner_id):
+    """
+    Yield a ZIP of one PDF per invoice in ``queryset``, chunk by chunk.
+
+    A render failure is recorded as ``<invoice>.error.txt`` in the archive
+    rather than aborting a download that is already under way. Progress is
+    readable with ``get_progress(export_id, owner_id)``.
+    """
+    invoices = list(queryset.select_related('client').prefetch_related('payments__created_by'))
+    total = len(invoices)
+    _set_progress(export_id, owner_id, status='running', done=0, total=total)
+
+    window = getattr(settings, 'INVOICE_EXPORT_WORKERS', 2) * 2
+    sink = _ChunkSink()
+    # (invoice, executor, future, retried)
+    pending = deque()
+    done = 0
+    try:
+        # ZipFile falls back to data descriptors because the sink cannot seek
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            remaining = iter(invoices)
+            for invoice in remaining:
+                pending.append((invoice, *_submit(invoice), False))
+                if len(pending) >= window:
+                    break
+            while pending:
+                invoice, executor, future, retried = pending.popleft()
+                next_invoice = next(remaining, None)
+                if next_invoice is not None:
+                    pending.append((next_invoice, *_submit(next_invoice), False))
+                try:
+                    filename, pdf = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died (OOM kill, segfault) and took the pool with it; replace
+                    # the pool for this and later exports and render the invoice once more
+                    _discard_executor(executor)
+                    if not retried:
+                        pending.appendleft((invoice, *_submit(invoice), True))
+                        continue
+                    archive.writestr(f"{invoice.invoice_number}.error.txt", f"Failed to render: {e}\n")
+                except Exception as e:
+                    archive.writestr(f"{invoice.invoice_number}.error.txt", f"Failed to render: {e}\n")
+                else:
+                    archive.writestr(filename, pdf)
+                done += 1
+                if done % 10 == 0 or done == total:
+                    _set_progress(export_id, owner_id, status='running', done=done, total=total)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        _set_progress(export_id, owner_id, status='finished', done=done, total=total)
+        yield sink.drain()
+    except GeneratorExit:
+        # Client went away; stop queueing work for the rest
+        for _, _, future, _ in pending:
+            future.cancel()
+        if done < total:
+            _set_progress(export_id, owner_id, status='cancelled', done=done, total=total)
+        raise
@@ -0,0 +1,66 @@
+import io
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from client.models import Client
+from invoice.models import ClientInvoice, Payment
+from invoice.pdf_utils import render_invoice_pdf
+
+
+def sample_invoice(payments=5):
+    """Unsaved invoice with in-memory payments, so the benchmark never touches the database."""
+    client = Client(name="Sample Client", email="client@example.com", contact_number="+91 98765 43210",
+                    address="12 Court Road, Chennai")
+    invoice = ClientInvoice(
+        invoice_number="INV-00001", client=client, amount=Decimal("25000.00"),
+        due_date=date.today() + timedelta(days=30), reference_no="REF-1",
+        additional_details="Drafting and filing of the written statement.\nTwo hearings attended.",
+    )
+    invoice.payments = [
+        Payment(amount=Decimal("1000.00"), payment_date=date.today(), payment_mode='bank',
+                reference_no=f"TXN-{n}", remarks="Part payment")
+        for n in range(payments)
+    ]
+    invoice.paid_amount = sum(payment.amount for payment in invoice.payments.all())
+    invoice.pending_amount = invoice.amount - invoice.paid_amount
+    return invoice
+
+
+class Command(BaseCommand):
+    help = "Measure invoice PDF renders per second (in memory, single thread)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=200, help="Timed renders")
+        parser.add_argument('--payments', type=int, default=5, help="Payments on the sample invoice")
+        parser.add_argument('--invoice', type=int, default=None, help="Render this saved invoice instead of the sample")
+
+    def handle(self, *args, **options):
+        if options['invoice']:
+            try:
+                invoice = (
+                    ClientInvoice.objects.select_related('client')
+                    .prefetch_related('payments__created_by').get(pk=options['invoice'])
+                )
+            except ClientInvoice.DoesNotExist:
+                raise CommandError(f"Invoice {options['invoice']} not found")
+        else:
+            invoice = sample_invoice(options['payments'])
+
+        # Warm-up: imports, font metrics
+        render_invoice_pdf(invoice, io.BytesIO())
+
+        timings = []
+        for _ in range(options['renders']):
+            started = time.perf_counter()
+            render_invoice_pdf(invoice, io.BytesIO())
+            timings.append(time.perf_counter() - started)
+
+        timings.sort()
+        total = sum(timings)
+        self.stdout.write(self.style.SUCCESS(f"{len(timings) / total:.1f} renders/s"))
+        self.stdout.write(
+            f"per render: mean {total / len(timings) * 1000:.2f} ms, "
+            f"p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms"
+        )
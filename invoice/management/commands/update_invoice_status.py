@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from invoice.models import ClientInvoice
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark unpaid and partially paid invoices past their due date as overdue. Run daily. "
+        "--recompute rebuilds the stored paid/pending totals from the payments first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recompute', action='store_true',
+                            help="Recalculate paid_amount/pending_amount for every invoice")
+
+    def handle(self, *args, **options):
+        if options['recompute']:
+            count = 0
+            for invoice in ClientInvoice.objects.only('pk').iterator(chunk_size=500):
+                invoice.refresh_payment_totals()
+                count += 1
+            self.stdout.write(f"Recomputed totals for {count} invoice(s)")
+
+        overdue = ClientInvoice.objects.filter(
+            payment_status__in=['unpaid', 'partial'], due_date__lt=timezone.localdate()
+        ).update(payment_status='overdue')
+        self.stdout.write(self.style.SUCCESS(f"Marked {overdue} invoice(s) overdue"))
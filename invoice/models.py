@@ -1,4 +1,7 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Sum
+from django.utils import timezone
 from django.contrib.auth.models import User
 from wagtail.admin.panels import FieldPanel, InlinePanel
 from wagtail.snippets.models import register_snippet
@@ -8,6 +11,19 @@ from modelcluster.models import ClusterableModel
 from client.models import Client
 from wagtail.search import index
 
+class InvoiceSequence(models.Model):
+    """Counter row behind one invoice number series, e.g. "INV" or "INV-2025"."""
+    series = models.CharField(max_length=20, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.series} @ {self.last_value}"
+
+    class Meta:
+        verbose_name = "Invoice Sequence"
+        verbose_name_plural = "Invoice Sequences"
+
 class ClientInvoice(index.Indexed, ClusterableModel):
     id = models.BigAutoField(primary_key=True)
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='invoices')
@@ -16,7 +32,18 @@ class ClientInvoice(index.Indexed, ClusterableModel):
     due_date = models.DateField()
     reference_no = models.CharField(max_length=100, blank=True, null=True)
     additional_details = models.TextField(blank=True, null=True)
-    
+
+    # Maintained from the payments by invoice.signals; see refresh_payment_totals()
+    PAYMENT_STATUS_CHOICES = (
+        ('unpaid', 'Unpaid'),
+        ('partial', 'Partially paid'),
+        ('paid', 'Paid'),
+        ('overdue', 'Overdue'),
+    )
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    pending_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    payment_status = models.CharField(max_length=10, choices=PAYMENT_STATUS_CHOICES, default='unpaid', editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, blank=True, related_name='invoices_created'
@@ -33,24 +60,66 @@ class ClientInvoice(index.Indexed, ClusterableModel):
     ]
 
     def save(self, *args, **kwargs):
-        if not self.invoice_number:
-            last_invoice = ClientInvoice.objects.order_by('-id').first()
-            if last_invoice:
-                last_number = int(last_invoice.invoice_number.split('-')[-1])
-                self.invoice_number = f"INV-{last_number+1:05d}"
-            else:
-                self.invoice_number = "INV-00001"
-        
         if not self.created_by and 'user' in kwargs and hasattr(kwargs['user'], 'pk'):
             self.created_by = kwargs['user']
-            
-        super().save(*args, **kwargs)
+
+        # amount or due_date may have changed; paid_amount itself only moves with
+        # payments, so take it from the row in case this instance is stale
+        if self.pk is not None:
+            stored = ClientInvoice.objects.filter(pk=self.pk).values_list('paid_amount', flat=True).first()
+            if stored is not None:
+                self.paid_amount = stored
+        self.pending_amount = self.amount - (self.paid_amount or 0)
+        self.payment_status = self.compute_payment_status()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'amount', 'due_date'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'pending_amount', 'payment_status'}
+
+        if self.invoice_number:
+            super().save(*args, **kwargs)
+            return
+
+        from .numbering import allocate_invoice_numbers
+        # The sequence row stays locked until the insert commits, so a failed
+        # insert rolls the counter back and numbers stay gap-free
+        with transaction.atomic():
+            self.invoice_number = allocate_invoice_numbers(1)[0]
+            try:
+                super().save(*args, **kwargs)
+            except Exception:
+                self.invoice_number = ''
+                raise
+
+    def compute_payment_status(self, today=None):
+        if self.pending_amount <= 0:
+            return 'paid'
+        if self.due_date and self.due_date < (today or timezone.localdate()):
+            return 'overdue'
+        return 'partial' if self.paid_amount > 0 else 'unpaid'
+
+    def refresh_payment_totals(self):
+        """Recompute the stored totals from the payments, locking the invoice row while doing so."""
+        with transaction.atomic():
+            invoice = ClientInvoice.objects.select_for_update().filter(pk=self.pk).first()
+            if invoice is None:
+                return  # deleted along with its payments
+            invoice.paid_amount = invoice.payments.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            invoice.pending_amount = invoice.amount - invoice.paid_amount
+            invoice.payment_status = invoice.compute_payment_status()
+            ClientInvoice.objects.filter(pk=self.pk).update(
+                paid_amount=invoice.paid_amount,
+                pending_amount=invoice.pending_amount,
+                payment_status=invoice.payment_status,
+            )
+        self.paid_amount = invoice.paid_amount
+        self.pending_amount = invoice.pending_amount
+        self.payment_status = invoice.payment_status
 
     def get_paid_amount(self):
-        return sum(payment.amount for payment in self.payments.all())
+        return self.paid_amount
 
     def get_pending_amount(self):
-        return self.amount - self.get_paid_amount()
+        return self.pending_amount
 
     def __str__(self):
         return f"{self.invoice_number} - {self.client.name}"
@@ -58,6 +127,9 @@ class ClientInvoice(index.Indexed, ClusterableModel):
     class Meta:
         verbose_name = "Client Invoice"
         verbose_name_plural = "Client Invoices"
+        indexes = [
+            models.Index(fields=['payment_status', 'due_date']),
+        ]
 
 class Payment(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -114,10 +186,10 @@ class ClientInvoiceSnippetViewSet(SnippetViewSet):
     model = ClientInvoice
     icon = 'doc-full-inverse'
     add_to_admin_menu = True
-    list_display = ('invoice_number', 'client', 'amount', 'due_date', 'created_by', 'created_at')
+    list_display = ('invoice_number', 'client', 'amount', 'paid_amount', 'pending_amount', 'payment_status', 'due_date', 'created_by', 'created_at')
     list_export = list_display
     inspect_view_enabled = True
-    list_filter = ('due_date', 'created_by')
+    list_filter = ('payment_status', 'due_date', 'created_by')
     search_fields = ('invoice_number', 'client__name', 'reference_no')
 
 register_snippet(ClientInvoiceSnippetViewSet)
\ No newline at end of file
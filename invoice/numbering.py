@@ -0,0 +1,66 @@
+"""
+Invoice number allocation.
+
+Each series ("INV", or "INV-2025" with INVOICE_NUMBER_PER_YEAR) has one
+InvoiceSequence row. Allocating locks that row with select_for_update and
+bumps it by the number of invoices requested, so concurrent requests never
+see the same number and a batch of invoices costs one lock.
+"""
+import re
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ClientInvoice, InvoiceSequence
+
+
+def invoice_series(prefix=None, year=None):
+    prefix = prefix or getattr(settings, 'INVOICE_NUMBER_PREFIX', 'INV')
+    if year is None and getattr(settings, 'INVOICE_NUMBER_PER_YEAR', False):
+        year = timezone.localdate().year
+    return f"{prefix}-{year}" if year else prefix
+
+
+def format_invoice_number(series, value):
+    return f"{series}-{value:05d}"
+
+
+def _highest_existing(series):
+    """Largest number already issued in ``series``, used to seed a new sequence row."""
+    pattern = re.compile(rf"^{re.escape(series)}-(\d+)$")
+    highest = 0
+    numbers = ClientInvoice.objects.filter(invoice_number__startswith=f"{series}-").values_list('invoice_number', flat=True)
+    for number in numbers.iterator():
+        match = pattern.match(number)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def allocate_invoice_numbers(count=1, prefix=None, year=None):
+    """
+    Reserve ``count`` consecutive invoice numbers and return them in order.
+
+    Call this inside the transaction that saves the invoices: the sequence row
+    stays locked until it commits, and a rollback returns the numbers.
+    """
+    if count < 1:
+        return []
+    series = invoice_series(prefix, year)
+    with transaction.atomic():
+        InvoiceSequence.objects.get_or_create(series=series, defaults={'last_value': _highest_existing(series)})
+        sequence = InvoiceSequence.objects.select_for_update().get(series=series)
+        first = sequence.last_value + 1
+        sequence.last_value += count
+        sequence.save(update_fields=['last_value', 'updated_at'])
+    return [format_invoice_number(series, value) for value in range(first, first + count)]
+
+
+def create_invoices(invoices, prefix=None, year=None):
+    """Number and save a batch of unsaved ClientInvoice objects with a single allocation."""
+    invoices = list(invoices)
+    with transaction.atomic():
+        numbers = allocate_invoice_numbers(len(invoices), prefix=prefix, year=year)
+        for invoice, number in zip(invoices, numbers):
+            invoice.invoice_number = number
+            invoice.save()
+    return invoices
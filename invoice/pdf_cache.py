@@ -0,0 +1,100 @@
+"""
+Rendered invoice PDFs, cached in default storage.
+
+A PDF is stored under ``invoice_pdfs/<invoice id>/<fingerprint>.pdf`` where
+the fingerprint hashes everything printed on it plus PDF_TEMPLATE_VERSION,
+so any change to the invoice, its client or its payments (or the layout)
+leads to a new file. Older files of an invoice are purged when its payments
+or the invoice itself change.
+"""
+import hashlib
+import io
+import json
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse, HttpResponseNotModified
+from .pdf_utils import PDF_TEMPLATE_VERSION, invoice_pdf_filename, render_invoice_pdf
+
+CACHE_DIR = 'invoice_pdfs'
+
+
+def pdf_fingerprint(invoice):
+    client = invoice.client
+    payload = {
+        'template': PDF_TEMPLATE_VERSION,
+        'invoice': [
+            invoice.invoice_number, str(invoice.amount), str(invoice.paid_amount), str(invoice.pending_amount),
+            str(invoice.due_date), invoice.reference_no, invoice.additional_details,
+        ],
+        'client': [client.name, client.email, client.contact_number, client.address],
+        'payments': [
+            [
+                payment.pk, str(payment.amount), str(payment.payment_date), payment.payment_mode,
+                payment.reference_no, payment.remarks,
+                payment.created_by.username if payment.created_by else None,
+            ]
+            for payment in invoice.payments.all()
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _cache_path(invoice_id, fingerprint):
+    return f"{CACHE_DIR}/{invoice_id}/{fingerprint}.pdf"
+
+
+def get_or_render_pdf(invoice, fingerprint=None):
+    """Storage path of the invoice's current PDF, rendering and storing it on a miss."""
+    fingerprint = fingerprint or pdf_fingerprint(invoice)
+    path = _cache_path(invoice.pk, fingerprint)
+    if default_storage.exists(path):
+        return path
+
+    buffer = io.BytesIO()
+    render_invoice_pdf(invoice, buffer)
+    saved = default_storage.save(path, ContentFile(buffer.getvalue()))
+    if saved != path:
+        # Another request stored the same content first; keep theirs
+        default_storage.delete(saved)
+    return path
+
+
+def purge_invoice_pdfs(invoice_id, keep=None):
+    """Delete cached PDFs of an invoice, except ``keep`` (a fingerprint)."""
+    directory = f"{CACHE_DIR}/{invoice_id}"
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        if name != f"{keep}.pdf":
+            default_storage.delete(f"{directory}/{name}")
+
+
+def purge_invoice_pdfs_on_commit(invoice_id):
+    transaction.on_commit(lambda: purge_invoice_pdfs(invoice_id))
+
+
+def serve_invoice_pdf(request, invoice, is_download=True):
+    """FileResponse for the cached PDF, or 304 when the client already has this version."""
+    invoice = (
+        type(invoice).objects.select_related('client')
+        .prefetch_related('payments__created_by').get(pk=invoice.pk)
+    )
+    fingerprint = pdf_fingerprint(invoice)
+    etag = f'"{fingerprint}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        path = get_or_render_pdf(invoice, fingerprint)
+        response = FileResponse(
+            default_storage.open(path, 'rb'),
+            as_attachment=is_download,
+            filename=invoice_pdf_filename(invoice),
+            content_type='application/pdf',
+        )
+    response['ETag'] = etag
+    # Always revalidate: the same URL changes content when a payment is recorded
+    response['Cache-Control'] = 'private, no-cache'
+    return response
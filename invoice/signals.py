@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import ClientInvoice, Payment
+from .pdf_cache import purge_invoice_pdfs_on_commit
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def update_invoice_totals(sender, instance, **kwargs):
+    # Runs inside the caller's transaction, so the totals commit or roll back with the payment
+    ClientInvoice(pk=instance.invoice_id).refresh_payment_totals()
+    purge_invoice_pdfs_on_commit(instance.invoice_id)
+
+
+@receiver(post_save, sender=ClientInvoice)
+@receiver(post_delete, sender=ClientInvoice)
+def purge_cached_pdfs(sender, instance, **kwargs):
+    purge_invoice_pdfs_on_commit(instance.pk)
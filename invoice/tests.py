@@ -1,3 +1,408 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from django.contrib.auth.models import Group, User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from client.models import Client
+from . import export
+from .models import ClientInvoice, InvoiceSequence, Payment
+from .numbering import allocate_invoice_numbers, create_invoices
+from .pdf_utils import render_invoice_pdf
 
-# Create your tests here.
+
+def _sequence_bumps(queries):
+    return [q for q in queries if q['sql'].startswith('UPDATE') and 'invoicesequence' in q['sql']]
+
+
+@override_settings(INVOICE_NUMBER_PREFIX='INV', INVOICE_NUMBER_PER_YEAR=False)
+class InvoiceNumberingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_record = Client.objects.create(name='Acme', email='acme@example.com')
+
+    def _invoice(self, **kwargs):
+        kwargs.setdefault('due_date', date(2030, 1, 1))
+        return ClientInvoice(client=self.client_record, amount=100, **kwargs)
+
+    def _save(self, **kwargs):
+        invoice = self._invoice(**kwargs)
+        invoice.save()
+        return invoice.invoice_number
+
+    def test_numbers_are_consecutive_per_series(self):
+        self.assertEqual(allocate_invoice_numbers(3), ['INV-00001', 'INV-00002', 'INV-00003'])
+        self.assertEqual(self._save(), 'INV-00004')
+        self.assertEqual(allocate_invoice_numbers(prefix='CR'), ['CR-00001'])
+        self.assertEqual(allocate_invoice_numbers(year=2025), ['INV-2025-00001'])
+        self.assertEqual(allocate_invoice_numbers(0), [])
+        self.assertEqual(InvoiceSequence.objects.get(series='INV').last_value, 4)
+
+    @override_settings(INVOICE_NUMBER_PER_YEAR=True)
+    def test_per_year_series(self):
+        self.assertEqual(self._save(), f'INV-{timezone.localdate().year}-00001')
+
+    def test_new_series_is_seeded_from_existing_invoices(self):
+        # Numbers issued before the series had a sequence row; bulk_create skips save()
+        ClientInvoice.objects.bulk_create([
+            self._invoice(invoice_number=number)
+            for number in ['INV-00041', 'INV-00007', 'INV-2024-00099', 'INV-LEGACY']
+        ])
+        self.assertEqual(allocate_invoice_numbers(), ['INV-00042'])
+        self.assertEqual(allocate_invoice_numbers(year=2024), ['INV-2024-00100'])
+
+    def test_rollback_returns_the_numbers(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.assertEqual(allocate_invoice_numbers(2), ['INV-00001', 'INV-00002'])
+            raise RuntimeError
+        self.assertEqual(allocate_invoice_numbers(), ['INV-00001'])
+
+    def test_failed_insert_does_not_use_up_a_number(self):
+        self._save()
+        invalid = self._invoice(due_date=None)
+        with self.assertRaises(IntegrityError):
+            invalid.save()
+        self.assertEqual(invalid.invoice_number, '')
+        self.assertEqual(self._save(), 'INV-00002')
+
+    def test_create_invoices_takes_the_lock_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            invoices = create_invoices([self._invoice() for _ in range(3)])
+        self.assertEqual(len(_sequence_bumps(queries)), 1)
+        self.assertEqual([invoice.invoice_number for invoice in invoices], ['INV-00001', 'INV-00002', 'INV-00003'])
+        self.assertEqual(ClientInvoice.objects.count(), 3)
+
+
+@override_settings(INVOICE_NUMBER_PREFIX='INV', INVOICE_NUMBER_PER_YEAR=False)
+class InvoiceBatchCreateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.advocate = User.objects.create_user('advocate', 'advocate@example.com', 'secret')
+        cls.advocate.groups.add(Group.objects.create(name='advocates'))
+        cls.client_record = Client.objects.create(name='Acme', email='acme@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.advocate)
+
+    def _body(self, count):
+        return [{'client': self.client_record.pk, 'amount': '100.00', 'due_date': '2030-01-01'} for _ in range(count)]
+
+    def test_list_body_numbers_the_batch_with_one_allocation(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('client-invoice-list-create'), self._body(3), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['invoice_number'] for item in response.data], ['INV-00001', 'INV-00002', 'INV-00003'])
+        self.assertEqual(len(_sequence_bumps(queries)), 1)
+
+    def test_invalid_batch_allocates_nothing(self):
+        body = self._body(3)
+        del body[1]['amount']
+        response = self.client.post(reverse('client-invoice-list-create'), body, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ClientInvoice.objects.exists())
+        self.assertEqual(allocate_invoice_numbers(), ['INV-00001'])
+
+
+class PaymentTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.advocate = User.objects.create_user('advocate', 'advocate@example.com', 'secret')
+        cls.advocate.groups.add(Group.objects.create(name='advocates'))
+        cls.client_record = Client.objects.create(name='Acme', email='acme@example.com')
+
+    def _invoice(self, amount='100.00', due_in_days=30):
+        return ClientInvoice.objects.create(
+            client=self.client_record, amount=Decimal(amount),
+            due_date=timezone.localdate() + timedelta(days=due_in_days),
+        )
+
+    def _pay(self, invoice, amount):
+        return Payment.objects.create(
+            invoice=invoice, amount=Decimal(amount), payment_date=timezone.localdate(), payment_mode='cash',
+        )
+
+    def assertTotals(self, invoice, paid, pending, status):
+        invoice.refresh_from_db()
+        self.assertEqual(
+            (invoice.paid_amount, invoice.pending_amount, invoice.payment_status),
+            (Decimal(paid), Decimal(pending), status),
+        )
+
+    def test_payments_move_the_totals_and_status(self):
+        invoice = self._invoice()
+        self.assertTotals(invoice, '0', '100', 'unpaid')
+        first = self._pay(invoice, '40')
+        self.assertTotals(invoice, '40', '60', 'partial')
+        second = self._pay(invoice, '60')
+        self.assertTotals(invoice, '100', '0', 'paid')
+
+        second.amount = Decimal('10')
+        second.save()
+        self.assertTotals(invoice, '50', '50', 'partial')
+        second.delete()
+        first.delete()
+        self.assertTotals(invoice, '0', '100', 'unpaid')
+
+    def test_api_returns_totals_of_nested_payments(self):
+        api = APIClient()
+        api.force_authenticate(self.advocate)
+        payment = {'amount': '30.00', 'payment_date': '2030-01-01', 'payment_mode': 'upi'}
+        response = api.post(reverse('client-invoice-list-create'), {
+            'client': self.client_record.pk, 'amount': '100.00', 'due_date': '2030-01-01', 'payments': [payment],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            (response.data['paid_amount'], response.data['pending_amount'], response.data['payment_status']),
+            ('30.00', '70.00', 'partial'),
+        )
+
+        # 'client-invoice-detail' names both detail routes and reverses to the client one
+        response = api.patch(
+            reverse('client-invoice-list-create') + f"{response.data['id']}/",
+            {'payments': [payment, payment]}, format='json',
+        )
+        self.assertEqual((response.data['paid_amount'], response.data['payment_status']), ('60.00', 'partial'))
+
+    def test_saving_a_stale_invoice_keeps_the_paid_amount(self):
+        invoice = self._invoice()
+        stale = ClientInvoice.objects.get(pk=invoice.pk)
+        self._pay(invoice, '40')
+        # Lowering the amount to what was paid settles the invoice
+        stale.amount = Decimal('40')
+        stale.save()
+        self.assertTotals(invoice, '40', '0', 'paid')
+
+    def test_past_due_invoices_are_overdue_until_paid(self):
+        invoice = self._invoice(due_in_days=-1)
+        self.assertTotals(invoice, '0', '100', 'overdue')
+        self._pay(invoice, '30')
+        self.assertTotals(invoice, '30', '70', 'overdue')
+        self._pay(invoice, '70')
+        self.assertTotals(invoice, '100', '0', 'paid')
+
+    def test_update_invoice_status_marks_newly_overdue_invoices(self):
+        unpaid, partial, paid, current = self._invoice(), self._invoice(), self._invoice(), self._invoice()
+        self._pay(partial, '10')
+        self._pay(paid, '100')
+        # The due date passes without a save
+        ClientInvoice.objects.exclude(pk=current.pk).update(due_date=timezone.localdate() - timedelta(days=1))
+
+        out = StringIO()
+        call_command('update_invoice_status', stdout=out)
+        self.assertIn("Marked 2 invoice(s) overdue", out.getvalue())
+        self.assertTotals(unpaid, '0', '100', 'overdue')
+        self.assertTotals(partial, '10', '90', 'overdue')
+        self.assertTotals(paid, '100', '0', 'paid')
+        self.assertTotals(current, '0', '100', 'unpaid')
+
+    def test_recompute_rebuilds_totals_from_payments(self):
+        invoice = self._invoice()
+        self._pay(invoice, '25')
+        ClientInvoice.objects.filter(pk=invoice.pk).update(paid_amount=0, pending_amount=100, payment_status='unpaid')
+        call_command('update_invoice_status', recompute=True, stdout=StringIO())
+        self.assertTotals(invoice, '25', '75', 'partial')
+
+
+class BrokenPool:
+    """A process pool whose worker died: every future fails, as does every submit after the first."""
+
+    def __init__(self):
+        self.submitted = 0
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        if self.submitted > 1:
+            raise BrokenProcessPool("A child process terminated abruptly")
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def thread_pool(max_workers, mp_context=None, initializer=None):
+    # Renders in threads of the test process, where patches and the test database apply
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+@mock.patch('invoice.export.ProcessPoolExecutor', thread_pool)
+class InvoiceExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        advocates = Group.objects.create(name='advocates')
+        cls.advocate, cls.other = [
+            User.objects.create_user(name, f'{name}@example.com', 'secret') for name in ('advocate', 'other')
+        ]
+        cls.advocate.groups.add(advocates)
+        cls.other.groups.add(advocates)
+        client_record = Client.objects.create(name='Acme', email='acme@example.com')
+        for _ in range(3):
+            ClientInvoice.objects.create(
+                client=client_record, amount=100, due_date=date(2030, 1, 1), created_by=cls.advocate,
+            )
+
+    def setUp(self):
+        self.addCleanup(self._reset_executor)
+
+    def _reset_executor(self):
+        if export._executor is not None:
+            export._executor.shutdown()
+        export._executor = None
+
+    def _export(self, export_id='test'):
+        queryset = ClientInvoice.objects.order_by('invoice_number')
+        data = b''.join(export.stream_invoice_zip(queryset, export_id, self.advocate.pk))
+        return zipfile.ZipFile(io.BytesIO(data))
+
+    def test_export_and_progress_belong_to_the_user(self):
+        api = APIClient()
+        api.force_authenticate(self.advocate)
+        response = api.get(reverse('invoice-export'), {'export_id': 'mine'})
+        self.assertEqual(response['X-Export-Id'], 'mine')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 3)
+
+        progress_url = reverse('invoice-export-progress', args=['mine'])
+        response = api.get(progress_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'status': 'finished', 'done': 3, 'total': 3})
+
+        api.force_authenticate(self.other)
+        self.assertEqual(api.get(progress_url).status_code, 404)
+        self.assertEqual(api.get(reverse('invoice-export-progress', args=['unknown'])).status_code, 404)
+
+    def test_render_failure_becomes_an_error_entry(self):
+        real_render = export.render_invoice_pdf
+
+        def render(invoice, buffer):
+            if invoice.invoice_number == 'INV-00002':
+                raise ValueError('bad logo')
+            real_render(invoice, buffer)
+
+        with mock.patch('invoice.export.render_invoice_pdf', render):
+            archive = self._export()
+        self.assertEqual(
+            archive.namelist(),
+            ['Legal_Invoice_INV-00001.pdf', 'INV-00002.error.txt', 'Legal_Invoice_INV-00003.pdf'],
+        )
+        self.assertEqual(archive.read('INV-00002.error.txt'), b'Failed to render: bad logo\n')
+        self.assertEqual(export.get_progress('test', self.advocate.pk)['done'], 3)
+
+    def test_broken_pool_is_replaced(self):
+        broken = BrokenPool()
+        export._executor = broken
+        archive = self._export()
+        self.assertEqual(archive.namelist(), [f'Legal_Invoice_INV-0000{i}.pdf' for i in range(1, 4)])
+        self.assertTrue(broken.shut_down)
+        self.assertIsNot(export._executor, broken)
+        self.assertEqual(export.get_progress('test', self.advocate.pk)['status'], 'finished')
+
+
+class InvoicePdfCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        client_record = Client.objects.create(name='Acme', email='acme@example.com')
+        cls.invoice = ClientInvoice.objects.create(client=client_record, amount=100, due_date=date(2030, 1, 1))
+
+    def setUp(self):
+        # Cached PDFs go to a temporary MEDIA_ROOT instead of the repo's media directory
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = self.settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.url = reverse('download-invoice-pdf', args=[self.invoice.pk])
+        patcher = mock.patch('invoice.pdf_cache.render_invoice_pdf', wraps=render_invoice_pdf)
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.client.get(self.url, headers=headers)
+        if response.status_code == 200:
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+            response.close()
+        return response
+
+    def _cached_files(self):
+        return default_storage.listdir(f'invoice_pdfs/{self.invoice.pk}')[1]
+
+    def test_second_download_is_served_from_the_cache(self):
+        first, second = self._get(), self._get()
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.render.call_count, 1)
+        self.assertEqual(len(self._cached_files()), 1)
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self._get()['ETag']
+        response = self._get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_edits_change_the_etag_and_purge_old_files(self):
+        etag = self._get()['ETag']
+        old_files = self._cached_files()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invoice.additional_details = 'Filing fees included'
+            self.invoice.save()
+        self.assertEqual(self._cached_files(), [])
+        response = self._get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(invoice=self.invoice, amount=40, payment_date=date(2030, 1, 1), payment_mode='cash')
+        response = self._get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.render.call_count, 3)
+        self.assertEqual(len(self._cached_files()), 1)
+        self.assertNotEqual(self._cached_files(), old_files)
+
+
+@skipUnless(connection.features.has_select_for_update, "needs row locks (select_for_update)")
+@override_settings(INVOICE_NUMBER_PREFIX='INV', INVOICE_NUMBER_PER_YEAR=False)
+class ConcurrentAllocationTests(TransactionTestCase):
+
+    def test_concurrent_allocations_never_share_a_number(self):
+        allocate_invoice_numbers()  # create the sequence row up front
+
+        def allocate(_):
+            try:
+                return allocate_invoice_numbers(5)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            batches = list(executor.map(allocate, range(8)))
+        for batch in batches:
+            first = int(batch[0].rsplit('-', 1)[1])
+            self.assertEqual(batch, [f'INV-{value:05d}' for value in range(first, first + 5)])
+        numbers = [number for batch in batches for number in batch]
+        self.assertEqual(sorted(numbers), [f'INV-{value:05d}' for value in range(2, 42)])
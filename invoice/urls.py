@@ -5,6 +5,8 @@ urlpatterns = [
     # Advocate-only endpoints
     path('api/invoice/', views.ClientInvoiceListCreateView.as_view(), name='client-invoice-list-create'),
     path('api/invoice/<int:pk>/', views.ClientInvoiceRetrieveUpdateDestroyView.as_view(), name='client-invoice-detail'),
+    path('api/invoice/export/', views.InvoiceExportView.as_view(), name='invoice-export'),
+    path('api/invoice/export/<str:export_id>/progress/', views.InvoiceExportProgressView.as_view(), name='invoice-export-progress'),
     # Public endpoints
     path('api/invoice/<int:invoice_id>/download/', views.download_invoice_pdf, name='download-invoice-pdf'),
     path('api/invoice/<int:invoice_id>/print/', views.print_invoice_pdf, name='print-invoice-pdf'),
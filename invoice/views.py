@@ -1,13 +1,21 @@
 from rest_framework import serializers, generics
 from rest_framework.permissions import IsAuthenticated, BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.contrib.auth.models import User
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
-import os
-from django.conf import settings
+import uuid
 from .models import ClientInvoice, Payment
 from client.models import Client
-from .pdf_utils import generate_invoice_pdf
+from .numbering import allocate_invoice_numbers
+from .export import get_progress, stream_invoice_zip
+from .pdf_cache import serve_invoice_pdf
 
 # Custom permission for advocates group
 class IsAdvocate(BasePermission):
@@ -50,35 +58,32 @@ class ClientInvoiceSerializer(serializers.ModelSerializer):
         queryset=Client.objects.all()
     )
     payments = PaymentSerializer(many=True, required=False)
-    paid_amount = serializers.SerializerMethodField()
-    pending_amount = serializers.SerializerMethodField()
 
     class Meta:
         model = ClientInvoice
         fields = [
             'id', 'invoice_number', 'client', 'amount', 'due_date',
             'reference_no', 'additional_details', 'created_at',
-            'created_by', 'payments', 'paid_amount', 'pending_amount'
+            'created_by', 'payments', 'paid_amount', 'pending_amount', 'payment_status'
         ]
-        read_only_fields = ['id', 'invoice_number', 'created_at', 'created_by', 'paid_amount', 'pending_amount']
-
-    def get_paid_amount(self, obj):
-        return obj.get_paid_amount()
-
-    def get_pending_amount(self, obj):
-        return obj.get_pending_amount()
+        read_only_fields = ['id', 'invoice_number', 'created_at', 'created_by', 'paid_amount', 'pending_amount', 'payment_status']
 
     def create(self, validated_data):
         request = self.context.get('request')
         payments_data = validated_data.pop('payments', [])
         if request and hasattr(request, 'user') and request.user.is_authenticated:
             validated_data['created_by'] = request.user
+        # Batch creation hands out numbers reserved up front by the view
+        invoice_numbers = self.context.get('invoice_numbers')
+        if invoice_numbers is not None:
+            validated_data['invoice_number'] = next(invoice_numbers)
         instance = super().create(validated_data)
         
         for payment_data in payments_data:
             payment_data['created_by'] = request.user
             Payment.objects.create(invoice=instance, **payment_data)
-        
+
+        instance.refresh_from_db(fields=['paid_amount', 'pending_amount', 'payment_status'])
         return instance
 
     def update(self, instance, validated_data):
@@ -103,16 +108,40 @@ class ClientInvoiceSerializer(serializers.ModelSerializer):
                 payment.save()
             else:
                 Payment.objects.create(invoice=instance, **payment_data)
-        
+
+        instance.refresh_from_db(fields=['paid_amount', 'pending_amount', 'payment_status'])
         return instance
 
+# ?payment_status=overdue&ordering=-pending_amount etc. on the invoice lists
+INVOICE_FILTERSET_FIELDS = {
+    'payment_status': ['exact', 'in'],
+    'due_date': ['exact', 'gte', 'lte'],
+}
+INVOICE_ORDERING_FIELDS = ['invoice_number', 'amount', 'paid_amount', 'pending_amount', 'payment_status', 'due_date', 'created_at']
+
 class ClientInvoiceListCreateView(generics.ListCreateAPIView):
     queryset = ClientInvoice.objects.all()
     serializer_class = ClientInvoiceSerializer
     permission_classes = [IsAuthenticated, IsAdvocate]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = dict(INVOICE_FILTERSET_FIELDS, client=['exact'])
+    ordering_fields = INVOICE_ORDERING_FIELDS
 
     def get_queryset(self):
-        return ClientInvoice.objects.filter(created_by=self.request.user)
+        return ClientInvoice.objects.filter(created_by=self.request.user).select_related('client').prefetch_related('payments')
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        # A list body creates a batch of invoices under one number allocation
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            numbers = allocate_invoice_numbers(len(serializer.validated_data))
+            serializer.context['invoice_numbers'] = iter(numbers)
+            serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 class ClientInvoiceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = ClientInvoice.objects.all()
@@ -125,11 +154,14 @@ class ClientInvoiceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIVi
 class ClientInvoiceListView(generics.ListAPIView):
     serializer_class = ClientInvoiceSerializer
     permission_classes = [IsAuthenticated, IsClient]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = INVOICE_FILTERSET_FIELDS
+    ordering_fields = INVOICE_ORDERING_FIELDS
 
     def get_queryset(self):
         try:
             client = Client.objects.get(user=self.request.user)
-            return ClientInvoice.objects.filter(client=client)
+            return ClientInvoice.objects.filter(client=client).prefetch_related('payments')
         except Client.DoesNotExist:
             return ClientInvoice.objects.none()
 
@@ -144,22 +176,55 @@ class ClientInvoiceRetrieveView(generics.RetrieveAPIView):
         except Client.DoesNotExist:
             return ClientInvoice.objects.none()
 
+class InvoiceExportView(generics.GenericAPIView):
+    """
+    Stream a ZIP with the PDFs of the advocate's invoices.
+
+    Accepts the invoice list filters (``client``, ``due_date__gte``,
+    ``due_date__lte``, ``payment_status``) plus ``unpaid=true``. Pass an
+    ``export_id`` (or read the X-Export-Id header) to poll progress.
+    """
+    queryset = ClientInvoice.objects.all()
+    permission_classes = [IsAuthenticated, IsAdvocate]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = dict(INVOICE_FILTERSET_FIELDS, client=['exact'])
+
+    def get_queryset(self):
+        queryset = ClientInvoice.objects.filter(created_by=self.request.user)
+        if self.request.query_params.get('unpaid', '').lower() in ('1', 'true', 'yes'):
+            queryset = queryset.exclude(payment_status='paid')
+        return queryset.order_by('invoice_number')
+
+    def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        export_id = request.query_params.get('export_id') or uuid.uuid4().hex
+        response = StreamingHttpResponse(stream_invoice_zip(queryset, export_id, request.user.pk), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="invoices_{timezone.localdate():%Y%m%d}.zip"'
+        response['X-Export-Id'] = export_id
+        return response
+
+class InvoiceExportProgressView(APIView):
+    permission_classes = [IsAuthenticated, IsAdvocate]
+
+    def get(self, request, export_id):
+        progress = get_progress(export_id, request.user.pk)
+        if progress is None:
+            return Response({"error": "Unknown export"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress)
+
 def download_invoice_pdf(request, invoice_id):
     invoice = get_object_or_404(ClientInvoice, id=invoice_id)
-    response = HttpResponse(content_type='application/pdf')
-    return generate_invoice_pdf(invoice, response, is_download=True)
+    return serve_invoice_pdf(request, invoice, is_download=True)
 
 def print_invoice_pdf(request, invoice_id):
     invoice = get_object_or_404(ClientInvoice, id=invoice_id)
-    response = HttpResponse(content_type='application/pdf')
-    return generate_invoice_pdf(invoice, response, is_download=False)
+    return serve_invoice_pdf(request, invoice, is_download=False)
 
 def client_download_invoice_pdf(request, invoice_id):
     try:
         client = Client.objects.get(user=request.user)
         invoice = get_object_or_404(ClientInvoice, id=invoice_id, client=client)
-        response = HttpResponse(content_type='application/pdf')
-        return generate_invoice_pdf(invoice, response, is_download=True)
+        return serve_invoice_pdf(request, invoice, is_download=True)
     except Client.DoesNotExist:
         return HttpResponse("Client profile not found.", status=404)
 
@@ -167,7 +232,6 @@ def client_print_invoice_pdf(request, invoice_id):
     try:
         client = Client.objects.get(user=request.user)
         invoice = get_object_or_404(ClientInvoice, id=invoice_id, client=client)
-        response = HttpResponse(content_type='application/pdf')
-        return generate_invoice_pdf(invoice, response, is_download=False)
+        return serve_invoice_pdf(request, invoice, is_download=False)
     except Client.DoesNotExist:
-        return HttpResponse("Client profile not found.", status=404)
\ No newline at end of file
+        return HttpResponse("Client profile not found.", status=404)
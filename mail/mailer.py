@@ -1,162 +1,344 @@
 # mailer.py
+import hashlib
 import threading
+import time
 import re
 import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from wagtail.images.models import Image
 from wagtail.documents.models import Document
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
 from django.utils.html import strip_tags
 from email.mime.image import MIMEImage
 from email.mime.application import MIMEApplication
+from .outbox import enqueue_email
 
 
 
 
 
-def process_rich_text_attachments(rich_text_content):
-    """Process embeds (images) and links (documents) in RichTextField and prepare attachments"""
-    html_content = str(rich_text_content)
-    attachments = []
+IMAGE_EMBED_PATTERN = re.compile(r'<embed[^>]+embedtype="image"[^>]+id="(\d+)"[^>]*>')
+DOCUMENT_LINK_PATTERN = re.compile(r'<a[^>]+linktype="document"[^>]+id="(\d+)"[^>]*>(.*?)</a>')
+
+# content hash -> (compiled_at, html, attachment descriptors without file contents)
+_compiled = OrderedDict()
+# (path, mtime_ns, size) -> file bytes, bounded by MAIL_ATTACHMENT_CACHE_BYTES
+_payloads = OrderedDict()
+_payload_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (path, stat.st_mtime_ns, stat.st_size)
 
-    # Process embedded images
-    embed_pattern = r'<embed[^>]+embedtype="image"[^>]+id="(\d+)"[^>]*>'
-    embed_matches = re.finditer(embed_pattern, html_content)
 
-    for match in embed_matches:
+def _read_payload(key):
+    """File bytes for ``key`` from the LRU, reading (and caching) the file on a miss."""
+    global _payload_bytes
+    with _cache_lock:
+        content = _payloads.get(key)
+        if content is not None:
+            _payloads.move_to_end(key)
+            return content
+
+    with open(key[0], 'rb') as f:
+        content = f.read()
+
+    budget = getattr(settings, 'MAIL_ATTACHMENT_CACHE_BYTES', 32 * 1024 * 1024)
+    # Large files would evict everything else; send those straight from disk
+    if len(content) <= budget // 4:
+        with _cache_lock:
+            if key not in _payloads:
+                _payloads[key] = content
+                _payload_bytes += len(content)
+                while _payload_bytes > budget:
+                    _, evicted = _payloads.popitem(last=False)
+                    _payload_bytes -= len(evicted)
+    return content
+
+
+def _compile_rich_text(html_content):
+    """Rewrite image embeds to cid: references and collect attachment descriptors."""
+    image_ids = {int(image_id) for image_id in IMAGE_EMBED_PATTERN.findall(html_content)}
+    images = Image.objects.in_bulk(image_ids) if image_ids else {}
+    descriptors = []
+
+    # Process embedded images
+    for match in IMAGE_EMBED_PATTERN.finditer(html_content):
         image_id = match.group(1)
-        try:
-            wagtail_image = Image.objects.get(id=image_id)
-            image_path = wagtail_image.file.path
-            if os.path.exists(image_path):
-                cid = f"image_{image_id}"
-                with open(image_path, 'rb') as f:
-                    image_content = f.read()
-                mime_type = (
-                    'image/jpeg' if wagtail_image.filename.lower().endswith(('.jpg', '.jpeg'))
-                    else 'image/png'
-                )
-                attachments.append({
-                    'type': 'image',
-                    'filename': wagtail_image.filename,
-                    'content': image_content,
-                    'mime_type': mime_type,
-                    'cid': cid
-                })
-                html_content = html_content.replace(
-                    match.group(0),
-                    f'<img src="cid:{cid}" alt="{wagtail_image.title}">'
-                )
-        except Image.DoesNotExist:
+        wagtail_image = images.get(int(image_id))
+        if wagtail_image is None:
             continue
+        image_path = wagtail_image.file.path
+        if os.path.exists(image_path):
+            cid = f"image_{image_id}"
+            mime_type = (
+                'image/jpeg' if wagtail_image.filename.lower().endswith(('.jpg', '.jpeg'))
+                else 'image/png'
+            )
+            descriptors.append({
+                'type': 'image',
+                'filename': wagtail_image.filename,
+                'path': image_path,
+                'mime_type': mime_type,
+                'cid': cid
+            })
+            html_content = html_content.replace(
+                match.group(0),
+                f'<img src="cid:{cid}" alt="{wagtail_image.title}">'
+            )
 
     # Process document links
-    doc_pattern = r'<a[^>]+linktype="document"[^>]+id="(\d+)"[^>]*>(.*?)</a>'
-    doc_matches = re.finditer(doc_pattern, html_content)
-
-    for match in doc_matches:
-        doc_id = match.group(1)
-        doc_title = match.group(2)
-        try:
-            wagtail_doc = Document.objects.get(id=doc_id)
-            doc_path = wagtail_doc.file.path
-            if os.path.exists(doc_path):
-                with open(doc_path, 'rb') as f:
-                    doc_content = f.read()
-                mime_type = (
-                    'application/pdf' if wagtail_doc.filename.lower().endswith('.pdf')
-                    else 'application/octet-stream'
-                )
-                attachments.append({
-                    'type': 'document',
-                    'filename': wagtail_doc.filename,
-                    'content': doc_content,
-                    'mime_type': mime_type,
-                    'cid': None
-                })
-        except Document.DoesNotExist:
+    document_ids = {int(doc_id) for doc_id, _ in DOCUMENT_LINK_PATTERN.findall(html_content)}
+    documents = Document.objects.in_bulk(document_ids) if document_ids else {}
+    for match in DOCUMENT_LINK_PATTERN.finditer(html_content):
+        wagtail_doc = documents.get(int(match.group(1)))
+        if wagtail_doc is None:
             continue
+        doc_path = wagtail_doc.file.path
+        if os.path.exists(doc_path):
+            mime_type = (
+                'application/pdf' if wagtail_doc.filename.lower().endswith('.pdf')
+                else 'application/octet-stream'
+            )
+            descriptors.append({
+                'type': 'document',
+                'filename': wagtail_doc.filename,
+                'path': doc_path,
+                'mime_type': mime_type,
+                'cid': None
+            })
+
+    return html_content, descriptors
+
 
+def clear_attachment_cache():
+    global _payload_bytes
+    with _cache_lock:
+        _compiled.clear()
+        _payloads.clear()
+        _payload_bytes = 0
+
+
+def process_rich_text_attachments(rich_text_content):
+    """
+    Process embeds (images) and links (documents) in RichTextField and prepare attachments.
+
+    The rewritten HTML is cached per content hash for MAIL_COMPILED_CACHE_TTL
+    seconds and file contents in a bounded LRU, so sending one newsletter to
+    many recipients queries and reads each image and document once.
+    """
+    html_content = str(rich_text_content)
+    key = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+    ttl = getattr(settings, 'MAIL_COMPILED_CACHE_TTL', 300)
+    now = time.monotonic()
+
+    with _cache_lock:
+        hit = _compiled.get(key)
+        fresh = hit is not None and now - hit[0] < ttl
+        if fresh:
+            _compiled.move_to_end(key)
+    if fresh:
+        _, html_content, descriptors = hit
+    else:
+        html_content, descriptors = _compile_rich_text(html_content)
+        with _cache_lock:
+            _compiled[key] = (now, html_content, descriptors)
+            _compiled.move_to_end(key)
+            while len(_compiled) > getattr(settings, 'MAIL_COMPILED_CACHE_SIZE', 256):
+                _compiled.popitem(last=False)
+
+    attachments = []
+    for descriptor in descriptors:
+        file_key = _file_key(descriptor['path'])
+        if file_key is None:
+            continue  # removed since the message was compiled
+        attachment = dict(descriptor)
+        attachment['content'] = _read_payload(file_key)
+        del attachment['path']
+        attachments.append(attachment)
     return html_content, attachments
 
+_executor = None
+_executor_lock = threading.Lock()
 
 
+def get_executor():
+    """Bounded pool for fire-and-forget sends (``use_thread=True``)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'MAIL_SEND_WORKERS', 4),
+                    thread_name_prefix='mail',
+                )
+    return _executor
 
 
+def build_email(subject, rich_text_content, to=(), cc=(), bcc=(), connection=None):
+    """Build the CLH-branded message for ``rich_text_content`` with its inline images and documents."""
+    # Process HTML content and extract attachments
+    html_message, attachments = process_rich_text_attachments(rich_text_content)
+    plain_message = strip_tags(html_message)
 
+    # Prepare custom header
+    header_text = settings.EMAIL_CUSTOM_HEADER.get("text", "")
+    header_style = settings.EMAIL_CUSTOM_HEADER.get("style", "")
 
+    # Final HTML content with header
+    full_html = f"""<!DOCTYPE html>
+    <html>
+    <head><meta charset="UTF-8"><title>{subject}</title></head>
+    <body>
+        <div style="{header_style}">{header_text}</div>
+        {html_message}
+    </body>
+    </html>"""
 
+    # Construct email
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=plain_message,
+        from_email=settings.EMAIL_SENDER_NAME,
+        to=list(to),
+        bcc=list(bcc),
+        cc=list(cc),
+        connection=connection,
+    )
+    email.attach_alternative(full_html, "text/html")
+    email.mixed_subtype = 'related'
+    email.extra_headers['X-Custom-Header'] = "Email sent by CLH"
+
+    # Attach files
+    for attachment in attachments:
+        content = attachment['content']
+        filename = attachment['filename']
+        mime_subtype = attachment['mime_type'].split('/')[1]
+
+        if attachment['type'] == 'image':
+            img = MIMEImage(content, _subtype=mime_subtype)
+            img.add_header('Content-ID', f"<{attachment['cid']}>")
+            img.add_header('Content-Disposition', 'inline', filename=filename)
+            email.attach(img)
+
+        elif attachment['type'] == 'document':
+            doc = MIMEApplication(content, _subtype=mime_subtype)
+            doc.add_header('Content-Disposition', 'attachment', filename=filename)
+            email.attach(doc)
+
+    return email
 
 
 def send_email(subject, rich_text_content,use_thread=False, **kwargs):
-    """Send an email with rich text content, custom header, and attachments."""
+    """
+    Send an email with rich text content, custom header, and attachments.
+
+    With ``MAIL_USE_OUTBOX`` the email is only written to the outbox and sent
+    by ``manage.py run_mail_outbox``; ``use_thread`` then has no effect. A
+    failure to queue is raised to the caller, as nothing would retry it.
+    """
     if not settings.ENABLE_EMAIL:
         return
-    
-    def send():
 
+    if getattr(settings, 'MAIL_USE_OUTBOX', False):
+        enqueue_email(
+            subject, rich_text_content,
+            to=kwargs.get('to', []), cc=kwargs.get('cc', []), bcc=kwargs.get('bcc', []),
+        )
+        return
+
+    def send():
         try:
-            # Process HTML content and extract attachments
-            html_message, attachments = process_rich_text_attachments(rich_text_content)
-            plain_message = strip_tags(html_message)
-
-            # Prepare custom header
-            header_text = settings.EMAIL_CUSTOM_HEADER.get("text", "")
-            header_style = settings.EMAIL_CUSTOM_HEADER.get("style", "")
-
-            # Final HTML content with header
-            full_html = f"""<!DOCTYPE html>
-            <html>
-            <head><meta charset="UTF-8"><title>{subject}</title></head>
-            <body>
-                <div style="{header_style}">{header_text}</div>
-                {html_message}
-            </body>
-            </html>"""
-
-            # Recipients
-            to_list = list(kwargs.get('to', []))
-            bcc_list = list(kwargs.get('bcc', []))
-            cc_list = list(kwargs.get('cc', []))
-
-            # Construct email
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=plain_message,
-                from_email=settings.EMAIL_SENDER_NAME,
-                to=to_list,
-                bcc=bcc_list,
-                cc=cc_list
+            email = build_email(
+                subject, rich_text_content,
+                to=kwargs.get('to', []), cc=kwargs.get('cc', []), bcc=kwargs.get('bcc', []),
             )
-            email.attach_alternative(full_html, "text/html")
-            email.mixed_subtype = 'related'
-            email.extra_headers['X-Custom-Header'] = "Email sent by CLH"
-
-            # Attach files
-            for attachment in attachments:
-                content = attachment['content']
-                filename = attachment['filename']
-                mime_subtype = attachment['mime_type'].split('/')[1]
-
-                if attachment['type'] == 'image':
-                    img = MIMEImage(content, _subtype=mime_subtype)
-                    img.add_header('Content-ID', f"<{attachment['cid']}>")
-                    img.add_header('Content-Disposition', 'inline', filename=filename)
-                    email.attach(img)
-
-                elif attachment['type'] == 'document':
-                    doc = MIMEApplication(content, _subtype=mime_subtype)
-                    doc.add_header('Content-Disposition', 'attachment', filename=filename)
-                    email.attach(doc)
-
-            # Send the email
             email.send(fail_silently=False)
-
         except Exception as e:
             print(f"Error sending email: {e}")
-    
+
     if use_thread:
-        thread = threading.Thread(target=send)
-        thread.start()
+        get_executor().submit(send)
     else:
         send()
+
+
+def _send_batch(batch, max_retries, backoff, report, report_lock):
+    """Send ``(index, message)`` pairs over one SMTP connection, reconnecting after failures."""
+    connection = get_connection()
+    connections = 0
+    try:
+        for index, message in batch:
+            attempt = 0
+            while True:
+                try:
+                    email = build_email(
+                        message['subject'], message['rich_text_content'],
+                        to=message.get('to', []), cc=message.get('cc', []), bcc=message.get('bcc', []),
+                        connection=connection,
+                    )
+                    # open() is a no-op returning False while the connection is still up
+                    if connection.open():
+                        connections += 1
+                    if not email.send(fail_silently=False):
+                        raise RuntimeError("the backend accepted no recipients")
+                except Exception as e:
+                    attempt += 1
+                    # Drop a possibly broken connection; the next send reopens it
+                    connection.close()
+                    if attempt > max_retries:
+                        with report_lock:
+                            report['failed'].append({'index': index, 'to': message.get('to', []), 'error': str(e)})
+                        break
+                    time.sleep(backoff * 2 ** (attempt - 1))
+                else:
+                    with report_lock:
+                        report['sent'] += 1
+                        report['retries'] += attempt
+                    break
+    finally:
+        connection.close()
+        with report_lock:
+            report['connections'] += connections
+
+
+def send_mass_email(messages, workers=None, max_retries=None, backoff=None):
+    """
+    Send many emails over a few reused connections.
+
+    ``messages`` are dicts with the ``send_email`` arguments (``subject``,
+    ``rich_text_content``, ``to``, ``cc``, ``bcc``). They are split across at
+    most ``workers`` threads; each keeps one connection from
+    ``get_connection()`` open for its share and retries a failed message with
+    exponential backoff. Returns a report::
+
+        {'total': n, 'sent': n, 'failed': [{'index', 'to', 'error'}, ...],
+         'retries': n, 'connections': n, 'elapsed': seconds}
+    """
+    messages = list(messages)
+    report = {'total': len(messages), 'sent': 0, 'failed': [], 'retries': 0, 'connections': 0, 'elapsed': 0.0}
+    if not settings.ENABLE_EMAIL or not messages:
+        return report
+
+    workers = workers or getattr(settings, 'MAIL_SEND_WORKERS', 4)
+    max_retries = max_retries if max_retries is not None else getattr(settings, 'MAIL_SEND_MAX_RETRIES', 3)
+    backoff = backoff if backoff is not None else getattr(settings, 'MAIL_SEND_RETRY_BACKOFF', 1.0)
+
+    started = time.monotonic()
+    indexed = list(enumerate(messages))
+    workers = max(1, min(workers, len(indexed)))
+    batches = [indexed[offset::workers] for offset in range(workers)]
+    report_lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mass-mail') as executor:
+        for future in [executor.submit(_send_batch, batch, max_retries, backoff, report, report_lock) for batch in batches]:
+            future.result()
+    report['failed'].sort(key=lambda failure: failure['index'])
+    report['elapsed'] = time.monotonic() - started
+    return report
@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from mail.outbox import claim_batch, deliver_batch, queue_stats, requeue_stuck
+
+
+def _claim_and_deliver(batch_size):
+    close_old_connections()
+    try:
+        messages = claim_batch(batch_size)
+        if not messages:
+            return None
+        return deliver_batch(messages)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued outbox emails. Each worker claims a batch and sends it over one SMTP "
+        "connection; failures are retried with backoff and dead-lettered after the last attempt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Batches sent in parallel (one SMTP connection each)")
+        parser.add_argument('--batch-size', type=int, default=50, help="Messages claimed per batch")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--metrics-interval', type=float, default=60.0, help="Seconds between metrics lines")
+        parser.add_argument('--once', action='store_true', help="Drain what is due now and exit")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        totals = {'sent': 0, 'retried': 0, 'dead': 0}
+        started = last_metrics = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox') as executor:
+            while True:
+                requeued = requeue_stuck()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stuck message(s)")
+
+                futures = [executor.submit(_claim_and_deliver, options['batch_size']) for _ in range(workers)]
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        # Claimed rows are picked up again by requeue_stuck()
+                        self.stderr.write(f"Outbox batch failed: {e}")
+                        results.append(None)
+                for counts in filter(None, results):
+                    for key in totals:
+                        totals[key] += counts[key]
+                idle = not any(results)
+
+                now = time.monotonic()
+                if now - last_metrics >= options['metrics_interval'] or (options['once'] and idle):
+                    self._write_metrics(totals, now - started)
+                    last_metrics = now
+                if idle:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+
+    def _write_metrics(self, totals, elapsed):
+        stats = queue_stats()
+        rate = totals['sent'] / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"sent {totals['sent']} ({rate:.1f}/s), retried {totals['retried']}, dead {totals['dead']}; "
+            f"queue: {stats['queued']} queued, {stats['sending']} sending, {stats['dead']} dead, "
+            f"oldest due {stats['oldest_due_age']:.0f}s"
+        )
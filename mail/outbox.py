@@ -0,0 +1,115 @@
+"""
+Database-backed outbox for outgoing email.
+
+With ``MAIL_USE_OUTBOX``, ``send_email`` only inserts a row here, so a
+request never waits on SMTP and a recycled web worker cannot lose mail in
+flight. ``run_mail_outbox`` claims rows in batches, sends each batch over one
+connection and schedules failed messages for a retry with exponential backoff.
+After ``max_attempts`` a message is dead-lettered (status ``dead``) and left
+for inspection.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from .models import OutboundEmail
+
+
+def enqueue_email(subject, rich_text_content, to=(), cc=(), bcc=()):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        rich_text_content=str(rich_text_content),
+        to=list(to),
+        cc=list(cc),
+        bcc=list(bcc),
+        max_attempts=getattr(settings, 'MAIL_OUTBOX_MAX_ATTEMPTS', 5),
+        next_attempt_at=timezone.now(),
+    )
+
+
+def claim_batch(limit):
+    """Lock up to ``limit`` due messages for this worker and mark them as sending."""
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked lets several workers claim disjoint batches without waiting on each other
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(pk__in=ids, status='queued').update(status='sending', locked_at=now)
+    return list(OutboundEmail.objects.filter(pk__in=ids, status='sending', locked_at=now).order_by('pk'))
+
+
+def _record_failure(message, error):
+    message.attempts += 1
+    message.last_error = error
+    message.locked_at = None
+    if message.attempts >= message.max_attempts:
+        message.status = 'dead'
+    else:
+        backoff = getattr(settings, 'MAIL_OUTBOX_RETRY_BACKOFF', 30)
+        message.status = 'queued'
+        message.next_attempt_at = timezone.now() + timedelta(seconds=backoff * 2 ** (message.attempts - 1))
+    message.save(update_fields=['attempts', 'last_error', 'locked_at', 'status', 'next_attempt_at'])
+
+
+def deliver_batch(messages):
+    """Send claimed messages over one connection; returns ``{'sent', 'retried', 'dead'}`` counts."""
+    # Imported here: mailer imports this module for send_email
+    from .mailer import build_email
+
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    connection = get_connection()
+    try:
+        for message in messages:
+            try:
+                email = build_email(
+                    message.subject, message.rich_text_content,
+                    to=message.to, cc=message.cc, bcc=message.bcc, connection=connection,
+                )
+                # Opened here rather than by send(), which would close it again after
+                # every message; a no-op while the connection is still up
+                connection.open()
+                if not email.send(fail_silently=False):
+                    raise RuntimeError("the backend accepted no recipients")
+            except Exception as e:
+                # Drop a possibly broken connection; the next send reopens it
+                connection.close()
+                _record_failure(message, str(e))
+                counts['dead' if message.status == 'dead' else 'retried'] += 1
+            else:
+                OutboundEmail.objects.filter(pk=message.pk).update(
+                    status='sent', attempts=message.attempts + 1, sent_at=timezone.now(),
+                    locked_at=None, last_error=None,
+                )
+                counts['sent'] += 1
+    finally:
+        connection.close()
+    return counts
+
+
+def requeue_stuck(older_than=None):
+    """Return messages to the queue whose worker died while sending them."""
+    older_than = older_than or getattr(settings, 'MAIL_OUTBOX_STUCK_AFTER', 600)
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return OutboundEmail.objects.filter(status='sending', locked_at__lt=cutoff).update(
+        status='queued', locked_at=None
+    )
+
+
+def queue_stats():
+    """Row counts per status plus the age in seconds of the oldest due message."""
+    stats = {status: 0 for status, _ in OutboundEmail.STATUS_CHOICES}
+    for row in OutboundEmail.objects.values('status').annotate(count=Count('pk')):
+        stats[row['status']] = row['count']
+    oldest = OutboundEmail.objects.filter(status='queued', next_attempt_at__lte=timezone.now()).aggregate(
+        oldest=Min('next_attempt_at')
+    )['oldest']
+    stats['oldest_due_age'] = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+    return stats
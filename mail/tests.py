@@ -1,3 +1,214 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from wagtail.documents.models import Document
+from wagtail.images.models import Image
+from wagtail.images.tests.utils import get_test_image_file
+from . import mailer
+from .mailer import clear_attachment_cache, process_rich_text_attachments, send_email, send_mass_email
+from .models import OutboundEmail
+from .outbox import claim_batch, deliver_batch
 
-# Create your tests here.
+
+class CountingBackend(EmailBackend):
+    """locmem backend that opens and closes a connection the way the SMTP backend does."""
+
+    opened = 0
+    fail_for = set()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected = False
+
+    def open(self):
+        if self.connected:
+            return False
+        CountingBackend.opened += 1
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            for message in messages:
+                if set(message.to) & self.fail_for:
+                    raise OSError("421 try again later")
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
+
+
+@override_settings(
+    EMAIL_BACKEND='mail.tests.CountingBackend', ENABLE_EMAIL=True, MAIL_USE_OUTBOX=True,
+)
+class OutboxDeliveryTests(TestCase):
+
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.fail_for = set()
+
+    def _queue(self, count):
+        for i in range(count):
+            send_email(f'Notice {i}', '<p>Hello</p>', to=[f'user{i}@example.com'])
+
+    def test_batch_is_sent_over_one_connection(self):
+        self._queue(5)
+        counts = deliver_batch(claim_batch(10))
+        self.assertEqual(counts, {'sent': 5, 'retried': 0, 'dead': 0})
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 5)
+
+    def test_failure_reconnects_and_schedules_a_retry(self):
+        self._queue(4)
+        CountingBackend.fail_for = {'user1@example.com'}
+        counts = deliver_batch(claim_batch(10))
+        self.assertEqual(counts, {'sent': 3, 'retried': 1, 'dead': 0})
+        # The failed send drops the connection; the next message opens a new one
+        self.assertEqual(CountingBackend.opened, 2)
+        failed = OutboundEmail.objects.get(status='queued')
+        self.assertEqual((failed.to, failed.attempts), (['user1@example.com'], 1))
+
+    def test_queueing_failure_is_raised(self):
+        with mock.patch('mail.mailer.enqueue_email', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(RuntimeError):
+                send_email('Notice', '<p>Hello</p>', to=['user@example.com'])
+
+
+@override_settings(
+    EMAIL_BACKEND='mail.tests.CountingBackend', ENABLE_EMAIL=True, MAIL_USE_OUTBOX=False,
+)
+class SendMassEmailTests(TestCase):
+
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.fail_for = set()
+
+    def _messages(self, count):
+        return [
+            {'subject': f'Notice {i}', 'rich_text_content': '<p>Hello</p>', 'to': [f'user{i}@example.com']}
+            for i in range(count)
+        ]
+
+    def test_each_worker_sends_its_share_over_one_connection(self):
+        report = send_mass_email(self._messages(6), workers=2, max_retries=0, backoff=0)
+        self.assertEqual(
+            {key: report[key] for key in ('total', 'sent', 'failed', 'retries', 'connections')},
+            {'total': 6, 'sent': 6, 'failed': [], 'retries': 0, 'connections': 2},
+        )
+        self.assertEqual(CountingBackend.opened, 2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'user{i}@example.com' for i in range(6)])
+
+    def test_failed_recipient_is_reported_and_the_rest_delivered(self):
+        CountingBackend.fail_for = {'user1@example.com'}
+        with mock.patch('mail.mailer.time.sleep') as sleep:
+            report = send_mass_email(self._messages(4), workers=1, max_retries=2, backoff=0.5)
+        self.assertEqual((report['sent'], report['retries']), (3, 0))
+        self.assertEqual(report['failed'], [{'index': 1, 'to': ['user1@example.com'], 'error': '421 try again later'}])
+        self.assertEqual([c.args for c in sleep.call_args_list], [(0.5,), (1.0,)])
+        # The first connection, one per retry, and a new one after giving up
+        self.assertEqual(report['connections'], 4)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['user0@example.com', 'user2@example.com', 'user3@example.com'])
+
+    def test_transient_failure_is_retried(self):
+        CountingBackend.fail_for = {'user0@example.com'}
+        with mock.patch('mail.mailer.time.sleep', side_effect=lambda seconds: CountingBackend.fail_for.clear()):
+            report = send_mass_email(self._messages(2), workers=1, max_retries=3, backoff=0)
+        self.assertEqual((report['sent'], report['retries'], report['failed']), (2, 1, []))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_nothing_is_sent_with_email_disabled(self):
+        with self.settings(ENABLE_EMAIL=False):
+            report = send_mass_email(self._messages(3))
+        self.assertEqual((report['total'], report['sent'], report['connections']), (3, 0, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+class CompiledMessageCacheTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = self.settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        clear_attachment_cache()
+        self.addCleanup(clear_attachment_cache)
+
+        self.image = Image.objects.create(title='logo', file=get_test_image_file('logo.png'))
+        self.document = Document.objects.create(title='terms', file=ContentFile(b'%PDF-1.4 terms', name='terms.pdf'))
+        self.html = (
+            f'<p>Hello</p><embed embedtype="image" id="{self.image.pk}" format="fullwidth"/>'
+            f'<a linktype="document" id="{self.document.pk}">Terms</a>'
+        )
+
+    def _reads(self):
+        return mock.patch('mail.mailer.open', side_effect=open, create=True)
+
+    def test_repeat_sends_reuse_the_compiled_message_and_payloads(self):
+        with self.assertNumQueries(2), self._reads() as reads:
+            html, attachments = process_rich_text_attachments(self.html)
+        self.assertIn(f'<img src="cid:image_{self.image.pk}" alt="logo">', html)
+        self.assertEqual([(a['type'], a['filename'], a['cid']) for a in attachments], [
+            ('image', 'logo.png', f'image_{self.image.pk}'), ('document', 'terms.pdf', None),
+        ])
+        self.assertEqual(attachments[1]['content'], b'%PDF-1.4 terms')
+        self.assertEqual(reads.call_count, 2)
+
+        with self.assertNumQueries(0), self._reads() as reads:
+            self.assertEqual(process_rich_text_attachments(self.html), (html, attachments))
+        reads.assert_not_called()
+
+    def test_changed_content_is_compiled_again(self):
+        process_rich_text_attachments(self.html)
+        with self.assertNumQueries(2), self._reads() as reads:
+            html, attachments = process_rich_text_attachments(self.html + '<p>Regards</p>')
+        self.assertTrue(html.endswith('<p>Regards</p>'))
+        # Same files, so their bytes still come from the payload cache
+        self.assertEqual(len(attachments), 2)
+        reads.assert_not_called()
+
+    def test_expired_entry_is_compiled_again(self):
+        process_rich_text_attachments(self.html)
+        with self.settings(MAIL_COMPILED_CACHE_TTL=0), self.assertNumQueries(2):
+            process_rich_text_attachments(self.html)
+
+    def test_rewritten_or_removed_file_is_not_served_stale(self):
+        process_rich_text_attachments(self.html)
+        with open(self.document.file.path, 'wb') as f:
+            f.write(b'%PDF-1.4 revised terms')
+        _, attachments = process_rich_text_attachments(self.html)
+        self.assertEqual(attachments[1]['content'], b'%PDF-1.4 revised terms')
+
+        os.remove(self.document.file.path)
+        _, attachments = process_rich_text_attachments(self.html)
+        self.assertEqual([a['type'] for a in attachments], ['image'])
+
+    def test_least_recently_used_message_is_evicted(self):
+        with self.settings(MAIL_COMPILED_CACHE_SIZE=2):
+            process_rich_text_attachments('<p>one</p>')
+            process_rich_text_attachments('<p>two</p>')
+            process_rich_text_attachments('<p>one</p>')
+            process_rich_text_attachments('<p>three</p>')
+        self.assertEqual([html for _, html, _ in mailer._compiled.values()], ['<p>one</p>', '<p>three</p>'])
+
+    def test_payloads_are_bounded_by_size(self):
+        documents = [
+            Document.objects.create(title=f'doc{i}', file=ContentFile(b'x' * 100, name=f'doc{i}.pdf'))
+            for i in range(5)
+        ] + [Document.objects.create(title='big', file=ContentFile(b'x' * 101, name='big.pdf'))]
+
+        with self.settings(MAIL_ATTACHMENT_CACHE_BYTES=400):
+            for document in documents:
+                _, attachments = process_rich_text_attachments(f'<a linktype="document" id="{document.pk}">Doc</a>')
+        # Only four 100-byte files fit; the 101-byte one is over a quarter of the budget and never cached
+        self.assertEqual(len(attachments[0]['content']), 101)
+        self.assertEqual([key[0] for key in mailer._payloads], [document.file.path for document in documents[1:5]])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from reminder.scheduler import ReminderScheduler, backfill_next_fire_at
+
+
+class Command(BaseCommand):
+    help = (
+        "Send reminders by email and WhatsApp when they fall due, re-arming recurring ones "
+        "and completing one-off ones. Run a single instance of this process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=30,
+                            help="Seconds between checks for new or edited reminders")
+        parser.add_argument('--once', action='store_true', help="Send what is due now and exit")
+        parser.add_argument('--recompute', action='store_true',
+                            help="Recalculate next_fire_at for every active reminder before starting")
+
+    def handle(self, *args, **options):
+        if options['recompute']:
+            updated = backfill_next_fire_at(recompute=True)
+            self.stdout.write(f"Recomputed the next occurrence of {updated} reminder(s)")
+        scheduler = ReminderScheduler()
+        if options['once']:
+            scheduler.load()
+            sent = scheduler.run_due()
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminder(s); {len(scheduler.scheduled)} armed"))
+            return
+        scheduler.run_forever(poll_interval=options['poll_interval'])
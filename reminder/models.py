@@ -1,4 +1,8 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from wagtail.admin.panels import FieldPanel
 from wagtail.snippets.models import register_snippet
@@ -6,6 +10,17 @@ from wagtail.snippets.views.snippets import SnippetViewSet
 from client.models import Client
 from case.models import Case
 
+# Repeat interval per recurring frequency; 'Once' has none
+REMINDER_PERIODS = {
+    'Daily': timedelta(days=1),
+    'Weekly': timedelta(weeks=1),
+    'Fort Nightly': timedelta(weeks=2),
+}
+
+def reminder_time_zone():
+    """Zone in which reminder dates and times are entered and shown (REMINDER_TIME_ZONE)."""
+    return ZoneInfo(getattr(settings, 'REMINDER_TIME_ZONE', settings.TIME_ZONE))
+
 class Reminder(models.Model):
     id = models.BigAutoField(primary_key=True)
     client = models.ForeignKey(
@@ -46,6 +61,19 @@ class Reminder(models.Model):
         help_text="Select reminder status"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    last_fired_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Occurrence most recently sent by the reminder scheduler"
+    )
+    next_fire_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Next time this reminder is due; empty once it has nothing left to send"
+    )
+    last_error = models.TextField(
+        null=True, blank=True, editable=False,
+        help_text="Why sending the most recent occurrence failed, if it did"
+    )
     created_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -68,7 +96,28 @@ class Reminder(models.Model):
         FieldPanel("created_by"),
     ]
 
+    def compute_next_fire_at(self):
+        """
+        Next time this reminder is due, or None when it has nothing left to send.
+
+        Occurrences missed while the scheduler was down are collapsed: a recurring
+        reminder fires once on catch-up and then moves to its next future slot.
+        """
+        if self.status != 'active' or self.date is None or self.time is None:
+            return None
+        first = timezone.make_aware(datetime.combine(self.date, self.time), reminder_time_zone())
+        if self.last_fired_at is None or first > self.last_fired_at:
+            return first
+        period = REMINDER_PERIODS.get(self.frequency)
+        if period is None:
+            return None
+        return first + ((self.last_fired_at - first) // period + 1) * period
+
     def save(self, *args, **kwargs):
+        self.next_fire_at = self.compute_next_fire_at()
+        if self.pk is not None and kwargs.get('update_fields') is not None:
+            # Keep auto_now and next_fire_at current for partial saves
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'updated_at', 'next_fire_at'}
         is_new = self.pk is None
         if is_new and not self.created_by and hasattr(kwargs.get('user'), 'pk'):
             self.created_by = kwargs.get('user')
@@ -80,12 +129,15 @@ class Reminder(models.Model):
     class Meta:
         verbose_name = "Reminder"
         verbose_name_plural = "Reminders"
+        indexes = [
+            models.Index(fields=['status', 'next_fire_at']),
+        ]
 
 class ReminderSnippetViewSet(SnippetViewSet):
     model = Reminder
     icon = 'calendar-check'
     add_to_admin_menu = True
-    list_display = ('description', 'client', 'case', 'date', 'time', 'frequency', 'status', 'created_by', 'created_at')
+    list_display = ('description', 'client', 'case', 'date', 'time', 'frequency', 'status', 'next_fire_at', 'created_by', 'created_at')
     list_export = ('description', 'client', 'case', 'date', 'time', 'frequency', 'status', 'created_by', 'created_at')
     inspect_view_enabled = True
     list_filter = ('frequency', 'status', 'date', 'created_by')
@@ -0,0 +1,228 @@
+"""
+Fires reminders on their schedule.
+
+Every reminder carries its materialized ``next_fire_at``. The scheduler
+range-scans the (status, next_fire_at) index for the occurrences falling in
+the next ``horizon`` and keeps just those in a min-heap, so each wake-up
+only looks at the reminders that are actually due (O(log n) per push/pop).
+Edits made through the API or the admin are picked up incrementally through
+``Reminder.updated_at``; a heap entry that no longer matches the reminder's
+current ``next_fire_at`` is dropped when popped.
+"""
+import heapq
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from mail.mailer import send_mass_email
+from .models import REMINDER_PERIODS, Reminder, reminder_time_zone
+
+logger = logging.getLogger(__name__)
+
+def split_addresses(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def due_reminders(until):
+    """Active reminders due at or before ``until``, soonest first (an index range scan)."""
+    return Reminder.objects.filter(status='active', next_fire_at__lte=until).order_by('next_fire_at')
+
+
+def backfill_next_fire_at(recompute=False):
+    """
+    Materialize next_fire_at for active reminders saved before it existed, or
+    with ``recompute`` for every active reminder (after REMINDER_TIME_ZONE changes).
+    """
+    updated = 0
+    pending = Reminder.objects.filter(status='active')
+    if not recompute:
+        pending = pending.filter(next_fire_at__isnull=True)
+    fields = ('id', 'date', 'time', 'frequency', 'status', 'last_fired_at', 'next_fire_at')
+    for reminder in pending.only(*fields).iterator(chunk_size=2000):
+        next_fire_at = reminder.compute_next_fire_at()
+        if next_fire_at == reminder.next_fire_at:
+            continue
+        updated += Reminder.objects.filter(pk=reminder.pk).update(next_fire_at=next_fire_at)
+    return updated
+
+
+class WhatsAppTransport:
+    """Delivers a plain-text message to a list of phone numbers."""
+
+    def send(self, numbers, message):
+        raise NotImplementedError
+
+
+class ConsoleWhatsAppTransport(WhatsAppTransport):
+    """Default transport for setups without a WhatsApp provider; only logs the message."""
+
+    def send(self, numbers, message):
+        print(f"WhatsApp reminder to {', '.join(numbers)}: {message}")
+
+
+def get_whatsapp_transport():
+    return import_string(getattr(
+        settings, 'REMINDER_WHATSAPP_TRANSPORT', 'reminder.scheduler.ConsoleWhatsAppTransport'
+    ))()
+
+
+def reminder_message(reminder, fire_at):
+    local = timezone.localtime(fire_at, reminder_time_zone())
+    return (
+        f"Reminder: {reminder.description}\n"
+        f"Case: {reminder.case.title}\n"
+        f"Client: {reminder.client.name}\n"
+        f"When: {local:%d %b %Y %H:%M}"
+    )
+
+
+def reminder_email(reminder, fire_at):
+    """``send_mass_email`` message for one occurrence, or None without email recipients."""
+    emails = split_addresses(reminder.emails)
+    if not emails:
+        return None
+    local = timezone.localtime(fire_at, reminder_time_zone())
+    return {
+        'subject': f"Reminder: {reminder.description}",
+        'rich_text_content': f"""
+            <p>This is a reminder for <strong>{reminder.description}</strong>.</p>
+            <ul>
+                <li><strong>Case</strong>: {reminder.case.title}</li>
+                <li><strong>Client</strong>: {reminder.client.name}</li>
+                <li><strong>When</strong>: {local:%d %b %Y %H:%M}</li>
+            </ul>
+            <p>Best regards,<br>CLH Team</p>
+            """,
+        'to': emails,
+    }
+
+
+def send_whatsapp(reminder, fire_at, whatsapp=None):
+    """Send the WhatsApp message for one occurrence; returns the error, if any, for ``last_error``."""
+    numbers = split_addresses(reminder.whatsapp)
+    if numbers:
+        try:
+            (whatsapp or get_whatsapp_transport()).send(numbers, reminder_message(reminder, fire_at))
+        except Exception as e:
+            logger.exception("Error sending WhatsApp reminder %s", reminder.pk)
+            return f"WhatsApp to {', '.join(numbers)}: {e}"
+    return None
+
+
+class ReminderScheduler:
+    def __init__(self, whatsapp=None, clock=timezone.now, horizon=timedelta(hours=1)):
+        self.whatsapp = whatsapp or get_whatsapp_transport()
+        self.clock = clock
+        self.horizon = horizon
+        self.heap = []
+        # reminder id -> fire time of its one live heap entry
+        self.scheduled = {}
+        self.window_end = None
+        self.seen_until = None
+        self.fired = 0
+
+    def arm(self, reminder_id, fire_at):
+        if fire_at is None or fire_at >= self.window_end:
+            # Out of the window; it is loaded again when the window reaches it
+            self.scheduled.pop(reminder_id, None)
+            return
+        if self.scheduled.get(reminder_id) == fire_at:
+            return
+        self.scheduled[reminder_id] = fire_at
+        heapq.heappush(self.heap, (fire_at, reminder_id))
+
+    def load(self):
+        """Arm the reminders due before the end of the first window; called once at start-up."""
+        backfill_next_fire_at()
+        self.seen_until = self.clock()
+        self.window_end = self.seen_until
+        self.advance_window()
+
+    def advance_window(self):
+        """Range-scan the next slice of occurrences once the current window is nearly used up."""
+        now = self.clock()
+        if now + self.horizon / 2 < self.window_end:
+            return
+        self.window_end = now + self.horizon
+        rows = due_reminders(self.window_end)
+        for reminder_id, fire_at in rows.values_list('id', 'next_fire_at').iterator(chunk_size=2000):
+            self.arm(reminder_id, fire_at)
+
+    def poll_changes(self):
+        """Re-arm reminders created or edited since the last poll."""
+        now = self.clock()
+        changed = Reminder.objects.filter(updated_at__gte=self.seen_until)
+        for reminder_id, status, fire_at in changed.values_list('id', 'status', 'next_fire_at').iterator(chunk_size=2000):
+            self.arm(reminder_id, fire_at if status == 'active' else None)
+        # Deleted reminders are noticed lazily when their entry is popped
+        self.seen_until = now
+
+    def next_wakeup(self):
+        return self.heap[0][0] if self.heap else None
+
+    def run_due(self):
+        """Fire every occurrence that is due now; returns how many were sent."""
+        self.advance_window()
+        now = self.clock()
+        sent = 0
+        emails, email_reminders = [], []
+        # reminder id -> what went wrong, saved as last_error once the emails are out
+        errors = {}
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, reminder_id = heapq.heappop(self.heap)
+            if self.scheduled.get(reminder_id) != fire_at:
+                continue  # superseded by an edit
+            del self.scheduled[reminder_id]
+            reminder = (
+                Reminder.objects.select_related('case', 'client')
+                .filter(pk=reminder_id, status='active', next_fire_at=fire_at).first()
+            )
+            if reminder is None:
+                continue
+            if self._fire(reminder, fire_at, now):
+                sent += 1
+                error = send_whatsapp(reminder, fire_at, self.whatsapp)
+                if error:
+                    errors.setdefault(reminder.pk, []).append(error)
+                email = reminder_email(reminder, fire_at)
+                if email:
+                    emails.append(email)
+                    email_reminders.append(reminder.pk)
+            self.arm(reminder.pk, reminder.next_fire_at)
+        if emails:
+            # Everything due in this wake-up goes out over a few shared connections
+            report = send_mass_email(emails)
+            for failure in report['failed']:
+                recipients = ', '.join(failure['to'])
+                logger.error("Error sending reminder email to %s: %s", recipients, failure['error'])
+                errors.setdefault(email_reminders[failure['index']], []).append(f"Email to {recipients}: {failure['error']}")
+        for reminder_id, messages in errors.items():
+            Reminder.objects.filter(pk=reminder_id).update(last_error='; '.join(messages))
+        self.fired += sent
+        return sent
+
+    def _fire(self, reminder, fire_at, now):
+        reminder.last_fired_at = now
+        if reminder.frequency not in REMINDER_PERIODS:
+            reminder.status = 'completed'
+        reminder.next_fire_at = reminder.compute_next_fire_at()
+        # Conditional update: a second scheduler process cannot send the same occurrence
+        claimed = Reminder.objects.filter(pk=reminder.pk, status='active', next_fire_at=fire_at).update(
+            last_fired_at=now, status=reminder.status, next_fire_at=reminder.next_fire_at, last_error=None
+        )
+        return bool(claimed)
+
+    def run_forever(self, poll_interval=30, sleep=time.sleep):
+        self.load()
+        while True:
+            close_old_connections()
+            self.poll_changes()
+            self.run_due()
+            wakeup = self.next_wakeup()
+            delay = poll_interval
+            if wakeup is not None:
+                delay = min(delay, max(0.0, (wakeup - self.clock()).total_seconds()))
+            sleep(delay)
@@ -1,3 +1,208 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+from zoneinfo import ZoneInfo
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from case.models import Case
+from client.models import Client
+from .models import Reminder
+from .scheduler import ReminderScheduler
 
-# Create your tests here.
+KOLKATA = ZoneInfo('Asia/Kolkata')
+
+
+class FakeWhatsApp:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, numbers, message):
+        self.sent.append((numbers, message))
+
+
+class BrokenWhatsApp:
+    def send(self, numbers, message):
+        raise ConnectionError('provider unreachable')
+
+
+class ReminderTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_record = Client.objects.create(name='Acme', email='acme@example.com')
+        cls.case = Case.objects.create(title='Acme v. State', type='Civil', case_number='OS 1/2021', client=cls.client_record)
+
+    def _reminder(self, at, **kwargs):
+        """Reminder entered for ``at`` (an aware datetime) as local date and time fields."""
+        local = timezone.localtime(at, KOLKATA)
+        kwargs.setdefault('description', 'File reply')
+        return Reminder.objects.create(
+            client=self.client_record, case=self.case, date=local.date(), time=local.time(), **kwargs
+        )
+
+
+@override_settings(REMINDER_TIME_ZONE='Asia/Kolkata')
+class NextFireAtTests(ReminderTestCase):
+
+    def test_date_and_time_are_read_in_the_reminder_time_zone(self):
+        reminder = Reminder.objects.create(
+            client=self.client_record, case=self.case, description='Hearing',
+            date=date(2030, 1, 10), time=time(9, 0),
+        )
+        self.assertEqual(reminder.next_fire_at, datetime(2030, 1, 10, 3, 30, tzinfo=ZoneInfo('UTC')))
+
+    def test_fired_reminders_move_on_or_finish(self):
+        first = datetime(2030, 1, 10, 9, 0, tzinfo=KOLKATA)
+        once = self._reminder(first)
+        daily = self._reminder(first, frequency='Daily')
+        weekly = self._reminder(first, frequency='Weekly')
+        # Three days of missed occurrences collapse into one catch-up
+        for reminder in (once, daily, weekly):
+            reminder.last_fired_at = first + timedelta(days=3, hours=1)
+        self.assertIsNone(once.compute_next_fire_at())
+        self.assertEqual(daily.compute_next_fire_at(), first + timedelta(days=4))
+        self.assertEqual(weekly.compute_next_fire_at(), first + timedelta(weeks=1))
+
+        weekly.status = 'completed'
+        self.assertIsNone(weekly.compute_next_fire_at())
+
+
+@override_settings(REMINDER_TIME_ZONE='Asia/Kolkata', ENABLE_EMAIL=True)
+class ReminderSchedulerTests(ReminderTestCase):
+
+    def setUp(self):
+        # A fake clock starting at the real time, so edits made by the test
+        # (stamped with the real updated_at) are seen by poll_changes()
+        self.now = timezone.now().replace(microsecond=0)
+        self.whatsapp = FakeWhatsApp()
+        self.scheduler = ReminderScheduler(whatsapp=self.whatsapp, clock=lambda: self.now)
+
+    def _advance(self, delta):
+        self.now += delta
+        self.scheduler.poll_changes()
+        return self.scheduler.run_due()
+
+    def test_once_reminder_is_sent_and_completed(self):
+        due = self.now + timedelta(minutes=10)
+        reminder = self._reminder(due, emails='a@example.com, b@example.com', whatsapp='+911234567890')
+        self.scheduler.load()
+        self.assertEqual(self.scheduler.next_wakeup(), due)
+
+        self.assertEqual(self._advance(timedelta(minutes=9)), 0)
+        self.assertEqual(self._advance(timedelta(minutes=2)), 1)
+        reminder.refresh_from_db()
+        self.assertEqual((reminder.status, reminder.next_fire_at), ('completed', None))
+
+        # The time is shown as entered, not in UTC
+        local = f"{timezone.localtime(due, KOLKATA):%H:%M}"
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['a@example.com', 'b@example.com'])
+        self.assertIn(local, mail.outbox[0].alternatives[0][0])
+        self.assertEqual(self.whatsapp.sent[0][0], ['+911234567890'])
+        self.assertIn(local, self.whatsapp.sent[0][1])
+
+        self.assertEqual(self._advance(timedelta(days=1)), 0)
+
+    def test_daily_reminder_is_re_armed(self):
+        due = self.now + timedelta(minutes=10)
+        reminder = self._reminder(due, frequency='Daily')
+        self.scheduler.load()
+        self.assertEqual(self._advance(timedelta(minutes=11)), 1)
+        reminder.refresh_from_db()
+        self.assertEqual((reminder.status, reminder.next_fire_at), ('active', due + timedelta(days=1)))
+
+        # Next day's occurrence is loaded as the window reaches it
+        self.assertEqual(self._advance(timedelta(hours=23, minutes=58)), 0)
+        self.assertEqual(self._advance(timedelta(minutes=2)), 1)
+        self.assertEqual(self.scheduler.fired, 2)
+
+    def test_edits_re_arm_the_reminder(self):
+        due = self.now + timedelta(minutes=10)
+        moved = self._reminder(due)
+        cancelled = self._reminder(due, description='Settled')
+        deleted = self._reminder(due, description='Withdrawn')
+        self.scheduler.load()
+
+        moved.time = timezone.localtime(due + timedelta(minutes=20), KOLKATA).time()
+        moved.save()
+        cancelled.status = 'completed'
+        cancelled.save()
+        deleted.delete()
+        self.assertEqual(self._advance(timedelta(minutes=11)), 0)
+        self.assertEqual(self._advance(timedelta(minutes=20)), 1)
+        self.assertEqual(Reminder.objects.get(pk=moved.pk).status, 'completed')
+
+    def test_second_scheduler_does_not_resend(self):
+        due = self.now + timedelta(minutes=10)
+        self._reminder(due)
+        other = ReminderScheduler(whatsapp=FakeWhatsApp(), clock=lambda: self.now)
+        self.scheduler.load()
+        other.load()
+        self.now += timedelta(minutes=11)
+        self.assertEqual(self.scheduler.run_due() + other.run_due(), 1)
+
+    def test_failed_sends_are_logged_and_recorded_on_the_reminder(self):
+        due = self.now + timedelta(minutes=10)
+        reminder = self._reminder(due, frequency='Daily', emails='a@example.com', whatsapp='+911234567890')
+        self.scheduler.whatsapp = BrokenWhatsApp()
+        self.scheduler.load()
+        report = {'failed': [{'index': 0, 'to': ['a@example.com'], 'error': '421 try again later'}]}
+        with mock.patch('reminder.scheduler.send_mass_email', return_value=report):
+            with self.assertLogs('reminder.scheduler', 'ERROR') as logs:
+                self.assertEqual(self._advance(timedelta(minutes=11)), 1)
+        self.assertEqual(len(logs.output), 2)
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.last_error, (
+            "WhatsApp to +911234567890: provider unreachable; Email to a@example.com: 421 try again later"
+        ))
+
+        # The next occurrence that goes out cleanly clears it
+        self.scheduler.whatsapp = self.whatsapp
+        self.assertEqual(self._advance(timedelta(days=1)), 1)
+        reminder.refresh_from_db()
+        self.assertIsNone(reminder.last_error)
+
+
+@override_settings(REMINDER_TIME_ZONE='Asia/Kolkata')
+class ClientReminderFilterTests(ReminderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('client', 'client@example.com', 'secret')
+        cls.user.groups.add(Group.objects.create(name='client'))
+        cls.client_record.user = cls.user
+        cls.client_record.save()
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.first = datetime(2030, 1, 10, 9, 0, tzinfo=KOLKATA)
+        self.reminders = [self._reminder(self.first + timedelta(days=i)) for i in range(3)]
+        self._reminder(self.first, status='completed')
+
+    def _ids(self, query):
+        response = self.api.get(reverse('client-reminder-list') + query)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_due_range(self):
+        self.assertEqual(len(self._ids('')), 4)
+        self.assertEqual(
+            self._ids('?due_after=2030-01-10T03:30:00Z&due_before=2030-01-12T03:30:00Z'),
+            [self.reminders[0].pk, self.reminders[1].pk],
+        )
+        self.assertEqual(self._ids('?due_after=2030-01-11T04:00:00%2B00:00'), [self.reminders[2].pk])
+
+    def test_naive_bounds_are_read_in_the_reminder_time_zone(self):
+        # 09:00 in Kolkata; read as UTC it would exclude the first reminder
+        self.assertEqual(self._ids('?due_after=2030-01-10T09:00:00&due_before=2030-01-11T09:00:00'), [self.reminders[0].pk])
+
+    def test_invalid_bounds(self):
+        for value in ('tomorrow', '2030-02-30T09:00:00'):
+            response = self.api.get(reverse('client-reminder-list') + f'?due_after={value}')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('due_after', response.data)
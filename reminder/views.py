@@ -3,10 +3,12 @@ from rest_framework import generics, views
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Reminder
+from .models import Reminder, reminder_time_zone
 from client.models import Client
 from case.models import Case
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 # Custom permission for advocates group
 class IsAdvocate(BasePermission):
@@ -40,9 +42,9 @@ class ReminderSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'client', 'client_name', 'case', 'case_title', 'description',
             'date', 'time', 'frequency', 'emails', 'whatsapp', 'status',
-            'created_at', 'created_by'
+            'next_fire_at', 'last_error', 'created_at', 'created_by'
         ]
-        read_only_fields = ['id', 'created_at', 'created_by']
+        read_only_fields = ['id', 'next_fire_at', 'last_error', 'created_at', 'created_by']
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -69,7 +71,7 @@ class ClientReminderSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'client_name', 'case_title', 'description',
             'date', 'time', 'frequency', 'emails', 'whatsapp', 'status',
-            'created_at'
+            'next_fire_at', 'created_at'
         ]
         read_only_fields = fields  # All fields are read-only for clients
 
@@ -96,6 +98,26 @@ class ClientReminderListView(generics.ListAPIView):
     def get_queryset(self):
         try:
             client = Client.objects.get(user=self.request.user)
-            return Reminder.objects.filter(case__client=client)
         except Client.DoesNotExist:
-            return Reminder.objects.none()
\ No newline at end of file
+            return Reminder.objects.none()
+        queryset = Reminder.objects.filter(case__client=client).select_related('client', 'case')
+
+        # ?due_after= / ?due_before= (ISO datetimes) narrow to upcoming occurrences
+        # with a range scan on the (status, next_fire_at) index
+        bounds = {}
+        for param, lookup in (('due_after', 'next_fire_at__gte'), ('due_before', 'next_fire_at__lt')):
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    parsed = parse_datetime(value)
+                except ValueError:
+                    parsed = None
+                if parsed is None:
+                    raise serializers.ValidationError({param: "Enter a valid ISO 8601 datetime."})
+                if timezone.is_naive(parsed):
+                    # Read like the reminders' own date and time fields
+                    parsed = timezone.make_aware(parsed, reminder_time_zone())
+                bounds[lookup] = parsed
+        if bounds:
+            return queryset.filter(status='active', **bounds).order_by('next_fire_at')
+        return queryset
\ No newline at end of file